@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from typing import Optional
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,6 +22,56 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24 horas
     
+    # Resumen diario: mantener la tabla resumen_diario y leer los reportes desde ella
+    # (crear la tabla con mantenimiento.py, activar y después reconstruirla)
+    RESUMEN_DIARIO_ACTIVO: bool = os.getenv("RESUMEN_DIARIO_ACTIVO", "false").lower() == "true"
+    
+    # Agregados mensuales: guardar conteos por trabajador y mes cerrado en la tabla
+    # agregado_mensual y armar los reportes por período a partir de ellos
+    # (crear la tabla con mantenimiento.py antes de activarlo)
+    AGREGADOS_MENSUALES_ACTIVO: bool = os.getenv("AGREGADOS_MENSUALES_ACTIVO", "false").lower() == "true"
+    
+    # Mapa de asistencia: mantener la tabla mapa_asistencia (bits de días presentes
+    # y justificados) para las consultas de ausencias (crear la tabla con
+    # mantenimiento.py, activar y después reconstruirla)
+    MAPA_ASISTENCIA_ACTIVO: bool = os.getenv("MAPA_ASISTENCIA_ACTIVO", "false").lower() == "true"
+    
+    # Contadores de puntualidad: mantener la tabla contador_puntualidad (conteos por
+    # trabajador y quincena) y leer el índice de puntualidad desde ella (crear la
+    # tabla con mantenimiento.py, activar y después reconstruirla). Retardos que
+    # equivalen a una falta (0 = no se acumulan)
+    CONTADORES_PUNTUALIDAD_ACTIVO: bool = os.getenv("CONTADORES_PUNTUALIDAD_ACTIVO", "false").lower() == "true"
+    RETARDOS_MENORES_POR_FALTA: int = int(os.getenv("RETARDOS_MENORES_POR_FALTA", "0"))
+    RETARDOS_MAYORES_POR_FALTA: int = int(os.getenv("RETARDOS_MAYORES_POR_FALTA", "0"))
+    
+    # Justificaciones por período: una justificación cubre de su fecha a su
+    # fecha_fin (agregar la columna con mantenimiento.py antes de activarlo)
+    JUSTIFICACIONES_POR_PERIODO_ACTIVO: bool = os.getenv("JUSTIFICACIONES_POR_PERIODO_ACTIVO", "false").lower() == "true"
+    DIAS_MAXIMOS_JUSTIFICACION: int = int(os.getenv("DIAS_MAXIMOS_JUSTIFICACION", "366"))
+    
+    # Trabajos de reportes en segundo plano: directorio de los archivos generados,
+    # procesos del pool y horas que se conservan los archivos
+    DIRECTORIO_TRABAJOS: str = os.getenv(
+        "DIRECTORIO_TRABAJOS", os.path.join(tempfile.gettempdir(), "asistencias_reportes")
+    )
+    PROCESOS_TRABAJOS: int = int(os.getenv("PROCESOS_TRABAJOS", "2"))
+    HORAS_RETENCION_TRABAJOS: int = int(os.getenv("HORAS_RETENCION_TRABAJOS", "24"))
+    
+    # Procesos para calcular un reporte grande por fragmentos de trabajadores
+    # (1 = calcularlo en el proceso de la petición)
+    PROCESOS_REPORTES: int = int(os.getenv("PROCESOS_REPORTES", "1"))
+    
+    # Caché de reportes: en memoria (LRU) con desborde comprimido a disco. Los
+    # períodos cerrados se conservan hasta que un cambio en su rango los invalida;
+    # los que incluyen el día de hoy expiran a los SEGUNDOS_CACHE_PERIODO_ABIERTO
+    CACHE_REPORTES_ACTIVO: bool = os.getenv("CACHE_REPORTES_ACTIVO", "true").lower() == "true"
+    DIRECTORIO_CACHE_REPORTES: str = os.getenv(
+        "DIRECTORIO_CACHE_REPORTES", os.path.join(tempfile.gettempdir(), "asistencias_cache")
+    )
+    MB_CACHE_REPORTES: int = int(os.getenv("MB_CACHE_REPORTES", "64"))
+    MB_CACHE_REPORTES_DISCO: int = int(os.getenv("MB_CACHE_REPORTES_DISCO", "512"))
+    SEGUNDOS_CACHE_PERIODO_ABIERTO: int = int(os.getenv("SEGUNDOS_CACHE_PERIODO_ABIERTO", "60"))
+    
     # Configuración del servidor
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
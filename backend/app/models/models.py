@@ -1,5 +1,5 @@
-from sqlalchemy import BLOB, Column, Integer, String, DateTime, ForeignKey, Time, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import BLOB, Column, Integer, String, DateTime, Date, ForeignKey, Time, Boolean, Index
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy import LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -112,6 +112,71 @@ class RegistroAsistencia(Base):
     
     # Relación con trabajador (opcional, para facilitar consultas)
     trabajador = relationship("Trabajador", backref="asistencias")
+    
+    # Índices compuestos para las consultas por trabajador(es) y rango de fechas,
+    # y para la paginación por cursor (fecha, id)
+    __table_args__ = (
+        Index("ix_registroasistencia_trabajador_fecha", "id_trabajador", "fecha"),
+        Index("ix_registroasistencia_fecha_id", "fecha", "id"),
+    )
+
+# Resumen por trabajador y día, mantenido al registrar asistencias y justificaciones
+class ResumenDiario(Base):
+    __tablename__ = "resumen_diario"
+
+    id_trabajador = Column(Integer, ForeignKey("trabajadores.id"), primary_key=True)
+    fecha = Column(Date, primary_key=True)
+    estatus = Column(String(50), nullable=False)
+    hora_entrada = Column(DateTime, nullable=True)
+    hora_salida = Column(DateTime, nullable=True)
+    # Sin llave foránea: la fila se recalcula después de borrar la justificación
+    id_justificacion = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_resumen_diario_fecha", "fecha"),
+    )
+
+# Conteos parciales por trabajador y mes (meses ya cerrados), para sumar
+# períodos largos sin recorrer cada día; se borran al cambiar datos del mes
+class AgregadoMensual(Base):
+    __tablename__ = "agregado_mensual"
+
+    id_trabajador = Column(Integer, ForeignKey("trabajadores.id"), primary_key=True)
+    anio = Column(Integer, primary_key=True)
+    mes = Column(Integer, primary_key=True)
+    dias_laborables = Column(Integer, nullable=False)
+    asistencias = Column(Integer, nullable=False)
+    retardos = Column(Integer, nullable=False)
+    faltas = Column(Integer, nullable=False)
+    justificados = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_agregado_mensual_anio_mes", "anio", "mes"),
+    )
+
+# Días con entrada y días justificados por trabajador y año, un bit por día del
+# año (bit 0 = 1 de enero); las ausencias se obtienen con operaciones de bits
+class MapaAsistencia(Base):
+    __tablename__ = "mapa_asistencia"
+
+    id_trabajador = Column(Integer, ForeignKey("trabajadores.id"), primary_key=True)
+    anio = Column(Integer, primary_key=True)
+    presentes = Column(LargeBinary(46), nullable=False)
+    justificados = Column(LargeBinary(46), nullable=False)
+
+# Conteos por trabajador y quincena (1 = días 1 a 15, 2 = del 16 a fin de mes)
+# de los días con registros, para el índice de puntualidad sin recorrer el período
+class ContadorPuntualidad(Base):
+    __tablename__ = "contador_puntualidad"
+
+    id_trabajador = Column(Integer, ForeignKey("trabajadores.id"), primary_key=True)
+    anio = Column(Integer, primary_key=True)
+    mes = Column(Integer, primary_key=True)
+    quincena = Column(Integer, primary_key=True)
+    asistencias = Column(Integer, nullable=False, default=0)
+    retardos_menores = Column(Integer, nullable=False, default=0)
+    retardos_mayores = Column(Integer, nullable=False, default=0)
+    justificados = Column(Integer, nullable=False, default=0)
 
 class GradoEstudio(Base):
     __tablename__ = "gradosestudio"
@@ -130,6 +195,14 @@ class Justificacion(Base):
     id_trabajador = Column(Integer, ForeignKey("trabajadores.id"))
     fecha = Column(DateTime, nullable=False)
     id_descripcion = Column(Integer, ForeignKey("reglasjustificaciones.id"))
+    # Último día que cubre la justificación (NULL = solo el día de fecha). Diferida:
+    # solo se lee con JUSTIFICACIONES_POR_PERIODO_ACTIVO, en bases ya migradas
+    fecha_fin = deferred(Column(DateTime, nullable=True))
+
+    # Índice para la paginación por cursor (fecha, id)
+    __table_args__ = (
+        Index("ix_justificaciones_fecha_id", "fecha", "id"),
+    )
 
 class ReglaJustificacion(Base):
     __tablename__ = "reglasjustificaciones"
@@ -1,27 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import cast, Date, and_, or_
-from typing import List, Optional, Literal
+from typing import List, Optional, Literal, Union
 from datetime import datetime, date, time, timedelta
 import pytz
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.models.models import (
     RegistroAsistencia, 
     Trabajador, 
     ReglaRetardo,
     Departamento,
-    Horario,
     DiaFestivo
 )
 from app.schemas.schemas import (
     RegistroAsistenciaCreate,
     RegistroAsistenciaUpdate,
     RegistroAsistenciaOut,
+    PaginaCursor,
     ReglaRetardoCreate,
     ReglaRetardoUpdate,
-    ReglaRetardoOut
+    ReglaRetardoOut,
+    RecalculoEstatusCreate
 )
 from app.services.auth_service import get_current_trabajador, check_admin_permissions
+from app.services.proyeccion_service import proyectar_asistencias
+from app.services.derivados_service import actualizar_derivados_dia
+from app.services.horarios_service import horario_vigente
+from app.services.recalculo_service import clasificar_entrada, recalcular_estatus
+from app.utils.helpers import (
+    serializar_json,
+    codificar_cursor,
+    decodificar_cursor,
+    paginar_por_cursor,
+    estimar_total
+)
 
 router = APIRouter()
 
@@ -29,6 +42,43 @@ router = APIRouter()
 # Los Mochis está en la zona horaria de Montaña (MST/MDT)
 TIMEZONE_MEXICO = pytz.timezone('America/Mazatlan')
 
+# Cantidad de filas que se leen por lote del cursor del servidor al hacer streaming
+TAMANO_LOTE_STREAMING = 1000
+
+def separar_entrada_salida(registros):
+    """
+    Obtiene el registro de entrada (primero que no sea SALIDA) y el de salida
+    de una lista de registros de un mismo día ordenados por fecha
+    """
+    entrada = None
+    salida = None
+    
+    for registro in registros:
+        if registro.estatus != "SALIDA" and not entrada:
+            entrada = registro
+        elif registro.estatus == "SALIDA":
+            salida = registro
+    
+    return entrada, salida
+
+def consolidar_dia(fecha: date, registros) -> dict:
+    """
+    Construye el resumen de entrada/salida de un día a partir de sus registros
+    """
+    entrada, salida = separar_entrada_salida(registros)
+    
+    return {
+        "fecha": fecha,
+        "entrada": {
+            "hora": entrada.fecha if entrada else None,
+            "estatus": entrada.estatus if entrada else "NO_REGISTRADO"
+        },
+        "salida": {
+            "hora": salida.fecha if salida else None,
+            "estatus": "SALIDA" if salida else "NO_REGISTRADO"
+        }
+    }
+
 def determinar_tipo_registro(trabajador: Trabajador, fecha_hora_registro: datetime, db: Session) -> Literal["ENTRADA", "SALIDA"]:
     """
     Determina si el registro es de entrada o salida basándose en:
@@ -103,8 +153,8 @@ def determinar_estatus_asistencia(trabajador: Trabajador, fecha_hora_registro: d
     
     fecha_hora_naive = fecha_hora_local.replace(tzinfo=None)
     
-    # Obtener el horario del trabajador
-    horario = db.query(Horario).filter(Horario.id == trabajador.id_horario).first()
+    # Obtener el horario que regía al trabajador el día del registro (puede ser una fecha pasada)
+    horario = horario_vigente(db, trabajador, fecha_hora_naive.date())
     if not horario:
         print("⚠️ Trabajador sin horario asignado, asignando ASISTENCIA por defecto")
         return "ASISTENCIA"
@@ -156,39 +206,11 @@ def determinar_estatus_asistencia(trabajador: Trabajador, fecha_hora_registro: d
     if not reglas_retardo:
         # Si no hay reglas configuradas, usar comportamiento por defecto
         print("⚠️ No hay reglas de retardo configuradas, usando valores por defecto")
-        if minutos_diferencia <= 10:
-            print(f"✅ ASISTENCIA (llegó {minutos_diferencia} minutos después)")
-            return "ASISTENCIA"
-        elif minutos_diferencia <= 20:
-            print(f"⚠️ RETARDO_MENOR (llegó {minutos_diferencia} minutos después)")
-            return "RETARDO_MENOR"
-        elif minutos_diferencia <= 30:
-            print(f"⚠️ RETARDO_MAYOR (llegó {minutos_diferencia} minutos después)")
-            return "RETARDO_MAYOR"
-        else:
-            print(f"❌ FALTA (llegó {minutos_diferencia} minutos después)")
-            return "FALTA"
-    
-    # Aplicar las reglas de la BD
-    for regla in reglas_retardo:
-        if regla.minutosMin <= minutos_diferencia <= regla.minutosMax:
-            print(f"📋 Aplicando regla: {regla.descripcion} ({regla.minutosMin}-{regla.minutosMax} min)")
-            print(f"✅ Estatus: {regla.descripcion.upper().replace(' ', '_')}")
-            
-            # Normalizar el nombre del estatus
-            estatus = regla.descripcion.upper().replace(' ', '_')
-            
-            # Mapear algunos nombres comunes
-            if 'TOLERANCIA' in estatus:
-                return "ASISTENCIA"
-            elif 'FALTA' in estatus:
-                return "FALTA"
-            else:
-                return estatus
     
-    # Si no cae en ninguna regla, es FALTA
-    print(f"❌ No hay regla para {minutos_diferencia} minutos, asignando FALTA")
-    return "FALTA"
+    # La misma clasificación que usa el recálculo masivo de estatus
+    estatus = clasificar_entrada(minutos_diferencia, reglas_retardo)
+    print(f"📋 Estatus: {estatus} (llegó {minutos_diferencia} minutos después)")
+    return estatus
 
 def es_dia_festivo(fecha: date, db: Session) -> bool:
     """
@@ -313,6 +335,108 @@ def get_asistencias_hoy(
         "registros": resultado
     }
 
+@router.get("/asistencias/trabajadores")
+def get_asistencias_by_trabajadores(
+    trabajador_ids: Optional[List[int]] = Query(None, description="IDs de los trabajadores"),
+    departamento_id: Optional[int] = Query(None, description="ID del departamento"),
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Obtiene las asistencias consolidadas de varios trabajadores (lista de IDs
+    y/o departamento) con una sola consulta, para las vistas de equipo
+    """
+    if not trabajador_ids and not departamento_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Debe indicar trabajador_ids o departamento_id"
+        )
+    
+    if not fecha_inicio:
+        fecha_inicio = date.today() - timedelta(days=30)
+    
+    if not fecha_fin:
+        fecha_fin = date.today()
+    
+    # Obtener todos los trabajadores solicitados en una sola consulta
+    query_trabajadores = db.query(
+        Trabajador.id,
+        Trabajador.nombre,
+        Trabajador.apellidoPaterno,
+        Trabajador.apellidoMaterno,
+        Trabajador.rfc
+    )
+    
+    if trabajador_ids:
+        query_trabajadores = query_trabajadores.filter(Trabajador.id.in_(trabajador_ids))
+    
+    if departamento_id:
+        query_trabajadores = query_trabajadores.filter(Trabajador.departamento == departamento_id)
+    
+    trabajadores = query_trabajadores.order_by(Trabajador.id).all()
+    
+    if trabajador_ids:
+        encontrados = {t.id for t in trabajadores}
+        faltantes = [t_id for t_id in trabajador_ids if t_id not in encontrados]
+        if faltantes and not departamento_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Trabajadores no encontrados: {faltantes}"
+            )
+    
+    ids = [t.id for t in trabajadores]
+    
+    # Una sola consulta por rango para todos los trabajadores (índice trabajador+fecha)
+    registros_por_trabajador = {t_id: {} for t_id in ids}
+    if ids:
+        registros = db.query(
+            RegistroAsistencia.id_trabajador,
+            RegistroAsistencia.fecha,
+            RegistroAsistencia.estatus
+        ).filter(
+            RegistroAsistencia.id_trabajador.in_(ids),
+            RegistroAsistencia.fecha >= datetime.combine(fecha_inicio, time.min),
+            RegistroAsistencia.fecha <= datetime.combine(fecha_fin, time.max)
+        ).order_by(RegistroAsistencia.id_trabajador, RegistroAsistencia.fecha).all()
+        
+        for registro in registros:
+            registros_por_trabajador[registro.id_trabajador].setdefault(
+                registro.fecha.date(), []
+            ).append(registro)
+    
+    resultado = []
+    for trabajador in trabajadores:
+        registros_por_dia = registros_por_trabajador[trabajador.id]
+        
+        dias_consolidados = []
+        fecha_actual = fecha_inicio
+        while fecha_actual <= fecha_fin:
+            dias_consolidados.append(
+                consolidar_dia(fecha_actual, registros_por_dia.get(fecha_actual, []))
+            )
+            fecha_actual += timedelta(days=1)
+        
+        resultado.append({
+            "trabajador": {
+                "id": trabajador.id,
+                "nombre": f"{trabajador.nombre} {trabajador.apellidoPaterno} {trabajador.apellidoMaterno}",
+                "rfc": trabajador.rfc
+            },
+            "registros": dias_consolidados
+        })
+    
+    return {
+        "periodo": {
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin
+        },
+        "departamento": departamento_id,
+        "total_trabajadores": len(resultado),
+        "trabajadores": resultado
+    }
+
 @router.get("/asistencias/trabajador/{trabajador_id}")
 def get_asistencias_by_trabajador(
     trabajador_id: int,
@@ -357,29 +481,9 @@ def get_asistencias_by_trabajador(
     fecha_actual = fecha_inicio
     
     while fecha_actual <= fecha_fin:
-        registros_del_dia = registros_por_dia.get(fecha_actual, [])
-        
-        entrada = None
-        salida = None
-        
-        for registro in registros_del_dia:
-            if registro.estatus != "SALIDA" and not entrada:
-                entrada = registro
-            elif registro.estatus == "SALIDA":
-                salida = registro
-        
-        dias_consolidados.append({
-            "fecha": fecha_actual,
-            "entrada": {
-                "hora": entrada.fecha if entrada else None,
-                "estatus": entrada.estatus if entrada else "NO_REGISTRADO"
-            },
-            "salida": {
-                "hora": salida.fecha if salida else None,
-                "estatus": "SALIDA" if salida else "NO_REGISTRADO"
-            }
-        })
-        
+        dias_consolidados.append(
+            consolidar_dia(fecha_actual, registros_por_dia.get(fecha_actual, []))
+        )
         fecha_actual += timedelta(days=1)
     
     return {
@@ -395,6 +499,155 @@ def get_asistencias_by_trabajador(
         "registros": dias_consolidados
     }
 
+def _generar_historial_streaming(
+    encabezado: dict,
+    trabajador_id: int,
+    fecha_inicio: date,
+    fecha_fin: date,
+    formato: str,
+    siguiente_cursor: Optional[str]
+):
+    """
+    Recorre los registros del período con un cursor del lado del servidor y emite
+    cada día consolidado en cuanto se completa, sin acumular el período en memoria
+    """
+    # Sesión propia: la del request se cierra antes de que termine el streaming
+    db = SessionLocal()
+    try:
+        registros = db.query(
+            RegistroAsistencia.fecha,
+            RegistroAsistencia.estatus
+        ).filter(
+            RegistroAsistencia.id_trabajador == trabajador_id,
+            RegistroAsistencia.fecha >= datetime.combine(fecha_inicio, time.min),
+            RegistroAsistencia.fecha <= datetime.combine(fecha_fin, time.max)
+        ).order_by(RegistroAsistencia.fecha).yield_per(TAMANO_LOTE_STREAMING)
+        
+        if formato == "ndjson":
+            yield serializar_json(encabezado) + "\n"
+        else:
+            yield serializar_json(encabezado)[:-1] + ',"registros":['
+        
+        separador = "\n" if formato == "ndjson" else ","
+        primero = True
+        fecha_actual = fecha_inicio
+        registros_del_dia = []
+        
+        def emitir(dia, registros_dia):
+            linea = serializar_json(consolidar_dia(dia, registros_dia))
+            if formato == "ndjson":
+                return linea + separador
+            return linea if primero else separador + linea
+        
+        for registro in registros:
+            dia_registro = registro.fecha.date()
+            
+            # Emitir todos los días anteriores al del registro actual
+            while fecha_actual < dia_registro:
+                yield emitir(fecha_actual, registros_del_dia)
+                primero = False
+                registros_del_dia = []
+                fecha_actual += timedelta(days=1)
+            
+            registros_del_dia.append(registro)
+        
+        # Emitir los días restantes del rango (incluyendo el último con registros)
+        while fecha_actual <= fecha_fin:
+            yield emitir(fecha_actual, registros_del_dia)
+            primero = False
+            registros_del_dia = []
+            fecha_actual += timedelta(days=1)
+        
+        if formato == "ndjson":
+            yield serializar_json({"fin": True, "siguiente_cursor": siguiente_cursor}) + "\n"
+        else:
+            yield '],"siguiente_cursor":' + serializar_json(siguiente_cursor) + "}"
+    finally:
+        db.close()
+
+@router.get("/asistencias/trabajador/{trabajador_id}/stream")
+def stream_asistencias_by_trabajador(
+    trabajador_id: int,
+    fecha_inicio: Optional[date] = Query(None, description="Por defecto, la fecha de ingreso a la SEP"),
+    fecha_fin: Optional[date] = Query(None, description="Por defecto, la fecha actual"),
+    formato: Literal["ndjson", "json"] = Query("ndjson", description="NDJSON (un día por línea) o JSON en bloques"),
+    limite_dias: Optional[int] = Query(None, ge=1, description="Máximo de días a emitir; el resto se obtiene con el cursor"),
+    cursor: Optional[str] = Query(None, description="Cursor de reanudación devuelto por una respuesta anterior"),
+    db: Session = Depends(get_db),
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Historial de asistencias de un trabajador en streaming, sin límite de período.
+    Emite los días consolidados conforme se leen, manteniendo la memoria constante.
+    """
+    trabajador = db.query(Trabajador).filter(Trabajador.id == trabajador_id).first()
+    if not trabajador:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Trabajador con ID {trabajador_id} no encontrado"
+        )
+    
+    # El cursor de reanudación sustituye el rango solicitado
+    if cursor:
+        try:
+            datos_cursor = decodificar_cursor(cursor)
+            if datos_cursor.get("t") != trabajador_id:
+                raise ValueError("El cursor pertenece a otro trabajador")
+            fecha_inicio = date.fromisoformat(datos_cursor["d"])
+            fecha_fin = date.fromisoformat(datos_cursor["h"])
+        except (ValueError, KeyError, TypeError) as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cursor inválido: {str(e)}"
+            )
+    
+    if not fecha_inicio:
+        fecha_inicio = trabajador.fechaIngresoSep.date()
+    
+    if not fecha_fin:
+        fecha_fin = date.today()
+    
+    if fecha_inicio > fecha_fin:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha de inicio no puede ser posterior a la fecha de fin"
+        )
+    
+    # Si hay límite de días, recortar el rango y preparar el cursor para el resto
+    fecha_fin_bloque = fecha_fin
+    siguiente_cursor = None
+    if limite_dias and (fecha_fin - fecha_inicio).days + 1 > limite_dias:
+        fecha_fin_bloque = fecha_inicio + timedelta(days=limite_dias - 1)
+        siguiente_cursor = codificar_cursor({
+            "t": trabajador_id,
+            "d": (fecha_fin_bloque + timedelta(days=1)).isoformat(),
+            "h": fecha_fin.isoformat()
+        })
+    
+    encabezado = {
+        "trabajador": {
+            "id": trabajador.id,
+            "nombre": f"{trabajador.nombre} {trabajador.apellidoPaterno} {trabajador.apellidoMaterno}",
+            "rfc": trabajador.rfc
+        },
+        "periodo": {
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin_bloque
+        }
+    }
+    
+    headers = {}
+    if siguiente_cursor:
+        headers["X-Siguiente-Cursor"] = siguiente_cursor
+    
+    return StreamingResponse(
+        _generar_historial_streaming(
+            encabezado, trabajador_id, fecha_inicio, fecha_fin_bloque, formato, siguiente_cursor
+        ),
+        media_type="application/x-ndjson" if formato == "ndjson" else "application/json",
+        headers=headers
+    )
+
 # ===== RUTAS CRUD BÁSICAS =====
 
 @router.post("/asistencias", response_model=RegistroAsistenciaOut)
@@ -467,6 +720,7 @@ def create_asistencia(
     )
     
     db.add(db_asistencia)
+    actualizar_derivados_dia(db, db_asistencia.id_trabajador, db_asistencia.fecha)
     db.commit()
     db.refresh(db_asistencia)
     
@@ -474,7 +728,29 @@ def create_asistencia(
     
     return db_asistencia
 
-@router.get("/asistencias", response_model=List[RegistroAsistenciaOut])
+@router.post("/asistencias/recalcular")
+def recalcular_estatus_asistencias(
+    datos: RecalculoEstatusCreate,
+    db: Session = Depends(get_db),
+    current_user: Trabajador = Depends(check_admin_permissions)
+):
+    """
+    Vuelve a clasificar los registros de un rango con las reglas de retardo,
+    los horarios y los días festivos actuales (por ejemplo, después de cambiar
+    una tolerancia o agregar un día festivo). Con simular=true solo devuelve
+    el resumen de cambios sin escribirlos.
+    """
+    try:
+        return recalcular_estatus(db, datos.fecha_inicio, datos.fecha_fin, datos.trabajador_ids, datos.simular)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al recalcular estatus: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al recalcular los estatus: {str(e)}"
+        )
+
+@router.get("/asistencias", response_model=Union[List[RegistroAsistenciaOut], PaginaCursor[RegistroAsistenciaOut]])
 def list_asistencias(
     skip: int = 0,
     limit: int = 100,
@@ -483,6 +759,10 @@ def list_asistencias(
     trabajador_id: Optional[int] = None,
     departamento_id: Optional[int] = None,
     estatus: Optional[str] = None,
+    paginacion: Literal["offset", "cursor"] = Query("offset", description="Modo de paginación"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página anterior (activa el modo cursor)"),
+    incluir_total: bool = Query(False, description="Incluir total estimado (solo modo cursor)"),
+    ligero: bool = Query(False, description="Proyección directa a JSON, sin objetos ORM ni validación (solo modo offset)"),
     db: Session = Depends(get_db),
     current_user: Trabajador = Depends(get_current_trabajador)
 ):
@@ -505,7 +785,30 @@ def list_asistencias(
     if estatus:
         query = query.filter(RegistroAsistencia.estatus == estatus)
     
-    return query.order_by(RegistroAsistencia.fecha.desc()).offset(skip).limit(limit).all()
+    if cursor or paginacion == "cursor":
+        total_estimado = estimar_total(db, query, "registroasistencia") if incluir_total else None
+        try:
+            items, siguiente_cursor = paginar_por_cursor(
+                query,
+                [RegistroAsistencia.fecha, RegistroAsistencia.id],
+                cursor,
+                limit,
+                clave=lambda r: (r.fecha.isoformat(), r.id),
+                descendente=True
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        return {"items": items, "next_cursor": siguiente_cursor, "total_estimado": total_estimado}
+    
+    query = query.order_by(RegistroAsistencia.fecha.desc()).offset(skip).limit(limit)
+    
+    if ligero:
+        return Response(content=proyectar_asistencias(db, query), media_type="application/json")
+    
+    return query.all()
 
 @router.get("/asistencias/{asistencia_id}", response_model=RegistroAsistenciaOut)
 def get_asistencia(
@@ -537,9 +840,15 @@ def update_asistencia(
     
     update_data = asistencia_update.dict(exclude_unset=True)
     
+    # Día afectado antes del cambio (la fecha o el trabajador pueden cambiar)
+    dia_anterior = (db_asistencia.id_trabajador, db_asistencia.fecha.date())
+    
     for key, value in update_data.items():
         setattr(db_asistencia, key, value)
     
+    for id_trabajador, dia in {dia_anterior, (db_asistencia.id_trabajador, db_asistencia.fecha.date())}:
+        actualizar_derivados_dia(db, id_trabajador, dia)
+    
     db.commit()
     db.refresh(db_asistencia)
     return db_asistencia
@@ -558,6 +867,7 @@ def delete_asistencia(
         )
     
     db.delete(db_asistencia)
+    actualizar_derivados_dia(db, db_asistencia.id_trabajador, db_asistencia.fecha)
     db.commit()
     return None
 
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session, joinedload
-from datetime import timedelta
+from sqlalchemy.orm import Session
+from datetime import date, timedelta
+from typing import Optional
 from app.database import get_db
 from app.schemas.schemas import Token, LoginRequest
 from app.services.auth_service import (
@@ -11,6 +13,8 @@ from app.services.auth_service import (
     get_current_trabajador
 )
 from app.models.models import Trabajador
+from app.services.trabajador_service import opciones_carga, parsear_campos, serializar_trabajador
+from app.services.puntualidad_service import obtener_puntualidad
 from app.config import settings
 
 router = APIRouter()
@@ -99,21 +103,35 @@ async def registrar_asistencia_huella(huella_base64: str, db: Session = Depends(
 
 @router.get("/me")
 async def get_current_user_info(
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas"),
+    include: Optional[str] = Query(None, description="Relaciones a incluir separadas por comas"),
     current_user: Trabajador = Depends(get_current_trabajador),
     db: Session = Depends(get_db)
 ):
     """
-    Obtener información completa del usuario actual autenticado
+    Obtener información completa del usuario actual autenticado.
+    Con fields= / include= devuelve solo los campos y relaciones solicitados.
     """
-    # Cargar el trabajador con todas las relaciones
-    trabajador_completo = db.query(Trabajador).options(
-        joinedload(Trabajador.tipo_trabajador),
-        joinedload(Trabajador.departamento_rel),
-        joinedload(Trabajador.horario_rel),
-        joinedload(Trabajador.centro_trabajo_rel),
-        joinedload(Trabajador.grado_estudios_rel),
-        joinedload(Trabajador.rol_rel)
-    ).filter(Trabajador.id == current_user.id).first()
+    parcial = bool(fields or include)
+    if parcial:
+        try:
+            campos, relaciones = parsear_campos(fields, include)
+        except ValueError as ve:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(ve)
+            )
+        opciones = opciones_carga(campos, relaciones)
+    else:
+        # Solo los campos y relaciones que usa la respuesta por defecto
+        opciones = opciones_carga(
+            ["id", "nombre", "apellidoPaterno", "apellidoMaterno", "rfc", "correo", "puesto"],
+            ["departamento_rel", "rol_rel"]
+        )
+    
+    trabajador_completo = db.query(Trabajador).options(*opciones).filter(
+        Trabajador.id == current_user.id
+    ).first()
     
     if not trabajador_completo:
         raise HTTPException(
@@ -121,6 +139,9 @@ async def get_current_user_info(
             detail="Usuario no encontrado"
         )
     
+    if parcial:
+        return jsonable_encoder(serializar_trabajador(trabajador_completo, campos, relaciones))
+    
     return {
         "id": trabajador_completo.id,
         "nombre": trabajador_completo.nombre,
@@ -133,6 +154,18 @@ async def get_current_user_info(
         "rol": trabajador_completo.rol_rel.descripcion if trabajador_completo.rol_rel else None
     }
 
+@router.get("/me/puntualidad")
+async def get_current_user_puntualidad(
+    fecha: Optional[date] = Query(None, description="Día de referencia (por defecto, hoy)"),
+    current_user: Trabajador = Depends(get_current_trabajador),
+    db: Session = Depends(get_db)
+):
+    """
+    Retardos, faltas y justificaciones del usuario actual en la quincena y el
+    mes de la fecha, con su índice de puntualidad
+    """
+    return obtener_puntualidad(db, current_user.id, fecha)
+
 @router.put("/me")
 async def update_current_user_profile(
     update_data: dict,
@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Literal
 from datetime import datetime, date, time
 from app.database import get_db
 from app.models.models import DiaFestivo, RegistroAsistencia
 from app.schemas.schemas import (
     DiaFestivoCreate,
     DiaFestivoUpdate,
-    DiaFestivoOut
+    DiaFestivoOut,
+    PaginaCursor
 )
 from app.services.auth_service import get_current_trabajador, check_admin_permissions
+from app.utils.helpers import paginar_por_cursor, estimar_total
 from pydantic import BaseModel, validator
 from typing import Union
 
@@ -74,12 +76,15 @@ def create_dia_festivo(
     
     return db_dia_festivo
 
-@router.get("/dias-festivos", response_model=List[DiaFestivoOut])
+@router.get("/dias-festivos", response_model=Union[List[DiaFestivoOut], PaginaCursor[DiaFestivoOut]])
 def get_dias_festivos(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     anio: Optional[int] = Query(None, description="Filtrar por año"),
     mes: Optional[int] = Query(None, ge=1, le=12, description="Filtrar por mes"),
+    paginacion: Literal["offset", "cursor"] = Query("offset", description="Modo de paginación"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página anterior (activa el modo cursor)"),
+    incluir_total: bool = Query(False, description="Incluir total estimado (solo modo cursor)"),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_trabajador)
 ):
@@ -118,6 +123,24 @@ def get_dias_festivos(
             DiaFestivo.fecha <= fecha_fin
         )
     
+    # Paginación por cursor (keyset sobre fecha e ID)
+    if cursor or paginacion == "cursor":
+        total_estimado = estimar_total(db, query, "diasfestivos") if incluir_total else None
+        try:
+            dias, siguiente_cursor = paginar_por_cursor(
+                query,
+                [DiaFestivo.fecha, DiaFestivo.id],
+                cursor,
+                limit,
+                clave=lambda d: (d.fecha.isoformat(), d.id)
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        return {"items": dias, "next_cursor": siguiente_cursor, "total_estimado": total_estimado}
+    
     # Ordenar por fecha
     query = query.order_by(DiaFestivo.fecha)
     
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime, time
+from typing import List, Optional, Literal, Union
+from datetime import datetime, date, time
 from app.database import get_db
 from app.models.models import (
     Horario, 
@@ -15,9 +15,15 @@ from app.schemas.schemas import (
     HorarioOut,
     AsignacionHorarioCreate,
     AsignacionHorarioOut,
-    HorarioDetalladoOut
+    AsignacionHorarioMasivaCreate,
+    HorarioDetalladoOut,
+    PaginaCursor
 )
 from app.services.auth_service import get_current_trabajador, check_admin_permissions
+from app.services.cache_reportes import invalidar, VERSION_GLOBAL
+from app.services.recalculo_service import recalcular_estatus
+from app.services.horarios_service import historial_inicial
+from app.utils.helpers import paginar_por_cursor, estimar_total
 
 router = APIRouter()
 
@@ -59,11 +65,14 @@ def create_horario(
             detail=f"Error al crear horario: {str(e)}"
         )
 
-@router.get("/horarios", response_model=List[HorarioOut])
+@router.get("/horarios", response_model=Union[List[HorarioOut], PaginaCursor[HorarioOut]])
 def get_horarios(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     descripcion: Optional[str] = Query(None, description="Filtrar por descripción"),
+    paginacion: Literal["offset", "cursor"] = Query("offset", description="Modo de paginación"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página anterior (activa el modo cursor)"),
+    incluir_total: bool = Query(False, description="Incluir total estimado (solo modo cursor)"),
     db: Session = Depends(get_db),
     current_user: Trabajador = Depends(get_current_trabajador)
 ):
@@ -75,11 +84,27 @@ def get_horarios(
         if descripcion:
             query = query.filter(Horario.descripcion.ilike(f"%{descripcion}%"))
         
+        # Paginación por cursor (keyset sobre el ID)
+        if cursor or paginacion == "cursor":
+            total_estimado = estimar_total(db, query, "horarios") if incluir_total else None
+            try:
+                horarios, siguiente_cursor = paginar_por_cursor(
+                    query, [Horario.id], cursor, limit, clave=lambda h: (h.id,)
+                )
+            except ValueError as ve:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(ve)
+                )
+            return {"items": horarios, "next_cursor": siguiente_cursor, "total_estimado": total_estimado}
+        
         # Aplicar paginación
         horarios = query.offset(skip).limit(limit).all()
         
         return horarios
         
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -251,11 +276,18 @@ def asignar_horario_a_trabajador(
                 detail=f"Trabajador con ID {asignacion.id_trabajador} no encontrado"
             )
         
+        fecha_inicio = asignacion.fehcaInicio or datetime.now()
+        
+        # Sin historial, guardar antes el horario que tenía desde su ingreso
+        previo = historial_inicial(db, [trabajador.id], fecha_inicio)
+        if previo:
+            db.add(AsignacionHorario(**previo[0]))
+        
         # Crear la asignación histórica
         db_asignacion = AsignacionHorario(
             id_trabajador=asignacion.id_trabajador,
             id_horario=horario_id,
-            fehcaInicio=asignacion.fehcaInicio or datetime.now()
+            fehcaInicio=fecha_inicio
         )
         db.add(db_asignacion)
         
@@ -277,6 +309,94 @@ def asignar_horario_a_trabajador(
             detail=f"Error al asignar horario: {str(e)}"
         )
 
+@router.post("/horarios/{horario_id}/asignar-masivo", status_code=status.HTTP_201_CREATED)
+def asignar_horario_masivo(
+    horario_id: int,
+    asignacion: AsignacionHorarioMasivaCreate,
+    db: Session = Depends(get_db),
+    current_user: Trabajador = Depends(check_admin_permissions)
+):
+    """
+    Asignar un horario a muchos trabajadores a la vez (un departamento, una
+    lista de IDs o los que tienen cierto horario), en una sola transacción
+    """
+    if asignacion.departamento_id is None and asignacion.trabajador_ids is None and asignacion.id_horario_actual is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Indique departamento_id, trabajador_ids o id_horario_actual"
+        )
+
+    try:
+        horario = db.query(Horario.id).filter(Horario.id == horario_id).first()
+        if not horario:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Horario con ID {horario_id} no encontrado"
+            )
+
+        # Trabajadores del alcance con una sola consulta
+        filtros = []
+        if asignacion.departamento_id is not None:
+            filtros.append(Trabajador.departamento == asignacion.departamento_id)
+        if asignacion.trabajador_ids is not None:
+            filtros.append(Trabajador.id.in_(asignacion.trabajador_ids))
+        if asignacion.id_horario_actual is not None:
+            filtros.append(Trabajador.id_horario == asignacion.id_horario_actual)
+        if asignacion.solo_activos:
+            filtros.append(Trabajador.estado == True)
+
+        trabajador_ids = [id_trabajador for (id_trabajador,) in db.query(Trabajador.id).filter(*filtros).order_by(Trabajador.id)]
+
+        if asignacion.trabajador_ids is not None:
+            faltantes = sorted(set(asignacion.trabajador_ids) - set(trabajador_ids))
+            if faltantes:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Trabajadores que no existen o no están en el alcance: {faltantes}"
+                )
+
+        fecha_inicio = asignacion.fehcaInicio or datetime.now()
+
+        if trabajador_ids:
+            # Historial y horario actual con operaciones por conjunto; a los
+            # trabajadores sin historial se les guarda antes el horario que tenían
+            db.bulk_insert_mappings(AsignacionHorario, historial_inicial(db, trabajador_ids, fecha_inicio) + [
+                {"id_trabajador": id_trabajador, "id_horario": horario_id, "fehcaInicio": fecha_inicio}
+                for id_trabajador in trabajador_ids
+            ])
+            db.query(Trabajador).filter(
+                Trabajador.id.in_(trabajador_ids)
+            ).update({Trabajador.id_horario: horario_id}, synchronize_session=False)
+            db.commit()
+
+            # Los cambios por conjunto no pasan por los eventos de la sesión:
+            # invalidar una sola vez los datos que dependen de los horarios
+            invalidar({VERSION_GLOBAL})
+
+        print(f"🕐 Horario {horario_id} asignado a {len(trabajador_ids)} trabajadores desde {fecha_inicio}")
+
+        recalculo = None
+        if asignacion.recalcular and trabajador_ids and fecha_inicio.date() <= date.today():
+            recalculo = recalcular_estatus(db, fecha_inicio.date(), date.today(), trabajador_ids)
+
+        return {
+            "horario_id": horario_id,
+            "fehcaInicio": fecha_inicio,
+            "asignados": len(trabajador_ids),
+            "trabajador_ids": trabajador_ids,
+            "recalculo": recalculo
+        }
+
+    except HTTPException as he:
+        db.rollback()
+        raise he
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al asignar horario: {str(e)}"
+        )
+
 @router.get("/trabajadores/{trabajador_id}/horarios", response_model=List[AsignacionHorarioOut])
 def get_historial_horarios_trabajador(
     trabajador_id: int,
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Literal
 from datetime import datetime, date, time
 from app.database import get_db
 from app.models.models import (
@@ -13,11 +13,18 @@ from app.schemas.schemas import (
     JustificacionCreate,
     JustificacionUpdate,
     JustificacionOut,
+    JustificacionPeriodoCreate,
+    JustificacionPeriodoOut,
     ReglaJustificacionCreate,
     ReglaJustificacionUpdate,
     ReglaJustificacionOut
 )
 from app.services.auth_service import get_current_trabajador, check_admin_permissions
+from app.config import settings
+from app.services.derivados_service import actualizar_derivados_dia, actualizar_derivados_rango
+from app.services.datos_reporte import rango_justificacion, opciones_justificacion
+from app.services.justificaciones_service import crear_justificaciones_periodo, revertir_justificacion_periodo
+from app.utils.helpers import paginar_por_cursor, estimar_total
 
 router = APIRouter()
 
@@ -76,10 +83,59 @@ def create_justificacion(
         )
         db.add(nuevo_registro)
     
+    actualizar_derivados_dia(db, justificacion.id_trabajador, justificacion.fecha)
     db.commit()
     db.refresh(db_justificacion)
     return db_justificacion
 
+@router.post("/justificaciones/periodo", response_model=List[JustificacionPeriodoOut], status_code=status.HTTP_201_CREATED)
+def create_justificaciones_periodo(
+    datos: JustificacionPeriodoCreate,
+    db: Session = Depends(get_db),
+    current_user: Trabajador = Depends(check_admin_permissions)
+):
+    """
+    Justifica un rango de días (fecha_inicio a fecha_fin) para uno o varios
+    trabajadores en una sola transacción, en lugar de una petición por día
+    """
+    dias = (datos.fecha_fin - datos.fecha_inicio).days + 1
+    if dias > settings.DIAS_MAXIMOS_JUSTIFICACION:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El período no puede abarcar más de {settings.DIAS_MAXIMOS_JUSTIFICACION} días"
+        )
+
+    # Verificar todos los trabajadores con una sola consulta
+    existentes = {
+        id_trabajador for (id_trabajador,) in
+        db.query(Trabajador.id).filter(Trabajador.id.in_(datos.trabajador_ids))
+    }
+    faltantes = [id_trabajador for id_trabajador in datos.trabajador_ids if id_trabajador not in existentes]
+    if faltantes:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Trabajadores que no existen: {faltantes}"
+        )
+
+    regla = db.query(ReglaJustificacion).filter(ReglaJustificacion.id == datos.id_descripcion).first()
+    if not regla:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Regla de justificación con ID {datos.id_descripcion} no existe"
+        )
+
+    try:
+        return crear_justificaciones_periodo(
+            db, datos.trabajador_ids, datos.fecha_inicio, datos.fecha_fin, datos.id_descripcion
+        )
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al crear las justificaciones del período: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al crear las justificaciones: {str(e)}"
+        )
+
 @router.get("/justificaciones")
 def get_justificaciones(
     skip: int = 0, 
@@ -88,6 +144,9 @@ def get_justificaciones(
     fecha_fin: Optional[date] = None,
     id_trabajador: Optional[int] = None,  # CORREGIDO: cambio de id_empleado a id_trabajador
     id_descripcion: Optional[int] = None, 
+    paginacion: Literal["offset", "cursor"] = Query("offset", description="Modo de paginación"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página anterior (activa el modo cursor)"),
+    incluir_total: bool = Query(False, description="Incluir total estimado (solo modo cursor)"),
     db: Session = Depends(get_db),
     current_user: Trabajador = Depends(get_current_trabajador)
 ):
@@ -101,7 +160,7 @@ def get_justificaciones(
         ReglaJustificacion
     ).join(
         Trabajador, Justificacion.id_trabajador == Trabajador.id
-    ).join(
+    ).options(*opciones_justificacion()).join(
         ReglaJustificacion, Justificacion.id_descripcion == ReglaJustificacion.id
     )
     
@@ -119,7 +178,28 @@ def get_justificaciones(
         query = query.filter(Justificacion.id_descripcion == id_descripcion)
     
     # Ejecutar la consulta
-    resultados = query.offset(skip).limit(limit).all()
+    siguiente_cursor = None
+    total_estimado = None
+    modo_cursor = bool(cursor) or paginacion == "cursor"
+    if modo_cursor:
+        if incluir_total:
+            total_estimado = estimar_total(db, query, "justificaciones")
+        try:
+            resultados, siguiente_cursor = paginar_por_cursor(
+                query,
+                [Justificacion.fecha, Justificacion.id],
+                cursor,
+                limit,
+                clave=lambda fila: (fila[0].fecha.isoformat(), fila[0].id),
+                descendente=True
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    else:
+        resultados = query.offset(skip).limit(limit).all()
     
     # Formatear la respuesta con toda la información necesaria
     justificaciones_completas = []
@@ -128,6 +208,7 @@ def get_justificaciones(
             "id": justificacion.id,
             "id_trabajador": justificacion.id_trabajador,
             "fecha": justificacion.fecha,
+            "fecha_fin": justificacion.fecha_fin if settings.JUSTIFICACIONES_POR_PERIODO_ACTIVO else None,
             "id_descripcion": justificacion.id_descripcion,
             "trabajador": {
                 "id": trabajador.id,
@@ -141,6 +222,13 @@ def get_justificaciones(
             }
         })
     
+    if modo_cursor:
+        return {
+            "items": justificaciones_completas,
+            "next_cursor": siguiente_cursor,
+            "total_estimado": total_estimado
+        }
+    
     return justificaciones_completas
 
 @router.get("/justificaciones/{justificacion_id}")
@@ -159,7 +247,7 @@ def get_justificacion(
         ReglaJustificacion
     ).join(
         Trabajador, Justificacion.id_trabajador == Trabajador.id
-    ).join(
+    ).options(*opciones_justificacion()).join(
         ReglaJustificacion, Justificacion.id_descripcion == ReglaJustificacion.id
     ).filter(
         Justificacion.id == justificacion_id
@@ -177,6 +265,7 @@ def get_justificacion(
         "id": justificacion.id,
         "id_trabajador": justificacion.id_trabajador,
         "fecha": justificacion.fecha,
+        "fecha_fin": justificacion.fecha_fin if settings.JUSTIFICACIONES_POR_PERIODO_ACTIVO else None,
         "id_descripcion": justificacion.id_descripcion,
         "trabajador": {
             "id": trabajador.id,
@@ -197,7 +286,7 @@ def update_justificacion(
     db: Session = Depends(get_db),
     current_user: Trabajador = Depends(check_admin_permissions)
 ):
-    db_justificacion = db.query(Justificacion).filter(Justificacion.id == justificacion_id).first()
+    db_justificacion = db.query(Justificacion).options(*opciones_justificacion()).filter(Justificacion.id == justificacion_id).first()
     if not db_justificacion:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -225,9 +314,15 @@ def update_justificacion(
                 detail=f"Regla de justificación con ID {update_data['id_descripcion']} no existe"
             )
     
+    # Días cubiertos antes del cambio (la fecha o el trabajador pueden cambiar)
+    rango_anterior = (db_justificacion.id_trabajador, *rango_justificacion(db_justificacion))
+    
     for key, value in update_data.items():
         setattr(db_justificacion, key, value)
     
+    for id_trabajador, inicio, fin in {rango_anterior, (db_justificacion.id_trabajador, *rango_justificacion(db_justificacion))}:
+        actualizar_derivados_rango(db, [id_trabajador], inicio, fin)
+    
     db.commit()
     db.refresh(db_justificacion)
     return db_justificacion
@@ -238,28 +333,36 @@ def delete_justificacion(
     db: Session = Depends(get_db),
     current_user: Trabajador = Depends(check_admin_permissions)
 ):
-    db_justificacion = db.query(Justificacion).filter(Justificacion.id == justificacion_id).first()
+    db_justificacion = db.query(Justificacion).options(*opciones_justificacion()).filter(Justificacion.id == justificacion_id).first()
     if not db_justificacion:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Justificación con ID {justificacion_id} no encontrada"
         )
     
-    # Obtener y actualizar el registro de asistencia correspondiente si existe - CORREGIDO
-    fecha_inicio = datetime.combine(db_justificacion.fecha.date(), time.min)
-    fecha_fin = datetime.combine(db_justificacion.fecha.date(), time.max)
+    # Días que cubre la justificación (uno, salvo las justificaciones por período)
+    inicio, fin = rango_justificacion(db_justificacion)
     
-    registro_asistencia = db.query(RegistroAsistencia).filter(
-        RegistroAsistencia.id_trabajador == db_justificacion.id_trabajador,  # CORREGIDO
-        RegistroAsistencia.fecha >= fecha_inicio,
-        RegistroAsistencia.fecha <= fecha_fin
-    ).first()
+    # Obtener y actualizar el registro de asistencia correspondiente si existe - CORREGIDO
+    fecha_inicio = datetime.combine(inicio, time.min)
+    fecha_fin = datetime.combine(fin, time.max)
     
-    if registro_asistencia and registro_asistencia.estatus == "JUSTIFICADO":
-        # Si hay un registro de asistencia justificado, actualizarlo a FALTA
-        registro_asistencia.estatus = "FALTA"
+    if inicio == fin:
+        registro_asistencia = db.query(RegistroAsistencia).filter(
+            RegistroAsistencia.id_trabajador == db_justificacion.id_trabajador,  # CORREGIDO
+            RegistroAsistencia.fecha >= fecha_inicio,
+            RegistroAsistencia.fecha <= fecha_fin
+        ).first()
+        
+        if registro_asistencia and registro_asistencia.estatus == "JUSTIFICADO":
+            # Si hay un registro de asistencia justificado, actualizarlo a FALTA
+            registro_asistencia.estatus = "FALTA"
+    else:
+        # Justificación por período: los días hábiles que no cubre otra justificación pasan a FALTA
+        revertir_justificacion_periodo(db, db_justificacion)
     
     db.delete(db_justificacion)
+    actualizar_derivados_rango(db, [db_justificacion.id_trabajador], inicio, fin)
     db.commit()
     return None
 
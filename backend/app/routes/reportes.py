@@ -1,26 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse, FileResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_, cast, Date
-from typing import List, Optional
-from datetime import datetime, date, time, timedelta
+from typing import List, Optional, Literal
+from datetime import datetime, date, time
 import calendar
+from app.config import settings
 from app.database import get_db
 from app.models.models import (
-    RegistroAsistencia, 
     Trabajador,
     Departamento,
     Justificacion,
     ReglaRetardo,
-    ReglaJustificacion,
-    DiaFestivo
+    ReglaJustificacion
 )
-from app.schemas.schemas import ReporteFiltros
+from app.schemas.schemas import ReporteFiltros, TrabajoReporteCreate, TrabajoReporteOut
 from app.services.auth_service import get_current_trabajador, check_admin_permissions
-import csv
-import io
+from app.services.datos_reporte import cargar_datos_reporte
+from app.services.derivados_service import actualizar_derivados_dia
+from app.services.matriz_asistencia import MatrizAsistencia
+from app.services.reporte_sevice import (
+    resumir_trabajador,
+    resumir_asistencias_columnar,
+    generar_reporte_retardos_faltas,
+    generar_detalle_retardos_faltas
+)
+from app.services.agregados_service import generar_resumen_asistencias_por_periodo
+from app.services.horas_trabajadas_service import generar_reporte_horas_trabajadas
+from app.services.mapa_asistencia_service import consultar_ausencias, consultar_ausencias_consecutivas
+from app.services.llegadas_service import generar_distribucion_llegadas, AGRUPACIONES, MINUTOS_DIA
+from app.services.exportacion_service import generar_csv_reporte, generar_xlsx_reporte
+from app.services.cache_reportes import respuesta_cacheada
+from app.services.trabajos_service import enviar_trabajo, obtener_trabajo, ruta_archivo
 
 router = APIRouter()
 
+MEDIA_TYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
 @router.get("/reportes/asistencias-diarias")
 def get_reporte_asistencias_diarias(
     fecha: Optional[date] = None,
@@ -32,40 +48,17 @@ def get_reporte_asistencias_diarias(
     if not fecha:
         fecha = date.today()
     
-    # Definir el rango de fechas para el día
-    fecha_inicio = datetime.combine(fecha, time.min)
-    fecha_fin = datetime.combine(fecha, time.max)
-    
-    # Consulta base para obtener trabajadores
-    query_trabajadores = db.query(Trabajador)
-    
-    # Filtrar por departamento si se proporciona
-    if departamento_id:
-        query_trabajadores = query_trabajadores.filter(Trabajador.departamento == departamento_id)
-    
-    # Filtrar solo trabajadores activos
-    query_trabajadores = query_trabajadores.filter(Trabajador.estado == True)
-    
-    # Obtener todos los trabajadores que cumplen con los criterios
-    trabajadores = query_trabajadores.all()
+    # Cargar trabajadores, registros y justificaciones del día en bloque
+    datos = cargar_datos_reporte(db, fecha, fecha, departamento_id=departamento_id)
     
     # Construir el diccionario de resultados
     resultados = []
     
-    for trabajador in trabajadores:
-        # Buscar registro de asistencia para este trabajador en la fecha indicada
-        asistencia = db.query(RegistroAsistencia).filter(
-            RegistroAsistencia.id_trabajador == trabajador.id,
-            RegistroAsistencia.fecha >= fecha_inicio,
-            RegistroAsistencia.fecha <= fecha_fin
-        ).first()
-        
-        # Buscar justificación para este trabajador en la fecha indicada
-        justificacion = db.query(Justificacion).filter(
-            Justificacion.id_trabajador == trabajador.id,
-            Justificacion.fecha >= fecha_inicio,
-            Justificacion.fecha <= fecha_fin
-        ).first()
+    for trabajador in datos.trabajadores:
+        # Registro de asistencia y justificación del trabajador en la fecha indicada
+        registros = datos.registros_del_dia(trabajador.id, fecha)
+        asistencia = registros[0] if registros else None
+        justificacion, _ = datos.justificacion_del_dia(trabajador.id, fecha)
         
         # Determinar el estatus
         estatus = "NO_REGISTRADO"
@@ -78,15 +71,11 @@ def get_reporte_asistencias_diarias(
             estatus = "JUSTIFICADO"
             hora_registro = justificacion.fecha
         
-        # Obtener el nombre del departamento
-        departamento = db.query(Departamento).filter(Departamento.id == trabajador.departamento).first()
-        departamento_nombre = departamento.descripcion if departamento else "Sin departamento"
-        
         resultados.append({
             "id": trabajador.id,
             "nombre": f"{trabajador.nombre} {trabajador.apellidoPaterno} {trabajador.apellidoMaterno}",
             "rfc": trabajador.rfc,
-            "departamento": departamento_nombre,
+            "departamento": datos.nombre_departamento(trabajador),
             "puesto": trabajador.puesto,
             "estatus": estatus,
             "hora_registro": hora_registro
@@ -120,6 +109,9 @@ def get_reporte_asistencias_mensuales(
     anio: int = datetime.now().year,
     mes: int = datetime.now().month,
     departamento_id: Optional[int] = None,
+    formato: Literal["objetos", "columnar"] = Query(
+        "objetos", alias="format", description="columnar: eje de fechas compartido y arreglos por trabajador"
+    ),
     db: Session = Depends(get_db),
     current_user: Trabajador = Depends(get_current_trabajador)
 ):
@@ -141,136 +133,48 @@ def get_reporte_asistencias_mensuales(
     fecha_inicio = date(anio, mes, 1)
     fecha_fin = date(anio, mes, ultimo_dia)
     
-    # Consulta base para obtener trabajadores
-    query_trabajadores = db.query(Trabajador)
-    
-    # Filtrar por departamento si se proporciona
-    if departamento_id:
-        query_trabajadores = query_trabajadores.filter(Trabajador.departamento == departamento_id)
-    
-    # Filtrar solo trabajadores activos
-    query_trabajadores = query_trabajadores.filter(Trabajador.estado == True)
-    
-    # Obtener todos los trabajadores que cumplen con los criterios
-    trabajadores = query_trabajadores.all()
-    
-    # Obtener todos los días festivos del mes
-    dias_festivos = db.query(DiaFestivo).filter(
-        func.extract('year', DiaFestivo.fecha) == anio,
-        func.extract('month', DiaFestivo.fecha) == mes
-    ).all()
-    
-    dias_festivos_set = {festivo.fecha.date() for festivo in dias_festivos}
-    
-    # Construir el diccionario de resultados
-    resultados = []
-    
-    for trabajador in trabajadores:
-        # Obtener todas las asistencias del trabajador para el mes
-        asistencias = db.query(RegistroAsistencia).filter(
-            RegistroAsistencia.id_trabajador == trabajador.id,
-            func.extract('year', RegistroAsistencia.fecha) == anio,
-            func.extract('month', RegistroAsistencia.fecha) == mes
-        ).all()
-        
-        # Obtener todas las justificaciones del trabajador para el mes
-        justificaciones = db.query(Justificacion).filter(
-            Justificacion.id_trabajador == trabajador.id,
-            func.extract('year', Justificacion.fecha) == anio,
-            func.extract('month', Justificacion.fecha) == mes
-        ).all()
-        
-        # Crear diccionarios para mapear fechas a asistencias y justificaciones
-        asistencias_por_fecha = {a.fecha.date(): a for a in asistencias}
-        justificaciones_por_fecha = {j.fecha.date(): j for j in justificaciones}
-        
-        # Obtener el nombre del departamento
-        departamento = db.query(Departamento).filter(Departamento.id == trabajador.departamento).first()
-        departamento_nombre = departamento.descripcion if departamento else "Sin departamento"
-        
-        # Calcular estadísticas
-        dias_laborables = 0
-        asistencias_count = 0
-        retardos_count = 0
-        faltas_count = 0
-        justificados_count = 0
+    def generar():
+        # Cargar trabajadores, registros, justificaciones y días festivos del mes en bloque
+        datos = cargar_datos_reporte(
+            db,
+            fecha_inicio,
+            fecha_fin,
+            departamento_id=departamento_id,
+            desde_resumen=settings.RESUMEN_DIARIO_ACTIVO
+        )
+        dias_festivos = datos.dias_festivos
         
-        # Registros diarios
-        registros_diarios = []
+        # Estadísticas de todos los trabajadores sobre la matriz del mes
+        matriz = MatrizAsistencia(datos)
+        reporte = {
+            "anio": anio,
+            "mes": mes,
+            "departamento": departamento_id,
+            "dias_festivos": [{"fecha": festivo.fecha, "descripcion": festivo.descripcion} for festivo in dias_festivos]
+        }
         
-        # Iterar por cada día del mes
-        fecha_actual = fecha_inicio
-        while fecha_actual <= fecha_fin:
-            # Verificar si es fin de semana (5 = sábado, 6 = domingo)
-            es_fin_semana = fecha_actual.weekday() >= 5
-            
-            # Verificar si es día festivo
-            es_festivo = fecha_actual in dias_festivos_set
-            
-            # Si no es fin de semana ni día festivo, es día laborable
-            if not es_fin_semana and not es_festivo:
-                dias_laborables += 1
-                
-                # Determinar el estatus para este día
-                estatus = "NO_REGISTRADO"
-                hora_registro = None
-                
-                if fecha_actual in asistencias_por_fecha:
-                    estatus = asistencias_por_fecha[fecha_actual].estatus
-                    hora_registro = asistencias_por_fecha[fecha_actual].fecha
-                    
-                    if estatus == "ASISTENCIA":
-                        asistencias_count += 1
-                    elif "RETARDO" in estatus:
-                        retardos_count += 1
-                    elif estatus == "FALTA":
-                        faltas_count += 1
-                
-                elif fecha_actual in justificaciones_por_fecha:
-                    estatus = "JUSTIFICADO"
-                    hora_registro = justificaciones_por_fecha[fecha_actual].fecha
-                    justificados_count += 1
-                
-                # Agregar registro diario
-                registros_diarios.append({
-                    "fecha": fecha_actual,
-                    "estatus": estatus,
-                    "hora_registro": hora_registro
-                })
-            
-            fecha_actual += timedelta(days=1)
+        if formato == "columnar":
+            reporte["formato"] = "columnar"
+            reporte.update(resumir_asistencias_columnar(matriz))
+        else:
+            reporte["trabajadores"] = [resumir_trabajador(matriz, i) for i in range(len(matriz.trabajadores))]
         
-        resultados.append({
-            "id": trabajador.id,
-            "nombre": f"{trabajador.nombre} {trabajador.apellidoPaterno} {trabajador.apellidoMaterno}",
-            "rfc": trabajador.rfc,
-            "departamento": departamento_nombre,
-            "puesto": trabajador.puesto,
-            "estadisticas": {
-                "dias_laborables": dias_laborables,
-                "asistencias": asistencias_count,
-                "retardos": retardos_count,
-                "faltas": faltas_count,
-                "justificados": justificados_count,
-                "porcentaje_asistencia": (asistencias_count / dias_laborables) * 100 if dias_laborables > 0 else 0
-            },
-            "registros_diarios": registros_diarios
-        })
-    
-    return {
-        "anio": anio,
-        "mes": mes,
-        "departamento": departamento_id,
-        "dias_festivos": [{"fecha": festivo.fecha, "descripcion": festivo.descripcion} for festivo in dias_festivos],
-        "trabajadores": resultados
-    }
+        return reporte
+    
+    # Los meses ya cerrados se sirven desde la caché hasta que cambien sus datos
+    return respuesta_cacheada(
+        "asistencias-mensuales",
+        {"departamento_id": departamento_id, "formato": formato},
+        fecha_inicio,
+        fecha_fin,
+        generar
+    )
 
 @router.get("/reportes/asistencias-mensuales-csv")
 def get_reporte_asistencias_mensuales_csv(
     anio: int = datetime.now().year,
     mes: int = datetime.now().month,
     departamento_id: Optional[int] = None,
-    db: Session = Depends(get_db),
     current_user: Trabajador = Depends(get_current_trabajador)
 ):
     # Validar mes y año
@@ -291,69 +195,217 @@ def get_reporte_asistencias_mensuales_csv(
     fecha_inicio = date(anio, mes, 1)
     fecha_fin = date(anio, mes, ultimo_dia)
     
-    # Obtener datos del reporte
-    reporte = get_reporte_asistencias_mensuales(
-        anio=anio,
-        mes=mes,
-        departamento_id=departamento_id,
-        db=db,
-        current_user=current_user
+    # Enviar el CSV a medida que se generan las filas
+    return StreamingResponse(
+        generar_csv_reporte(fecha_inicio, fecha_fin, departamento_id),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=asistencias_{anio}_{mes}.csv"}
     )
+
+@router.get("/reportes/asistencias-mensuales-xlsx")
+def get_reporte_asistencias_mensuales_xlsx(
+    anio: int = datetime.now().year,
+    mes: int = datetime.now().month,
+    departamento_id: Optional[int] = None,
+    por_departamento: bool = Query(True, description="Una hoja por departamento"),
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Exporta el reporte mensual de asistencias a Excel, en streaming
+    """
+    # Validar mes y año
+    if mes < 1 or mes > 12:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El mes debe estar entre 1 y 12"
+        )
     
-    # Crear buffer para el CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
+    if anio < 2000 or anio > 2100:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El año debe estar entre 2000 y 2100"
+        )
     
-    # Escribir encabezados
-    headers = ["ID", "Nombre", "RFC", "Departamento", "Puesto", "Días Laborables", 
-               "Asistencias", "Retardos", "Faltas", "Justificados", "% Asistencia"]
+    # Obtener el primer y último día del mes
+    _, ultimo_dia = calendar.monthrange(anio, mes)
+    fecha_inicio = date(anio, mes, 1)
+    fecha_fin = date(anio, mes, ultimo_dia)
     
-    # Agregar un encabezado para cada día del mes
-    for dia in range(1, ultimo_dia + 1):
-        fecha = date(anio, mes, dia)
-        headers.append(f"{dia}/{mes}/{anio}")
+    return StreamingResponse(
+        generar_xlsx_reporte(fecha_inicio, fecha_fin, departamento_id, por_departamento=por_departamento),
+        media_type=MEDIA_TYPE_XLSX,
+        headers={"Content-Disposition": f"attachment; filename=asistencias_{anio}_{mes}.xlsx"}
+    )
+
+@router.get("/reportes/asistencias-csv")
+def get_reporte_asistencias_csv(
+    fecha_inicio: date = Query(..., description="Fecha de inicio"),
+    fecha_fin: date = Query(..., description="Fecha de fin"),
+    departamento_id: Optional[int] = Query(None, description="ID del departamento"),
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Exporta el reporte de asistencias de cualquier período a CSV, en streaming
+    """
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha de fin debe ser posterior a la fecha de inicio"
+        )
     
-    writer.writerow(headers)
+    return StreamingResponse(
+        generar_csv_reporte(fecha_inicio, fecha_fin, departamento_id),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=asistencias_{fecha_inicio}_{fecha_fin}.csv"}
+    )
+
+
+@router.get("/reportes/asistencias-periodo")
+def get_reporte_asistencias_periodo(
+    fecha_inicio: date = Query(..., description="Fecha de inicio"),
+    fecha_fin: date = Query(..., description="Fecha de fin"),
+    departamento_id: Optional[int] = Query(None, description="ID del departamento"),
+    trabajador_id: Optional[int] = Query(None, description="ID del trabajador"),
+    db: Session = Depends(get_db),
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Estadísticas de asistencia por trabajador de un período arbitrario
+    (trimestre, año...). Los meses cerrados se suman desde los agregados mensuales.
+    """
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha de fin debe ser posterior a la fecha de inicio"
+        )
     
-    # Escribir datos de cada trabajador
-    for trabajador in reporte["trabajadores"]:
-        # Crear un diccionario para mapear fechas a estatus
-        estatus_por_fecha = {r["fecha"]: r["estatus"] for r in trabajador["registros_diarios"]}
-        
-        # Datos básicos del trabajador
-        row = [
-            trabajador["id"],
-            trabajador["nombre"],
-            trabajador["rfc"],
-            trabajador["departamento"],
-            trabajador["puesto"],
-            trabajador["estadisticas"]["dias_laborables"],
-            trabajador["estadisticas"]["asistencias"],
-            trabajador["estadisticas"]["retardos"],
-            trabajador["estadisticas"]["faltas"],
-            trabajador["estadisticas"]["justificados"],
-            f"{trabajador['estadisticas']['porcentaje_asistencia']:.2f}%"
-        ]
-        
-        # Agregar estatus para cada día del mes
-        for dia in range(1, ultimo_dia + 1):
-            fecha = date(anio, mes, dia)
-            estatus = estatus_por_fecha.get(fecha, "")
-            row.append(estatus)
-        
-        writer.writerow(row)
+    return respuesta_cacheada(
+        "asistencias-periodo",
+        {"departamento_id": departamento_id, "trabajador_id": trabajador_id},
+        fecha_inicio,
+        fecha_fin,
+        lambda: generar_resumen_asistencias_por_periodo(db, fecha_inicio, fecha_fin, departamento_id, trabajador_id)
+    )
+
+@router.get("/reportes/horas-trabajadas")
+def get_reporte_horas_trabajadas(
+    fecha_inicio: date = Query(..., description="Fecha de inicio"),
+    fecha_fin: date = Query(..., description="Fecha de fin"),
+    departamento_id: Optional[int] = Query(None, description="ID del departamento"),
+    trabajador_id: Optional[int] = Query(None, description="ID del trabajador"),
+    detalle: bool = Query(False, description="Incluir los minutos de cada día"),
+    db: Session = Depends(get_db),
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Minutos trabajados (por pares de entrada y salida), programados según el
+    horario vigente, extra y faltantes por trabajador en un período
+    """
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha de fin debe ser posterior a la fecha de inicio"
+        )
     
-    # Preparar la respuesta CSV
-    output.seek(0)
-    content = output.getvalue()
+    return respuesta_cacheada(
+        "horas-trabajadas",
+        {"departamento_id": departamento_id, "trabajador_id": trabajador_id, "detalle": detalle},
+        fecha_inicio,
+        fecha_fin,
+        lambda: generar_reporte_horas_trabajadas(db, fecha_inicio, fecha_fin, departamento_id, trabajador_id, detalle)
+    )
+
+@router.get("/reportes/llegadas")
+def get_distribucion_llegadas(
+    fecha_inicio: date = Query(..., description="Fecha de inicio"),
+    fecha_fin: date = Query(..., description="Fecha de fin"),
+    departamento_id: Optional[int] = Query(None, description="ID del departamento"),
+    centro_trabajo_id: Optional[int] = Query(None, description="ID del centro de trabajo"),
+    agrupar_por: str = Query("departamento", description="departamento o centro_trabajo"),
+    minutos_cubeta: int = Query(15, description="Minutos por cubeta del histograma"),
+    db: Session = Depends(get_db),
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Histograma de horas de llegada, percentiles y retraso respecto al horario
+    por departamento (o centro de trabajo) y día de la semana
+    """
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha de fin debe ser posterior a la fecha de inicio"
+        )
+    
+    if agrupar_por not in AGRUPACIONES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"agrupar_por debe ser uno de: {', '.join(AGRUPACIONES)}"
+        )
     
-    # Crear la respuesta con el archivo CSV
-    response = Response(content=content)
-    response.headers["Content-Disposition"] = f"attachment; filename=asistencias_{anio}_{mes}.csv"
-    response.headers["Content-Type"] = "text/csv"
+    if minutos_cubeta <= 0 or MINUTOS_DIA % minutos_cubeta != 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="minutos_cubeta debe dividir exactamente los 1440 minutos del día"
+        )
+    
+    return respuesta_cacheada(
+        "llegadas",
+        {
+            "departamento_id": departamento_id,
+            "centro_trabajo_id": centro_trabajo_id,
+            "agrupar_por": agrupar_por,
+            "minutos_cubeta": minutos_cubeta
+        },
+        fecha_inicio,
+        fecha_fin,
+        lambda: generar_distribucion_llegadas(
+            db, fecha_inicio, fecha_fin, departamento_id, centro_trabajo_id, agrupar_por, minutos_cubeta
+        )
+    )
+
+@router.get("/reportes/ausencias")
+def get_ausencias(
+    fecha_inicio: date = Query(..., description="Primer día"),
+    fecha_fin: Optional[date] = Query(None, description="Último día (por defecto, el primero)"),
+    departamento_id: Optional[int] = Query(None, description="ID del departamento"),
+    trabajador_id: Optional[int] = Query(None, description="ID del trabajador"),
+    solo_con_ausencias: bool = Query(True, description="Omitir a los trabajadores sin ausencias"),
+    db: Session = Depends(get_db),
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Ausencias sin justificar por trabajador en un día o un rango de días
+    """
+    fecha_fin = fecha_fin or fecha_inicio
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha de fin debe ser posterior a la fecha de inicio"
+        )
     
-    return response
+    return consultar_ausencias(db, fecha_inicio, fecha_fin, departamento_id, trabajador_id, solo_con_ausencias)
 
+@router.get("/reportes/ausencias-consecutivas")
+def get_ausencias_consecutivas(
+    fecha_inicio: date = Query(..., description="Fecha de inicio"),
+    fecha_fin: date = Query(..., description="Fecha de fin"),
+    minimo: int = Query(3, ge=2, description="Ausencias consecutivas mínimas"),
+    departamento_id: Optional[int] = Query(None, description="ID del departamento"),
+    trabajador_id: Optional[int] = Query(None, description="ID del trabajador"),
+    db: Session = Depends(get_db),
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Trabajadores con varias ausencias sin justificar en días laborables
+    consecutivos (los fines de semana y días festivos no cortan la racha)
+    """
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha de fin debe ser posterior a la fecha de inicio"
+        )
+    
+    return consultar_ausencias_consecutivas(db, fecha_inicio, fecha_fin, minimo, departamento_id, trabajador_id)
 
 @router.get("/reportes/justificaciones")
 def get_reporte_justificaciones(
@@ -484,222 +536,190 @@ def get_reporte_retardos_faltas(
     fecha_fin: date = Query(..., description="Fecha de fin"),
     departamento_id: Optional[int] = Query(None, description="ID del departamento"),
     trabajador_id: Optional[int] = Query(None, description="ID del trabajador"),
+    modo: Literal["completo", "resumen"] = Query("completo", description="resumen: solo estadísticas, sin registros diarios"),
     db: Session = Depends(get_db)
 ):
     """
     Genera reporte de retardos y faltas - VERSIÓN CORREGIDA PARA TU SISTEMA
+    
+    Con modo=resumen cada trabajador trae solo sus estadísticas; el detalle
+    diario se consulta con /retardos-faltas/{trabajador_id}/detalle
     """
-    print(f"🔍 DEBUG: Iniciando reporte de {fecha_inicio} a {fecha_fin}")
+    print(f"🔍 DEBUG: Iniciando reporte de {fecha_inicio} a {fecha_fin} (modo {modo})")
     
     try:
-        # Query base de trabajadores activos
-        query_trabajadores = db.query(Trabajador).filter(Trabajador.estado == True)
-        
-        if departamento_id:
-            query_trabajadores = query_trabajadores.filter(
-                Trabajador.departamento == departamento_id
-            )
-        
-        if trabajador_id:
-            query_trabajadores = query_trabajadores.filter(
-                Trabajador.id == trabajador_id
+        return respuesta_cacheada(
+            "retardos-faltas",
+            {"departamento_id": departamento_id, "trabajador_id": trabajador_id, "modo": modo},
+            fecha_inicio,
+            fecha_fin,
+            lambda: generar_reporte_retardos_faltas(
+                db,
+                fecha_inicio,
+                fecha_fin,
+                departamento_id=departamento_id,
+                trabajador_id=trabajador_id,
+                detalle=modo == "completo"
             )
-        
-        trabajadores = query_trabajadores.all()
-        print(f"🔍 DEBUG: Encontrados {len(trabajadores)} trabajadores activos")
-        
-        trabajadores_data = []
-        
-        for trabajador in trabajadores:
-            # Obtener TODOS los registros del período
-            fecha_inicio_dt = datetime.combine(fecha_inicio, time.min)
-            fecha_fin_dt = datetime.combine(fecha_fin, time.max)
-            
-            registros = db.query(RegistroAsistencia).filter(
-                RegistroAsistencia.id_trabajador == trabajador.id,
-                RegistroAsistencia.fecha >= fecha_inicio_dt,
-                RegistroAsistencia.fecha <= fecha_fin_dt
-            ).order_by(RegistroAsistencia.fecha).all()
-            
-            print(f"🔍 DEBUG: Trabajador {trabajador.nombre} tiene {len(registros)} registros totales")
-            
-            # Agrupar registros por día
-            registros_por_dia = {}
-            for registro in registros:
-                fecha_key = registro.fecha.date()
-                if fecha_key not in registros_por_dia:
-                    registros_por_dia[fecha_key] = []
-                registros_por_dia[fecha_key].append(registro)
-            
-            # Inicializar contadores
-            dias_laborables = 0
-            asistencias = 0
-            retardos = 0
-            retardos_menores = 0
-            retardos_mayores = 0
-            faltas = 0
-            registros_diarios = []
-            
-            # Iterar por cada día del período
-            fecha_actual = fecha_inicio
-            while fecha_actual <= fecha_fin:
-                dia_semana = fecha_actual.weekday()
-                
-                # Solo días laborables (Lunes=0 a Viernes=4)
-                if dia_semana < 5:
-                    dias_laborables += 1
-                    
-                    # Obtener registros del día
-                    registros_del_dia = registros_por_dia.get(fecha_actual, [])
-                    
-                    # Buscar entrada y salida
-                    entrada = None
-                    salida = None
-                    
-                    for registro in registros_del_dia:
-                        # El primer registro que NO sea SALIDA es la entrada
-                        if registro.estatus != "SALIDA" and not entrada:
-                            entrada = registro
-                        # Buscar registro de SALIDA
-                        elif registro.estatus == "SALIDA":
-                            salida = registro
-                    
-                    # Determinar estatus y horas
-                    hora_entrada_str = None
-                    hora_salida_str = None
-                    estatus_dia = "FALTA"
-                    justificacion = None
-                    
-                    if entrada:
-                        # Extraer hora de entrada del campo fecha
-                        hora_entrada_str = entrada.fecha.strftime("%H:%M:%S")
-                        estatus_dia = entrada.estatus
-                        
-                        # Contar según el estatus
-                        if estatus_dia == "ASISTENCIA":
-                            asistencias += 1
-                        elif estatus_dia == "RETARDO_MENOR":
-                            retardos += 1
-                            retardos_menores += 1
-                        elif estatus_dia == "RETARDO_MAYOR":
-                            retardos += 1
-                            retardos_mayores += 1
-                        elif estatus_dia == "FALTA":
-                            faltas += 1
-                    else:
-                        # No hay registro de entrada = falta
-                        faltas += 1
-                        estatus_dia = "FALTA"
-                    
-                    # Si hay salida, extraer la hora
-                    if salida:
-                        hora_salida_str = salida.fecha.strftime("%H:%M:%S")
-                    
-                    # Buscar justificación
-                    justificacion_obj = db.query(Justificacion).filter(
-                        Justificacion.id_trabajador == trabajador.id,
-                        func.date(Justificacion.fecha) == fecha_actual
-                    ).first()
-                    
-                    if justificacion_obj:
-                        # Obtener la descripción de la regla
-                        regla = db.query(ReglaJustificacion).filter(
-                            ReglaJustificacion.id == justificacion_obj.id_descripcion
-                        ).first()
-                        
-                        if regla:
-                            justificacion = regla.descripcion
-                            # Actualizar estatus si está justificado
-                            if "FALTA" in estatus_dia:
-                                estatus_dia = "FALTA JUSTIFICADA"
-                                faltas -= 1  # No contar como falta
-                            elif "RETARDO" in estatus_dia:
-                                estatus_dia = f"{estatus_dia} JUSTIF."
-                                retardos -= 1  # No contar como retardo
-                                if "MENOR" in estatus_dia:
-                                    retardos_menores -= 1
-                                else:
-                                    retardos_mayores -= 1
-                    
-                    # Agregar registro diario
-                    registros_diarios.append({
-                        "fecha": fecha_actual.isoformat(),
-                        "dia_semana": ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"][dia_semana],
-                        "hora_entrada": hora_entrada_str,
-                        "hora_salida": hora_salida_str,
-                        "estatus": estatus_dia,
-                        "observaciones": None,
-                        "justificacion": justificacion
-                    })
-                    
-                    print(f"  📅 {fecha_actual}: Entrada={hora_entrada_str}, Salida={hora_salida_str}, Estatus={estatus_dia}")
-                
-                fecha_actual += timedelta(days=1)
-            
-            # Calcular porcentaje de asistencia
-            porcentaje_asistencia = 0
-            if dias_laborables > 0:
-                porcentaje_asistencia = (asistencias / dias_laborables) * 100
-            
-            # Obtener información del departamento
-            departamento_nombre = "Sin departamento"
-            if trabajador.departamento and trabajador.departamento_rel:
-                departamento_nombre = trabajador.departamento_rel.descripcion
-            
-            # Construir nombre completo
-            nombre_completo = f"{trabajador.nombre} {trabajador.apellidoPaterno} {trabajador.apellidoMaterno}".strip()
-            
-            # Agregar datos del trabajador (incluso si no tiene retardos/faltas para ver todos)
-            trabajadores_data.append({
-                "id": trabajador.id,
-                "nombre": nombre_completo,
-                "rfc": trabajador.rfc,
-                "departamento": departamento_nombre,
-                "puesto": trabajador.puesto,
-                "telefono": "",
-                "email": trabajador.correo,
-                "estadisticas": {
-                    "dias_laborables": dias_laborables,
-                    "asistencias": asistencias,
-                    "retardos": retardos,
-                    "retardos_menores": retardos_menores,
-                    "retardos_mayores": retardos_mayores,
-                    "faltas": faltas,
-                    "porcentaje_asistencia": round(porcentaje_asistencia, 2)
-                },
-                "registros_diarios": registros_diarios
-            })
-        
-        # Ordenar por faltas y retardos (los peores primero)
-        trabajadores_data.sort(
-            key=lambda x: (x["estadisticas"]["faltas"], x["estadisticas"]["retardos"]), 
-            reverse=True
         )
         
-        print(f"✅ DEBUG: Reporte generado con {len(trabajadores_data)} trabajadores")
-        
-        # Calcular resumen
-        return {
-            "fecha_inicio": fecha_inicio.isoformat(),
-            "fecha_fin": fecha_fin.isoformat(),
-            "trabajadores": trabajadores_data,
-            "resumen": {
-                "total_trabajadores": len(trabajadores_data),
-                "total_retardos": sum(t["estadisticas"]["retardos"] for t in trabajadores_data),
-                "total_faltas": sum(t["estadisticas"]["faltas"] for t in trabajadores_data),
-                "promedio_asistencia": round(
-                    sum(t["estadisticas"]["porcentaje_asistencia"] for t in trabajadores_data) / len(trabajadores_data),
-                    2
-                ) if trabajadores_data else 0
-            }
-        }
-        
     except Exception as e:
         print(f"❌ ERROR en endpoint: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/retardos-faltas/{trabajador_id}/detalle")
+def get_detalle_retardos_faltas(
+    trabajador_id: int,
+    fecha_inicio: date = Query(..., description="Fecha de inicio"),
+    fecha_fin: date = Query(..., description="Fecha de fin"),
+    db: Session = Depends(get_db),
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Detalle diario de retardos y faltas de un trabajador (para el reporte en modo resumen)
+    """
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha de fin debe ser posterior a la fecha de inicio"
+        )
+    
+    def generar():
+        detalle = generar_detalle_retardos_faltas(db, fecha_inicio, fecha_fin, trabajador_id)
+        if detalle is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Trabajador no encontrado o inactivo"
+            )
+        return detalle
+    
+    return respuesta_cacheada(
+        "retardos-faltas-detalle",
+        {"trabajador_id": trabajador_id},
+        fecha_inicio,
+        fecha_fin,
+        generar
+    )
+
+@router.get("/retardos-faltas-xlsx")
+def get_reporte_retardos_faltas_xlsx(
+    fecha_inicio: date = Query(..., description="Fecha de inicio"),
+    fecha_fin: date = Query(..., description="Fecha de fin"),
+    departamento_id: Optional[int] = Query(None, description="ID del departamento"),
+    por_departamento: bool = Query(True, description="Una hoja por departamento"),
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Exporta el reporte de retardos y faltas a Excel, en streaming
+    (los trabajadores van por departamento, no ordenados por faltas)
+    """
+    if fecha_fin < fecha_inicio:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha de fin debe ser posterior a la fecha de inicio"
+        )
+    
+    return StreamingResponse(
+        generar_xlsx_reporte(
+            fecha_inicio,
+            fecha_fin,
+            departamento_id,
+            tipo="retardos-faltas",
+            por_departamento=por_departamento
+        ),
+        media_type=MEDIA_TYPE_XLSX,
+        headers={"Content-Disposition": f"attachment; filename=retardos_faltas_{fecha_inicio}_{fecha_fin}.xlsx"}
+    )
+
+# ENDPOINTS DE TRABAJOS DE REPORTES EN SEGUNDO PLANO
+def _trabajo_out(estado: dict) -> dict:
+    descarga = None
+    if estado["estado"] == "terminado":
+        descarga = f"/api/reportes/trabajos/{estado['id']}/descarga"
+    return {**estado, "descarga": descarga}
+
+@router.post("/trabajos", response_model=TrabajoReporteOut, status_code=status.HTTP_202_ACCEPTED)
+def crear_trabajo_reporte(
+    trabajo: TrabajoReporteCreate,
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Encola un reporte largo (por ejemplo, un año de retardos y faltas) para
+    generarlo en segundo plano. Si ya hay uno idéntico pendiente, devuelve ese.
+    """
+    if trabajo.fecha_fin < trabajo.fecha_inicio:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha de fin debe ser posterior a la fecha de inicio"
+        )
+    if trabajo.trabajador_id and trabajo.formato != "json":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El filtro por trabajador solo está disponible en formato json"
+        )
+    
+    parametros = {
+        "fecha_inicio": trabajo.fecha_inicio.isoformat(),
+        "fecha_fin": trabajo.fecha_fin.isoformat(),
+        "departamento_id": trabajo.departamento_id,
+        "trabajador_id": trabajo.trabajador_id
+    }
+    
+    return _trabajo_out(enviar_trabajo(trabajo.tipo, trabajo.formato, parametros))
+
+@router.get("/trabajos/{id_trabajo}", response_model=TrabajoReporteOut)
+def get_trabajo_reporte(
+    id_trabajo: str,
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Obtiene el estado y el avance de un trabajo de reporte
+    """
+    estado = obtener_trabajo(id_trabajo)
+    if not estado:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trabajo no encontrado"
+        )
+    
+    return _trabajo_out(estado)
+
+@router.get("/trabajos/{id_trabajo}/descarga")
+def descargar_trabajo_reporte(
+    id_trabajo: str,
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Descarga el archivo generado por un trabajo terminado
+    """
+    estado = obtener_trabajo(id_trabajo)
+    if not estado:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trabajo no encontrado"
+        )
+    
+    if estado["estado"] != "terminado":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"El trabajo no ha terminado (estado: {estado['estado']})"
+        )
+    
+    ruta = ruta_archivo(estado)
+    if not ruta:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="El archivo del trabajo ya no está disponible"
+        )
+    
+    parametros = estado["parametros"]
+    nombre = f"{estado['tipo'].replace('-', '_')}_{parametros['fecha_inicio']}_{parametros['fecha_fin']}.{estado['formato']}"
+    media_types = {"json": "application/json", "csv": "text/csv", "xlsx": MEDIA_TYPE_XLSX}
+    
+    return FileResponse(ruta, media_type=media_types[estado["formato"]], filename=nombre)
+
 # ENDPOINT ADICIONAL PARA OBTENER LAS REGLAS DE JUSTIFICACIÓN
 @router.get("/reglas-justificacion")
 def get_reglas_justificacion(
@@ -760,6 +780,7 @@ def crear_justificacion(
     )
     
     db.add(nueva_justificacion)
+    actualizar_derivados_dia(db, id_trabajador, fecha)
     db.commit()
     db.refresh(nueva_justificacion)
     
@@ -792,19 +813,18 @@ def get_justificaciones_trabajador(
     if fecha_fin:
         query = query.filter(Justificacion.fecha <= fecha_fin)
     
-    justificaciones = query.all()
+    # La descripción de la regla se obtiene en la misma consulta
+    justificaciones = query.add_columns(ReglaJustificacion.descripcion).outerjoin(
+        ReglaJustificacion, Justificacion.id_descripcion == ReglaJustificacion.id
+    ).all()
     
     resultado = []
-    for just in justificaciones:
-        regla = db.query(ReglaJustificacion).filter(
-            ReglaJustificacion.id == just.id_descripcion
-        ).first()
-        
+    for just, descripcion in justificaciones:
         resultado.append({
             "id": just.id,
             "fecha": just.fecha.date().isoformat(),
             "id_descripcion": just.id_descripcion,
-            "descripcion": regla.descripcion if regla else "Sin descripción"
+            "descripcion": descripcion if descripcion is not None else "Sin descripción"
         })
     
     return resultado
\ No newline at end of file
@@ -1,20 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session, joinedload
-from typing import List, Optional
+from typing import List, Optional, Literal, Union
 import base64
 import traceback
 import re
+from datetime import date, datetime
 from app.database import get_db
 from app.models.models import (
     Trabajador, TipoTrabajador, Departamento, GradoEstudio, 
-    RolUsuario, Horario, CentroTrabajo
+    RolUsuario, Horario, CentroTrabajo, AsignacionHorario
 )
 from app.schemas.schemas import (
     TrabajadorCreate, 
     TrabajadorUpdate, 
-    TrabajadorOut
+    TrabajadorOut,
+    PaginaCursor
 )
 from app.services.auth_service import get_current_trabajador, check_admin_permissions, get_password_hash
+from app.services.horarios_service import historial_inicial
+from app.services.proyeccion_service import proyectar_trabajadores
+from app.services.puntualidad_service import obtener_puntualidad
+from app.services.trabajador_service import opciones_carga, parsear_campos, serializar_trabajador
+from app.utils.helpers import paginar_por_cursor, estimar_total
 
 router = APIRouter()
 
@@ -172,7 +181,7 @@ def create_trabajador(
             detail=f"Error interno del servidor: {str(e)}"
         )
 
-@router.get("/trabajadores", response_model=List[TrabajadorOut])
+@router.get("/trabajadores", response_model=Union[List[TrabajadorOut], PaginaCursor[TrabajadorOut]])
 def get_trabajadores(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
@@ -180,21 +189,30 @@ def get_trabajadores(
     departamento: Optional[int] = Query(None, description="Filtrar por ID de departamento"),
     rfc: Optional[str] = Query(None, description="Filtrar por RFC"),
     estado: Optional[bool] = Query(None, description="Filtrar por estado activo/inactivo"),
+    paginacion: Literal["offset", "cursor"] = Query("offset", description="Modo de paginación"),
+    cursor: Optional[str] = Query(None, description="Cursor de la página anterior (activa el modo cursor)"),
+    incluir_total: bool = Query(False, description="Incluir total estimado (solo modo cursor)"),
+    ligero: bool = Query(False, description="Proyección directa a JSON de los campos escalares, sin relaciones (solo modo offset)"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas, p. ej. id,nombre,apellidoPaterno"),
+    include: Optional[str] = Query(None, description="Relaciones a incluir separadas por comas, p. ej. departamento_rel"),
     db: Session = Depends(get_db),
     current_user: Trabajador = Depends(get_current_trabajador)
 ):
     try:
         print(f"Obteniendo trabajadores con parámetros: skip={skip}, limit={limit}")
         
-        # Query con JOIN a todas las tablas relacionadas
-        query = db.query(Trabajador).options(
-            joinedload(Trabajador.tipo_trabajador),
-            joinedload(Trabajador.departamento_rel),
-            joinedload(Trabajador.horario_rel),
-            joinedload(Trabajador.centro_trabajo_rel),
-            joinedload(Trabajador.grado_estudios_rel),
-            joinedload(Trabajador.rol_rel)
-        )
+        # Respuesta parcial: solo se cargan de la BD los campos y relaciones solicitados
+        parcial = bool(fields or include)
+        if parcial:
+            try:
+                campos, relaciones = parsear_campos(fields, include)
+            except ValueError as ve:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(ve)
+                )
+        
+        query = db.query(Trabajador)
         
         # Aplicar filtros si se proporcionan
         if nombre:
@@ -214,16 +232,51 @@ def get_trabajadores(
         if estado is not None:
             query = query.filter(Trabajador.estado == estado)
         
-        # Obtener el total para paginación
-        total = query.count()
-        print(f"Total de trabajadores encontrados: {total}")
+        # Proyección ligera: solo columnas escalares codificadas directamente a JSON
+        if ligero and not parcial and not cursor and paginacion == "offset":
+            query = query.order_by(Trabajador.id).offset(skip).limit(limit)
+            return Response(content=proyectar_trabajadores(db, query), media_type="application/json")
+        
+        # JOIN solo a las relaciones necesarias, cargando únicamente sus columnas expuestas
+        if parcial:
+            query = query.options(*opciones_carga(campos, relaciones))
+        else:
+            query = query.options(*opciones_carga())
+        
+        # Paginación por cursor (keyset sobre el ID)
+        if cursor or paginacion == "cursor":
+            total_estimado = estimar_total(db, query, "trabajadores") if incluir_total else None
+            try:
+                trabajadores, siguiente_cursor = paginar_por_cursor(
+                    query, [Trabajador.id], cursor, limit, clave=lambda t: (t.id,)
+                )
+            except ValueError as ve:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(ve)
+                )
+            print(f"Trabajadores obtenidos: {len(trabajadores)}")
+            if parcial:
+                return JSONResponse(jsonable_encoder({
+                    "items": [serializar_trabajador(t, campos, relaciones) for t in trabajadores],
+                    "next_cursor": siguiente_cursor,
+                    "total_estimado": total_estimado
+                }))
+            return {"items": trabajadores, "next_cursor": siguiente_cursor, "total_estimado": total_estimado}
         
         # Aplicar paginación
         trabajadores = query.offset(skip).limit(limit).all()
         print(f"Trabajadores obtenidos: {len(trabajadores)}")
         
+        if parcial:
+            return JSONResponse(jsonable_encoder(
+                [serializar_trabajador(t, campos, relaciones) for t in trabajadores]
+            ))
+        
         return trabajadores
         
+    except HTTPException as he:
+        raise he
     except Exception as e:
         print(f"Error al obtener trabajadores: {e}")
         print(f"Traceback: {traceback.format_exc()}")
@@ -232,23 +285,50 @@ def get_trabajadores(
             detail=f"Error al obtener trabajadores: {str(e)}"
         )
 
+@router.get("/trabajadores/{trabajador_id}/puntualidad")
+def get_puntualidad_trabajador(
+    trabajador_id: int,
+    fecha: Optional[date] = Query(None, description="Día de referencia (por defecto, hoy)"),
+    db: Session = Depends(get_db),
+    current_user: Trabajador = Depends(get_current_trabajador)
+):
+    """
+    Retardos, faltas y justificaciones del trabajador en la quincena y el mes
+    de la fecha, con su índice de puntualidad
+    """
+    if not db.query(Trabajador.id).filter(Trabajador.id == trabajador_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Trabajador con ID {trabajador_id} no encontrado"
+        )
+    
+    return obtener_puntualidad(db, trabajador_id, fecha)
+
 @router.get("/trabajadores/{trabajador_id}", response_model=TrabajadorOut)
 def get_trabajador_by_id(
     trabajador_id: int, 
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas"),
+    include: Optional[str] = Query(None, description="Relaciones a incluir separadas por comas"),
     db: Session = Depends(get_db),
     current_user: Trabajador = Depends(get_current_trabajador)
 ):
     print(f"🔍 Buscando trabajador con ID: {trabajador_id}")
     
-    # Query con todas las relaciones cargadas
-    trabajador = db.query(Trabajador).options(
-        joinedload(Trabajador.tipo_trabajador),
-        joinedload(Trabajador.departamento_rel),
-        joinedload(Trabajador.horario_rel),
-        joinedload(Trabajador.centro_trabajo_rel),
-        joinedload(Trabajador.grado_estudios_rel),
-        joinedload(Trabajador.rol_rel)
-    ).filter(Trabajador.id == trabajador_id).first()
+    parcial = bool(fields or include)
+    if parcial:
+        try:
+            campos, relaciones = parsear_campos(fields, include)
+        except ValueError as ve:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(ve)
+            )
+        opciones = opciones_carga(campos, relaciones)
+    else:
+        # Todas las relaciones, sin columnas pesadas
+        opciones = opciones_carga()
+    
+    trabajador = db.query(Trabajador).options(*opciones).filter(Trabajador.id == trabajador_id).first()
     
     if not trabajador:
         print(f"❌ Trabajador con ID {trabajador_id} no encontrado")
@@ -257,6 +337,9 @@ def get_trabajador_by_id(
             detail=f"Trabajador con ID {trabajador_id} no encontrado"
         )
     
+    if parcial:
+        return JSONResponse(jsonable_encoder(serializar_trabajador(trabajador, campos, relaciones)))
+    
     print(f"✅ Trabajador encontrado: {trabajador.nombre} {trabajador.apellidoPaterno}")
     print(f"🏢 Departamento: {trabajador.departamento_rel.descripcion if trabajador.departamento_rel else 'N/A'}")
     print(f"👤 Tipo: {trabajador.tipo_trabajador.descripcion if trabajador.tipo_trabajador else 'N/A'}")
@@ -319,6 +402,22 @@ def update_trabajador(
         
         print(f"Datos finales para actualizar: {update_data}")
         
+        # Un cambio de horario se guarda en el historial desde ahora, como en
+        # /horarios/{id}/asignar: el resolutor de horarios solo usa id_horario
+        # para los trabajadores sin historial
+        nuevo_horario = update_data.get("id_horario")
+        if nuevo_horario is not None and nuevo_horario != db_trabajador.id_horario:
+            fecha_inicio = datetime.now()
+            previo = historial_inicial(db, [trabajador_id], fecha_inicio)
+            if previo:
+                db.add(AsignacionHorario(**previo[0]))
+            db.add(AsignacionHorario(
+                id_trabajador=trabajador_id,
+                id_horario=nuevo_horario,
+                fehcaInicio=fecha_inicio
+            ))
+            print(f"🕐 Horario {nuevo_horario} asignado desde {fecha_inicio}")
+        
         # Aplicar todas las actualizaciones
         for key, value in update_data.items():
             if hasattr(db_trabajador, key):
@@ -1,6 +1,8 @@
 from pydantic import BaseModel, EmailStr, validator
 from datetime import datetime, date, time
-from typing import Optional, List, Union
+from typing import Optional, List, Union, Generic, TypeVar, Literal
+
+T = TypeVar("T")
 
 # Schemas base para las tablas relacionadas
 class TipoTrabajadorBase(BaseModel):
@@ -241,6 +243,18 @@ class RegistroAsistenciaCreate(BaseModel):
     fecha: datetime
     estatus: str
 
+class RecalculoEstatusCreate(BaseModel):
+    fecha_inicio: date
+    fecha_fin: date
+    trabajador_ids: Optional[List[int]] = None
+    simular: bool = False
+
+    @validator('fecha_fin')
+    def validar_rango(cls, v, values):
+        if 'fecha_inicio' in values and v < values['fecha_inicio']:
+            raise ValueError("fecha_fin no puede ser anterior a fecha_inicio")
+        return v
+
 class RegistroAsistenciaUpdate(BaseModel):
     id_trabajador: Optional[int] = None
     fecha: Optional[datetime] = None
@@ -319,6 +333,32 @@ class JustificacionOut(BaseModel):
     class Config:
         from_attributes = True
 
+class JustificacionPeriodoCreate(BaseModel):
+    trabajador_ids: List[int]
+    fecha_inicio: date
+    fecha_fin: date
+    id_descripcion: int
+
+    @validator('trabajador_ids')
+    def validar_trabajadores(cls, v):
+        if not v:
+            raise ValueError("Se requiere al menos un trabajador")
+        # Sin repetidos, conservando el orden
+        return list(dict.fromkeys(v))
+
+    @validator('fecha_fin')
+    def validar_rango(cls, v, values):
+        if 'fecha_inicio' in values and v < values['fecha_inicio']:
+            raise ValueError("fecha_fin no puede ser anterior a fecha_inicio")
+        return v
+
+class JustificacionPeriodoOut(BaseModel):
+    id: int
+    id_trabajador: int
+    fecha: datetime
+    fecha_fin: Optional[datetime] = None
+    id_descripcion: int
+
 # Schemas para Reglas de Justificación
 class ReglaJustificacionCreate(BaseModel):
     descripcion: str
@@ -382,6 +422,12 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     id: Optional[int] = None
 
+# Schema genérico para paginación por cursor
+class PaginaCursor(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+    total_estimado: Optional[int] = None
+
 # Schemas para Reportes
 class ReporteFiltros(BaseModel):
     fecha_inicio: Optional[date] = None
@@ -389,6 +435,29 @@ class ReporteFiltros(BaseModel):
     departamento_id: Optional[int] = None
     trabajador_id: Optional[int] = None
 
+# Schemas para trabajos de reportes en segundo plano
+class TrabajoReporteCreate(BaseModel):
+    tipo: Literal["asistencias", "retardos-faltas"]
+    formato: Literal["json", "csv", "xlsx"] = "json"
+    fecha_inicio: date
+    fecha_fin: date
+    departamento_id: Optional[int] = None
+    trabajador_id: Optional[int] = None
+
+class TrabajoReporteOut(BaseModel):
+    id: str
+    tipo: str
+    formato: str
+    estado: str  # pendiente, ejecutando, terminado, error, interrumpido
+    parametros: dict
+    procesados: int = 0
+    total: Optional[int] = None
+    creado: datetime
+    iniciado: Optional[datetime] = None
+    terminado: Optional[datetime] = None
+    error: Optional[str] = None
+    descarga: Optional[str] = None
+
 class HorarioBase(BaseModel):
     descripcion: str
     lunesEntrada: time
@@ -455,6 +524,23 @@ class AsignacionHorarioOut(AsignacionHorarioBase):
     class Config:
         from_attributes = True
 
+class AsignacionHorarioMasivaCreate(BaseModel):
+    # Alcance: cualquier combinación de departamento, lista de IDs y horario actual
+    departamento_id: Optional[int] = None
+    trabajador_ids: Optional[List[int]] = None
+    id_horario_actual: Optional[int] = None
+    solo_activos: bool = True
+    fehcaInicio: Optional[datetime] = None
+    # Reclasificar los registros desde fehcaInicio con el nuevo horario
+    recalcular: bool = False
+
+    @validator('trabajador_ids')
+    def validar_trabajadores(cls, v):
+        if v is not None:
+            # Sin repetidos, conservando el orden
+            return list(dict.fromkeys(v))
+        return v
+
 # ====== SCHEMAS PARA REPORTES Y VALIDACIONES ======
 
 class ValidacionHorarioOut(BaseModel):
@@ -0,0 +1,274 @@
+import calendar
+from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, delete, and_, or_, tuple_
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, date, time, timedelta
+from itertools import chain
+from typing import Optional, Dict, Any, List, Tuple
+from app.config import settings
+from app.models.models import Trabajador, RegistroAsistencia, Justificacion, DiaFestivo, AgregadoMensual
+from app.services.cache_reportes import meses_modificados
+from app.services.datos_reporte import cargar_datos_reporte, cargar_trabajadores, filtros_alcance, DatosReporte
+from app.services.matriz_asistencia import MatrizAsistencia
+
+# Conteos que se guardan por trabajador y mes; se suman entre meses y el
+# resto de las estadísticas (no registrados, porcentaje) se deriva de ellos
+CAMPOS = ("dias_laborables", "asistencias", "retardos", "faltas", "justificados")
+
+
+def _segmentar(fecha_inicio: date, fecha_fin: date, usar_agregados: bool) -> Tuple[List[Tuple[int, int]], List[Tuple[date, date]]]:
+    """
+    Divide el período en meses completos ya cerrados (que se leen de
+    agregado_mensual) y rangos de días que se calculan al momento: los meses
+    incompletos de las orillas y los que todavía no terminan.
+    """
+    hoy = date.today()
+    meses = []
+    rangos = []
+
+    inicio = fecha_inicio
+    while inicio <= fecha_fin:
+        _, ultimo_dia = calendar.monthrange(inicio.year, inicio.month)
+        fin_mes = date(inicio.year, inicio.month, ultimo_dia)
+        fin = min(fin_mes, fecha_fin)
+
+        if usar_agregados and inicio.day == 1 and fin == fin_mes and fin_mes < hoy:
+            meses.append((inicio.year, inicio.month))
+        elif rangos and rangos[-1][1] + timedelta(days=1) == inicio:
+            # Juntar con el rango anterior para cargarlo en una sola pasada
+            rangos[-1] = (rangos[-1][0], fin)
+        else:
+            rangos.append((inicio, fin))
+
+        inicio = fin + timedelta(days=1)
+
+    return meses, rangos
+
+
+def _conteos_matriz(matriz: MatrizAsistencia) -> Dict[int, List[int]]:
+    """Conteos de la matriz por ID de trabajador, en el orden de CAMPOS"""
+    estadisticas = matriz.estadisticas_asistencia
+    columnas = [estadisticas[campo].tolist() for campo in CAMPOS[1:]]
+    return {
+        trabajador.id: [estadisticas["dias_laborables"]] + [columna[i] for columna in columnas]
+        for i, trabajador in enumerate(matriz.trabajadores)
+    }
+
+
+def _calcular_agregados(db: Session, anio: int, mes: int, trabajador_ids: Optional[List[int]], alcance: dict) -> List[dict]:
+    _, ultimo_dia = calendar.monthrange(anio, mes)
+    datos = cargar_datos_reporte(
+        db,
+        date(anio, mes, 1),
+        date(anio, mes, ultimo_dia),
+        trabajador_ids=trabajador_ids,
+        desde_resumen=settings.RESUMEN_DIARIO_ACTIVO,
+        **alcance
+    )
+    return [
+        {"id_trabajador": id_trabajador, "anio": anio, "mes": mes, **dict(zip(CAMPOS, conteos))}
+        for id_trabajador, conteos in _conteos_matriz(MatrizAsistencia(datos)).items()
+    ]
+
+
+def _sumar_agregados(
+    db: Session,
+    meses: List[Tuple[int, int]],
+    alcance: dict,
+    totales: Dict[int, List[int]]
+) -> List[dict]:
+    """
+    Suma los agregados guardados de los meses y calcula los que falten.
+    Devuelve los agregados calculados para guardarlos con _guardar_agregados.
+    """
+    ids_alcance = set(totales)
+    encontrados = {mes: set() for mes in meses}
+
+    # Subconsulta con los IDs del alcance, para no enviar listas enormes de IDs
+    ids_subconsulta = db.query(Trabajador.id).filter(*filtros_alcance(**alcance)).scalar_subquery()
+
+    for fila in db.query(AgregadoMensual).filter(
+        tuple_(AgregadoMensual.anio, AgregadoMensual.mes).in_(meses),
+        AgregadoMensual.id_trabajador.in_(ids_subconsulta)
+    ):
+        if fila.id_trabajador not in totales:
+            continue
+        conteos = totales[fila.id_trabajador]
+        for k, campo in enumerate(CAMPOS):
+            conteos[k] += getattr(fila, campo)
+        encontrados[fila.anio, fila.mes].add(fila.id_trabajador)
+
+    nuevas = []
+    for (anio, mes), ids_mes in encontrados.items():
+        faltantes = ids_alcance - ids_mes
+        if not faltantes:
+            continue
+        # Si falta todo el mes se carga por el alcance en lugar de por lista de IDs
+        filas = _calcular_agregados(
+            db, anio, mes,
+            sorted(faltantes) if ids_mes else None,
+            {} if ids_mes else alcance
+        )
+        for fila in filas:
+            conteos = totales.get(fila["id_trabajador"])
+            if conteos is None:
+                continue
+            for k, campo in enumerate(CAMPOS):
+                conteos[k] += fila[campo]
+        nuevas.extend(filas)
+
+    return nuevas
+
+
+def _guardar_agregados(db: Session, nuevas: List[dict]) -> None:
+    try:
+        db.bulk_insert_mappings(AgregadoMensual, nuevas)
+        db.commit()
+        print(f"📊 Agregados mensuales guardados: {len(nuevas)} filas")
+    except IntegrityError:
+        # Otra petición guardó los mismos meses al mismo tiempo
+        db.rollback()
+
+
+def generar_resumen_asistencias_por_periodo(
+    db: Session,
+    fecha_inicio: date,
+    fecha_fin: date,
+    departamento_id: Optional[int] = None,
+    trabajador_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Genera las estadísticas de asistencia por trabajador de un período
+    arbitrario. Los meses completos ya cerrados se suman desde
+    agregado_mensual y solo los días de las orillas se calculan al momento.
+    Las estadísticas son las mismas que las de
+    generar_reporte_asistencias_por_periodo, sin los registros diarios.
+
+    Args:
+        db (Session): Sesión de la base de datos
+        fecha_inicio (date): Fecha de inicio del período
+        fecha_fin (date): Fecha de fin del período
+        departamento_id (Optional[int]): ID del departamento (opcional)
+        trabajador_id (Optional[int]): ID del trabajador (opcional)
+
+    Returns:
+        Dict[str, Any]: Diccionario con los resultados del reporte
+    """
+    alcance = {"departamento_id": departamento_id, "trabajador_id": trabajador_id}
+    trabajadores = cargar_trabajadores(db, filtros_alcance(**alcance))
+    totales = {trabajador.id: [0] * len(CAMPOS) for trabajador in trabajadores}
+
+    meses, rangos = _segmentar(fecha_inicio, fecha_fin, settings.AGREGADOS_MENSUALES_ACTIVO)
+
+    # Días de las orillas (y todo el período si los agregados están apagados)
+    for inicio, fin in rangos:
+        datos = cargar_datos_reporte(db, inicio, fin, desde_resumen=settings.RESUMEN_DIARIO_ACTIVO, **alcance)
+        for id_trabajador, conteos in _conteos_matriz(MatrizAsistencia(datos)).items():
+            if id_trabajador in totales:
+                totales[id_trabajador] = [a + b for a, b in zip(totales[id_trabajador], conteos)]
+
+    nuevas = []
+    if meses and trabajadores:
+        nuevas = _sumar_agregados(db, meses, alcance, totales)
+
+    dias_festivos = db.query(DiaFestivo).filter(
+        DiaFestivo.fecha >= datetime.combine(fecha_inicio, time.min),
+        DiaFestivo.fecha <= datetime.combine(fecha_fin, time.max)
+    ).order_by(DiaFestivo.fecha).all()
+
+    resultados = []
+    for trabajador in trabajadores:
+        dias_laborables, asistencias, retardos, faltas, justificados = totales[trabajador.id]
+        resultados.append({
+            "id": trabajador.id,
+            "nombre": f"{trabajador.nombre} {trabajador.apellidoPaterno} {trabajador.apellidoMaterno}",
+            "rfc": trabajador.rfc,
+            "departamento": DatosReporte.nombre_departamento(trabajador),
+            "puesto": trabajador.puesto,
+            "estadisticas": {
+                "dias_laborables": dias_laborables,
+                "asistencias": asistencias,
+                "retardos": retardos,
+                "faltas": faltas,
+                "justificados": justificados,
+                "no_registrados": dias_laborables - (asistencias + retardos + faltas + justificados),
+                "porcentaje_asistencia": (asistencias / dias_laborables) * 100 if dias_laborables > 0 else 0
+            }
+        })
+
+    reporte = {
+        "periodo": {
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin
+        },
+        "departamento": departamento_id,
+        "trabajador": trabajador_id,
+        "dias_festivos": [{"fecha": festivo.fecha, "descripcion": festivo.descripcion} for festivo in dias_festivos],
+        "trabajadores": resultados
+    }
+
+    # Guardar al final: el commit expira los objetos cargados en la sesión
+    if nuevas:
+        _guardar_agregados(db, nuevas)
+
+    return reporte
+
+
+def limpiar_agregados(db: Session, fecha_inicio: Optional[date] = None, fecha_fin: Optional[date] = None) -> int:
+    """
+    Borra los agregados mensuales del rango (sin fechas, todos); se vuelven a
+    calcular la próxima vez que un reporte los necesite.
+
+    Returns:
+        int: Número de filas borradas
+    """
+    query = db.query(AgregadoMensual)
+    if fecha_inicio:
+        query = query.filter(AgregadoMensual.anio * 100 + AgregadoMensual.mes >= fecha_inicio.year * 100 + fecha_inicio.month)
+    if fecha_fin:
+        query = query.filter(AgregadoMensual.anio * 100 + AgregadoMensual.mes <= fecha_fin.year * 100 + fecha_fin.month)
+    total = query.delete(synchronize_session=False)
+    db.commit()
+    return total
+
+
+# Invalidación: al enviar a la BD un cambio en registros, justificaciones o
+# días festivos se borran, en la misma transacción, los agregados de los meses
+# afectados (de ese trabajador, o de todos si es un día festivo).
+
+@event.listens_for(Session, "after_flush")
+def _registrar_meses_afectados(session, flush_context):
+    if not settings.AGREGADOS_MENSUALES_ACTIVO:
+        return
+
+    afectados = session.info.setdefault("agregados_afectados", set())
+    modificados = [objeto for objeto in session.dirty if session.is_modified(objeto)]
+
+    for objeto in chain(session.new, modificados, session.deleted):
+        if isinstance(objeto, (RegistroAsistencia, Justificacion)):
+            historial = inspect(objeto).attrs.id_trabajador.history
+            trabajadores = [t for t in chain(historial.added, historial.unchanged, historial.deleted) if t is not None]
+        elif isinstance(objeto, DiaFestivo):
+            trabajadores = [None]
+        else:
+            continue
+
+        for anio, mes in meses_modificados(objeto):
+            for id_trabajador in trabajadores:
+                afectados.add((id_trabajador, anio, mes))
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _borrar_agregados_afectados(session, flush_context):
+    afectados = session.info.pop("agregados_afectados", None)
+    if not afectados:
+        return
+
+    condiciones = []
+    for id_trabajador, anio, mes in afectados:
+        condicion = and_(AgregadoMensual.anio == anio, AgregadoMensual.mes == mes)
+        if id_trabajador is not None:
+            condicion = and_(condicion, AgregadoMensual.id_trabajador == id_trabajador)
+        condiciones.append(condicion)
+
+    session.execute(delete(AgregadoMensual).where(or_(*condiciones)))
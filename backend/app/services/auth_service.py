@@ -4,7 +4,7 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from app.database import get_db
 from app.models.models import Trabajador
 from app.schemas.schemas import TokenData
@@ -57,7 +57,11 @@ async def get_current_trabajador(token: str = Depends(oauth2_scheme), db: Sessio
         token_data = TokenData(id=id)
     except JWTError:
         raise credentials_exception
-    trabajador = db.query(Trabajador).filter(Trabajador.id == token_data.id).first()
+    # Solo el ID y las credenciales: el resto (incluida la huella, un BLOB) se
+    # carga al usarse, y /me no reutiliza una instancia ya cargada completa
+    trabajador = db.query(Trabajador).options(
+        load_only(Trabajador.id, Trabajador.id_rol, Trabajador.hashed_password)
+    ).filter(Trabajador.id == token_data.id).first()
     if trabajador is None:
         raise credentials_exception
     return trabajador
@@ -93,16 +93,18 @@ def register_attendance(db: Session, trabajador_id: int, estatus: str):
         RegistroAsistencia: El registro de asistencia creado
     """
     from app.models.models import RegistroAsistencia
+    from app.services.derivados_service import actualizar_derivados_dia
     
     # Crear un nuevo registro de asistencia
     nuevo_registro = RegistroAsistencia(
-        id_empleado=trabajador_id,
+        id_trabajador=trabajador_id,
         fecha=datetime.now(),
         estatus=estatus
     )
     
     # Agregar a la base de datos
     db.add(nuevo_registro)
+    actualizar_derivados_dia(db, trabajador_id, nuevo_registro.fecha)
     db.commit()
     db.refresh(nuevo_registro)
     
@@ -120,21 +122,23 @@ def determine_attendance_status(db: Session, trabajador_id: int, current_time=No
     Returns:
         str: Estado de la asistencia (ASISTENCIA, RETARDO, FALTA)
     """
-    from app.models.models import Trabajador, Horario, ReglaRetardo, DiaFestivo
+    from app.models.models import Trabajador, ReglaRetardo, DiaFestivo
+    from app.services.horarios_service import horario_vigente
     
     # Obtener el trabajador y su horario
     trabajador = db.query(Trabajador).filter(Trabajador.id == trabajador_id).first()
     if not trabajador:
         return "ERROR"
     
-    horario = db.query(Horario).filter(Horario.id == trabajador.id_horario).first()
-    if not horario:
-        return "ERROR"
-    
     # Obtener la fecha y hora actual si no se proporciona
     if current_time is None:
         current_time = datetime.now()
     
+    # Horario que rige al trabajador en esa fecha
+    horario = horario_vigente(db, trabajador, current_time.date())
+    if not horario:
+        return "ERROR"
+    
     # Verificar si es un día festivo
     es_festivo = db.query(DiaFestivo).filter(
         DiaFestivo.fecha == current_time.date()
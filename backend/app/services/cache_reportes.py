@@ -0,0 +1,370 @@
+import os
+import time
+import uuid
+import zlib
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date
+from itertools import chain
+from typing import Optional, Dict, Any, Callable, List, NamedTuple, Tuple
+from fastapi.responses import Response
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.models import (
+    Trabajador,
+    Departamento,
+    CentroTrabajo,
+    Horario,
+    AsignacionHorario,
+    RegistroAsistencia,
+    Justificacion,
+    ReglaJustificacion,
+    ReglaRetardo,
+    DiaFestivo
+)
+from app.utils.helpers import serializar_json
+
+# Caché de respuestas de reportes.
+#
+# La clave de cada entrada incluye el endpoint, sus parámetros y la versión de
+# los datos que el reporte lee: una versión por cada mes del rango (registros,
+# justificaciones y días festivos) y una versión global (trabajadores,
+# departamentos, horarios y reglas). Al confirmar un cambio en esas tablas se
+# renueva la versión del mes afectado o la global, así que las entradas viejas
+# dejan de encontrarse y salen solas por LRU.
+#
+# Las versiones se guardan como archivos en DIRECTORIO_CACHE_REPORTES para que
+# todos los procesos de la API (y los scripts) vean las mismas invalidaciones.
+# Las respuestas se guardan comprimidas; las que salen de la memoria pasan a
+# disco hasta MB_CACHE_REPORTES_DISCO. Dentro de cada proceso, las peticiones
+# idénticas simultáneas comparten un solo cálculo (también sin caché).
+
+# Tablas cuyos cambios afectan solo al mes de su fecha
+TABLAS_POR_FECHA = (RegistroAsistencia, Justificacion, DiaFestivo)
+
+# Tablas cuyos cambios afectan a todos los períodos; para Trabajador solo
+# cuentan las columnas que aparecen en los reportes
+TABLAS_GLOBALES = (Trabajador, Departamento, CentroTrabajo, Horario, AsignacionHorario, ReglaJustificacion, ReglaRetardo)
+COLUMNAS_TRABAJADOR = (
+    "nombre", "apellidoPaterno", "apellidoMaterno", "rfc", "puesto",
+    "correo", "departamento", "id_centroTrabajo", "id_horario", "estado"
+)
+
+VERSION_GLOBAL = "global"
+
+
+class _Entrada(NamedTuple):
+    contenido: bytes  # JSON comprimido con zlib
+    expira: Optional[float]  # None = hasta que se invalide
+
+
+_memoria: "OrderedDict[str, _Entrada]" = OrderedDict()
+_bytes_memoria = 0
+_lock = threading.Lock()
+
+
+def _directorio(*partes: str) -> str:
+    ruta = os.path.join(settings.DIRECTORIO_CACHE_REPORTES, *partes)
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+
+def _meses(fecha_inicio: date, fecha_fin: date) -> List[str]:
+    meses = []
+    anio, mes = fecha_inicio.year, fecha_inicio.month
+    while (anio, mes) <= (fecha_fin.year, fecha_fin.month):
+        meses.append(f"{anio:04d}-{mes:02d}")
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return meses
+
+
+def _leer_version(nombre: str) -> str:
+    try:
+        with open(os.path.join(_directorio("versiones"), nombre), encoding="ascii") as archivo:
+            return archivo.read()
+    except FileNotFoundError:
+        return "0"
+
+
+def invalidar(nombres) -> None:
+    """
+    Renueva las versiones indicadas ("AAAA-MM" o "global"). Cada versión nueva
+    es única, así que dos invalidaciones simultáneas no se pisan.
+    """
+    directorio = _directorio("versiones")
+    for nombre in nombres:
+        ruta = os.path.join(directorio, nombre)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "w", encoding="ascii") as archivo:
+            archivo.write(uuid.uuid4().hex)
+        os.replace(temporal, ruta)
+    if nombres:
+        print(f"🧹 Caché de reportes invalidada: {', '.join(sorted(nombres))}")
+
+
+def invalidar_fechas(fecha_inicio: date, fecha_fin: date) -> None:
+    """Invalida los reportes de todos los meses del rango"""
+    invalidar(set(_meses(fecha_inicio, fecha_fin)))
+
+
+def _clave(endpoint: str, parametros: Dict[str, Any], fecha_inicio: date, fecha_fin: date) -> str:
+    versiones = [_leer_version(VERSION_GLOBAL)] + [_leer_version(mes) for mes in _meses(fecha_inicio, fecha_fin)]
+    return hashlib.sha256(
+        serializar_json([endpoint, fecha_inicio, fecha_fin, sorted(parametros.items()), versiones]).encode("utf-8")
+    ).hexdigest()
+
+
+def _ruta_disco(clave: str) -> str:
+    return os.path.join(_directorio("entradas"), f"{clave}.z")
+
+
+def _escribir_disco(clave: str, entrada: _Entrada) -> None:
+    ruta = _ruta_disco(clave)
+    if os.path.exists(ruta):
+        return
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "wb") as archivo:
+        archivo.write(struct.pack("<d", entrada.expira or 0.0))
+        archivo.write(entrada.contenido)
+    os.replace(temporal, ruta)
+    _recortar_disco()
+
+
+def _leer_disco(clave: str) -> Optional[_Entrada]:
+    ruta = _ruta_disco(clave)
+    try:
+        with open(ruta, "rb") as archivo:
+            expira, = struct.unpack("<d", archivo.read(8))
+            contenido = archivo.read()
+        # Marcar el uso para que el recorte quite primero las menos usadas
+        os.utime(ruta)
+    except (FileNotFoundError, struct.error):
+        return None
+    return _Entrada(contenido, expira or None)
+
+
+def _recortar_disco() -> None:
+    """Borra las entradas de disco menos usadas hasta quedar bajo MB_CACHE_REPORTES_DISCO"""
+    limite = settings.MB_CACHE_REPORTES_DISCO * 1024 * 1024
+    archivos = []
+    total = 0
+    with os.scandir(_directorio("entradas")) as entradas:
+        for entrada in entradas:
+            try:
+                info = entrada.stat()
+            except FileNotFoundError:
+                continue
+            archivos.append((info.st_mtime, info.st_size, entrada.path))
+            total += info.st_size
+
+    for _, tamano, ruta in sorted(archivos):
+        if total <= limite:
+            break
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        total -= tamano
+
+
+def _guardar(clave: str, entrada: _Entrada) -> None:
+    global _bytes_memoria
+    limite = settings.MB_CACHE_REPORTES * 1024 * 1024
+    desbordadas = []
+
+    with _lock:
+        anterior = _memoria.pop(clave, None)
+        if anterior:
+            _bytes_memoria -= len(anterior.contenido)
+        _memoria[clave] = entrada
+        _bytes_memoria += len(entrada.contenido)
+
+        # Sacar de la memoria las menos usadas; las vigentes pasan a disco
+        while _bytes_memoria > limite and len(_memoria) > 1:
+            clave_vieja, vieja = _memoria.popitem(last=False)
+            _bytes_memoria -= len(vieja.contenido)
+            desbordadas.append((clave_vieja, vieja))
+
+    ahora = time.time()
+    for clave_vieja, vieja in desbordadas:
+        if vieja.expira is None or vieja.expira > ahora:
+            _escribir_disco(clave_vieja, vieja)
+
+
+def _obtener(clave: str) -> Optional[bytes]:
+    global _bytes_memoria
+    ahora = time.time()
+
+    with _lock:
+        entrada = _memoria.get(clave)
+        if entrada is not None:
+            if entrada.expira is not None and entrada.expira <= ahora:
+                del _memoria[clave]
+                _bytes_memoria -= len(entrada.contenido)
+                return None
+            _memoria.move_to_end(clave)
+            return entrada.contenido
+
+    entrada = _leer_disco(clave)
+    if entrada is None or (entrada.expira is not None and entrada.expira <= ahora):
+        return None
+    _guardar(clave, entrada)
+    return entrada.contenido
+
+
+class _Vuelo:
+    """Cálculo de un reporte en curso, compartido por las peticiones idénticas"""
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.cuerpo: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+
+
+_vuelos: Dict[str, _Vuelo] = {}
+_lock_vuelos = threading.Lock()
+
+
+def _generar_una_vez(clave: str, generar: Callable[[], bytes]) -> Tuple[bytes, bool]:
+    """
+    Ejecuta generar() una sola vez por clave: si ya hay un cálculo en curso
+    con la misma clave, espera a que termine y usa su resultado (o su error).
+
+    Returns:
+        Tuple[bytes, bool]: El cuerpo generado y si se compartió de otra petición
+    """
+    with _lock_vuelos:
+        vuelo = _vuelos.get(clave)
+        es_lider = vuelo is None
+        if es_lider:
+            vuelo = _vuelos[clave] = _Vuelo()
+
+    if not es_lider:
+        vuelo.listo.wait()
+        if vuelo.error is not None:
+            raise vuelo.error
+        return vuelo.cuerpo, True
+
+    try:
+        vuelo.cuerpo = generar()
+    except BaseException as e:
+        vuelo.error = e
+        raise
+    finally:
+        with _lock_vuelos:
+            del _vuelos[clave]
+        vuelo.listo.set()
+
+    return vuelo.cuerpo, False
+
+
+def respuesta_cacheada(
+    endpoint: str,
+    parametros: Dict[str, Any],
+    fecha_inicio: date,
+    fecha_fin: date,
+    generar: Callable[[], Any]
+) -> Response:
+    """
+    Devuelve la respuesta JSON del reporte desde la caché, o la genera con
+    generar() y la guarda. Las peticiones idénticas que llegan mientras se
+    genera esperan ese mismo cálculo en lugar de repetirlo.
+
+    Args:
+        endpoint (str): Nombre del reporte
+        parametros (Dict[str, Any]): Parámetros que distinguen al reporte
+        fecha_inicio (date): Primer día que lee el reporte
+        fecha_fin (date): Último día que lee el reporte
+        generar (Callable[[], Any]): Genera el reporte si no está en caché
+
+    Returns:
+        Response: Respuesta JSON (con el encabezado X-Cache: HIT, MISS o SHARED)
+    """
+    clave = _clave(endpoint, parametros, fecha_inicio, fecha_fin)
+
+    if settings.CACHE_REPORTES_ACTIVO:
+        contenido = _obtener(clave)
+        if contenido is not None:
+            return Response(zlib.decompress(contenido), media_type="application/json", headers={"X-Cache": "HIT"})
+
+    def generar_y_guardar() -> bytes:
+        cuerpo = serializar_json(generar()).encode("utf-8")
+        if settings.CACHE_REPORTES_ACTIVO:
+            # Un período que ya terminó no expira; uno abierto sí, por los registros de hoy
+            expira = None
+            if fecha_fin >= date.today():
+                expira = time.time() + settings.SEGUNDOS_CACHE_PERIODO_ABIERTO
+            _guardar(clave, _Entrada(zlib.compress(cuerpo, 6), expira))
+        return cuerpo
+
+    cuerpo, compartido = _generar_una_vez(clave, generar_y_guardar)
+
+    return Response(cuerpo, media_type="application/json", headers={"X-Cache": "SHARED" if compartido else "MISS"})
+
+
+def _valor_historial(historial, anterior: bool):
+    valores = (historial.deleted or historial.unchanged) if anterior else (historial.added or historial.unchanged)
+    return valores[0] if valores else None
+
+
+def meses_modificados(objeto) -> set:
+    """
+    Meses (año, mes) que abarca un registro, justificación o día festivo antes
+    y después del cambio. Una justificación por período abarca todos los meses
+    de su fecha a su fecha_fin.
+    """
+    estado = inspect(objeto)
+    meses = set()
+    for anterior in (False, True):
+        inicio = _valor_historial(estado.attrs.fecha.history, anterior)
+        if inicio is None:
+            continue
+        fin = None
+        if isinstance(objeto, Justificacion):
+            # Sin cargar, fecha_fin no tiene historial (justificación de un día)
+            fin = _valor_historial(estado.attrs.fecha_fin.history, anterior)
+        fin = max(fin or inicio, inicio)
+
+        anio, mes = inicio.year, inicio.month
+        while (anio, mes) <= (fin.year, fin.month):
+            meses.add((anio, mes))
+            anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return meses
+
+
+@event.listens_for(Session, "after_flush")
+def _registrar_cambios(session, flush_context):
+    # En after_flush las listas new/dirty/deleted y el historial todavía
+    # describen los cambios enviados; las versiones se renuevan hasta el commit
+    cambios = session.info.setdefault("cache_reportes_cambios", set())
+
+    modificados = [objeto for objeto in session.dirty if session.is_modified(objeto)]
+    for objeto in chain(session.new, modificados, session.deleted):
+        if isinstance(objeto, TABLAS_POR_FECHA):
+            meses = meses_modificados(objeto)
+            if not meses:
+                # Sin la fecha cargada no se sabe qué mes cambió
+                cambios.add(VERSION_GLOBAL)
+            for anio, mes in meses:
+                cambios.add(f"{anio:04d}-{mes:02d}")
+        elif isinstance(objeto, TABLAS_GLOBALES):
+            if isinstance(objeto, Trabajador) and objeto not in session.new and objeto not in session.deleted:
+                estado = inspect(objeto)
+                if not any(estado.attrs[columna].history.has_changes() for columna in COLUMNAS_TRABAJADOR):
+                    continue
+            cambios.add(VERSION_GLOBAL)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_cambios(session):
+    cambios = session.info.pop("cache_reportes_cambios", None)
+    if cambios:
+        invalidar(cambios)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_cambios(session):
+    session.info.pop("cache_reportes_cambios", None)
@@ -0,0 +1,418 @@
+from sqlalchemy.orm import Session, joinedload, load_only, undefer
+from sqlalchemy import func
+from bisect import bisect_left, bisect_right
+from datetime import datetime, date, time, timedelta
+from typing import Optional, Dict, List, Tuple, NamedTuple, Iterator
+from app.config import settings
+from app.models.models import (
+    RegistroAsistencia,
+    Trabajador,
+    Justificacion,
+    ReglaJustificacion,
+    DiaFestivo,
+    ResumenDiario
+)
+
+
+class DiaResuelto(NamedTuple):
+    """Estado resuelto de un trabajador en un día"""
+    estatus: str
+    hora_entrada: Optional[datetime] = None
+    hora_salida: Optional[datetime] = None
+    id_justificacion: Optional[int] = None
+    fecha_justificacion: Optional[datetime] = None
+    justificacion: Optional[str] = None
+
+
+DIA_SIN_REGISTROS = DiaResuelto("NO_REGISTRADO")
+
+
+def resolver_dia(registros: list, justificacion: Optional[Justificacion] = None, descripcion: Optional[str] = None) -> DiaResuelto:
+    """
+    Resuelve el estado de un día a partir de sus registros (en orden cronológico)
+    y su primera justificación.
+
+    La entrada es el primer registro que no es SALIDA y la salida el último
+    registro de SALIDA. El estatus es el de la entrada; sin entrada es
+    JUSTIFICADO si hay justificación y NO_REGISTRADO si no la hay.
+    """
+    entrada = None
+    salida = None
+    for registro in registros:
+        if registro.estatus != "SALIDA":
+            if entrada is None:
+                entrada = registro
+        else:
+            salida = registro
+
+    if entrada:
+        estatus = entrada.estatus
+    elif justificacion:
+        estatus = "JUSTIFICADO"
+    else:
+        estatus = "NO_REGISTRADO"
+
+    return DiaResuelto(
+        estatus=estatus,
+        hora_entrada=entrada.fecha if entrada else None,
+        hora_salida=salida.fecha if salida else None,
+        id_justificacion=justificacion.id if justificacion else None,
+        fecha_justificacion=justificacion.fecha if justificacion else None,
+        justificacion=descripcion
+    )
+
+
+def rango_justificacion(justificacion: Justificacion) -> Tuple[date, date]:
+    """Primer y último día que cubre una justificación"""
+    inicio = justificacion.fecha.date()
+    if settings.JUSTIFICACIONES_POR_PERIODO_ACTIVO and justificacion.fecha_fin is not None:
+        return inicio, max(inicio, justificacion.fecha_fin.date())
+    return inicio, inicio
+
+
+def filtros_justificaciones(fecha_inicio_dt: datetime, fecha_fin_dt: datetime) -> list:
+    """Filtros de las justificaciones que cubren algún día del rango"""
+    if not settings.JUSTIFICACIONES_POR_PERIODO_ACTIVO:
+        return [Justificacion.fecha >= fecha_inicio_dt, Justificacion.fecha <= fecha_fin_dt]
+    # Ninguna justificación dura más de DIAS_MAXIMOS_JUSTIFICACION: la cota
+    # inferior sobre fecha deja usar el índice (fecha, id) de justificaciones en
+    # lugar de revisar toda la tabla
+    return [
+        Justificacion.fecha >= fecha_inicio_dt - timedelta(days=settings.DIAS_MAXIMOS_JUSTIFICACION),
+        Justificacion.fecha <= fecha_fin_dt,
+        func.coalesce(Justificacion.fecha_fin, Justificacion.fecha) >= fecha_inicio_dt
+    ]
+
+
+def opciones_justificacion() -> list:
+    """Opciones de carga de Justificacion: fecha_fin solo existe en bases migradas"""
+    return [undefer(Justificacion.fecha_fin)] if settings.JUSTIFICACIONES_POR_PERIODO_ACTIVO else []
+
+
+class IntervalosJustificacion:
+    """
+    Justificaciones de un trabajador como intervalos de días [inicio, fin],
+    agregadas en orden de inicio. La justificación que cubre un día se busca
+    con bisect sobre los inicios y sobre el máximo acumulado de los fines, sin
+    recorrer la lista.
+    """
+
+    def __init__(self):
+        self.inicios: List[date] = []
+        self.fines_maximos: List[date] = []
+        self.elementos: List[Tuple[date, date, Justificacion, Optional[str]]] = []
+
+    def agregar(self, justificacion: Justificacion, descripcion: Optional[str]) -> None:
+        inicio, fin = rango_justificacion(justificacion)
+        self.inicios.append(inicio)
+        self.fines_maximos.append(max(fin, self.fines_maximos[-1]) if self.fines_maximos else fin)
+        self.elementos.append((inicio, fin, justificacion, descripcion))
+
+    def buscar(self, fecha: date) -> Tuple[Optional[Justificacion], Optional[str]]:
+        """Justificación que cubre el día (la de inicio más antiguo) y su descripción"""
+        k = bisect_right(self.inicios, fecha)
+        if k == 0 or self.fines_maximos[k - 1] < fecha:
+            return None, None
+        # El primer intervalo cuyo máximo acumulado alcanza el día es el que lo cubre
+        _, _, justificacion, descripcion = self.elementos[bisect_left(self.fines_maximos, fecha, 0, k)]
+        return justificacion, descripcion
+
+    def por_dia(self, desde: date, hasta: date) -> Dict[date, list]:
+        """Justificaciones que cubren cada día de [desde, hasta]"""
+        dias = {}
+        for inicio, fin, justificacion, descripcion in self.elementos:
+            fecha = max(inicio, desde)
+            while fecha <= min(fin, hasta):
+                dias.setdefault(fecha, []).append((justificacion, descripcion))
+                fecha += timedelta(days=1)
+        return dias
+
+
+class DatosReporte:
+    """
+    Datos precargados de un reporte: trabajadores con su departamento, registros
+    de asistencia, justificaciones con su regla y días festivos del período,
+    indexados por trabajador y por día para consultarlos sin ir a la BD.
+    """
+
+    def __init__(
+        self,
+        fecha_inicio: date,
+        fecha_fin: date,
+        trabajadores: List[Trabajador],
+        registros: Dict[int, Dict[date, list]],
+        justificaciones: Dict[int, IntervalosJustificacion],
+        dias_festivos: List[DiaFestivo],
+        resumen: Optional[Dict[int, Dict[date, DiaResuelto]]] = None
+    ):
+        self.fecha_inicio = fecha_inicio
+        self.fecha_fin = fecha_fin
+        self.trabajadores = trabajadores
+        self.registros = registros
+        self.justificaciones = justificaciones
+        self.dias_festivos = dias_festivos
+        self.resumen = resumen
+        self.dias_festivos_set = {festivo.fecha.date() for festivo in dias_festivos}
+
+    def registros_del_dia(self, trabajador_id: int, fecha: date) -> list:
+        """Registros de asistencia del trabajador en el día, ordenados por hora"""
+        return self.registros.get(trabajador_id, {}).get(fecha, [])
+
+    def registros_por_dia(self, trabajador_id: int) -> Dict[date, list]:
+        """Todos los registros del trabajador en el período, agrupados por día"""
+        return self.registros.get(trabajador_id, {})
+
+    def justificacion_del_dia(self, trabajador_id: int, fecha: date) -> Tuple[Optional[Justificacion], Optional[str]]:
+        """Primera justificación que cubre el día del trabajador y la descripción de su regla"""
+        intervalos = self.justificaciones.get(trabajador_id)
+        if intervalos is None:
+            return None, None
+        return intervalos.buscar(fecha)
+
+    def justificaciones_por_dia(self, trabajador_id: int) -> Dict[date, list]:
+        """Todas las justificaciones del trabajador en el período, agrupadas por día"""
+        intervalos = self.justificaciones.get(trabajador_id)
+        if intervalos is None:
+            return {}
+        return intervalos.por_dia(self.fecha_inicio, self.fecha_fin)
+
+    def dia(self, trabajador_id: int, fecha: date) -> DiaResuelto:
+        """
+        Estado resuelto del trabajador en el día: se lee de la tabla de resumen
+        si se cargó desde ella, o se resuelve a partir de los registros
+        """
+        if self.resumen is not None:
+            return self.resumen.get(trabajador_id, {}).get(fecha, DIA_SIN_REGISTROS)
+
+        registros = self.registros_del_dia(trabajador_id, fecha)
+        justificacion, descripcion = self.justificacion_del_dia(trabajador_id, fecha)
+        if not registros and not justificacion:
+            return DIA_SIN_REGISTROS
+        return resolver_dia(registros, justificacion, descripcion)
+
+    def dias_con_datos(self) -> Iterator[Tuple[int, date, DiaResuelto]]:
+        """
+        Días resueltos que tienen registros o justificación, como
+        (trabajador, fecha, día); los demás días son DIA_SIN_REGISTROS
+        """
+        if self.resumen is not None:
+            for trabajador_id, dias in self.resumen.items():
+                for fecha, dia in dias.items():
+                    yield trabajador_id, fecha, dia
+            return
+
+        for trabajador_id in self.registros.keys() | self.justificaciones.keys():
+            registros = self.registros.get(trabajador_id, {})
+            justificaciones = self.justificaciones_por_dia(trabajador_id)
+            for fecha in registros.keys() | justificaciones.keys():
+                yield trabajador_id, fecha, self.dia(trabajador_id, fecha)
+
+    def es_festivo(self, fecha: date) -> bool:
+        return fecha in self.dias_festivos_set
+
+    @staticmethod
+    def nombre_departamento(trabajador: Trabajador) -> str:
+        if trabajador.departamento_rel:
+            return trabajador.departamento_rel.descripcion
+        return "Sin departamento"
+
+
+def fila_resumen(id_trabajador: int, fecha: date, registros: list, justificacion: Optional[Justificacion]) -> dict:
+    """Fila de resumen_diario de un trabajador en un día a partir de sus registros y su primera justificación"""
+    dia = resolver_dia(registros, justificacion)
+    return {
+        "id_trabajador": id_trabajador,
+        "fecha": fecha,
+        "estatus": dia.estatus,
+        "hora_entrada": dia.hora_entrada,
+        "hora_salida": dia.hora_salida,
+        "id_justificacion": dia.id_justificacion
+    }
+
+
+def filas_resumen_rango(db: Session, fecha_inicio: date, fecha_fin: date, trabajador_ids: Optional[List[int]] = None) -> list:
+    """
+    Filas de resumen_diario (días ya resueltos) de los días con registros o
+    justificación en el rango, con dos consultas. Son la base de resumen_diario,
+    del mapa de asistencia y de los contadores de puntualidad.
+    """
+    inicio_dt = datetime.combine(fecha_inicio, time.min)
+    fin_dt = datetime.combine(fecha_fin, time.max)
+
+    query_registros = db.query(RegistroAsistencia).filter(
+        RegistroAsistencia.fecha >= inicio_dt,
+        RegistroAsistencia.fecha <= fin_dt
+    )
+    query_justificaciones = db.query(Justificacion).options(*opciones_justificacion()).filter(
+        *filtros_justificaciones(inicio_dt, fin_dt)
+    )
+    if trabajador_ids is not None:
+        query_registros = query_registros.filter(RegistroAsistencia.id_trabajador.in_(trabajador_ids))
+        query_justificaciones = query_justificaciones.filter(Justificacion.id_trabajador.in_(trabajador_ids))
+
+    # Agrupar registros y primera justificación por (trabajador, día)
+    registros_por_dia = {}
+    for registro in query_registros.order_by(
+        RegistroAsistencia.id_trabajador, RegistroAsistencia.fecha, RegistroAsistencia.id
+    ):
+        registros_por_dia.setdefault((registro.id_trabajador, registro.fecha.date()), []).append(registro)
+
+    justificacion_por_dia = {}
+    for justificacion in query_justificaciones.order_by(
+        Justificacion.id_trabajador, Justificacion.fecha, Justificacion.id
+    ):
+        inicio, fin = rango_justificacion(justificacion)
+        fecha = max(inicio, fecha_inicio)
+        while fecha <= min(fin, fecha_fin):
+            justificacion_por_dia.setdefault((justificacion.id_trabajador, fecha), justificacion)
+            fecha += timedelta(days=1)
+
+    return [
+        fila_resumen(
+            id_trabajador,
+            fecha,
+            registros_por_dia.get((id_trabajador, fecha), []),
+            justificacion_por_dia.get((id_trabajador, fecha))
+        )
+        for id_trabajador, fecha in sorted(set(registros_por_dia) | set(justificacion_por_dia))
+        if id_trabajador is not None
+    ]
+
+
+def filtros_alcance(
+    departamento_id: Optional[int] = None,
+    trabajador_id: Optional[int] = None,
+    trabajador_ids: Optional[List[int]] = None
+) -> list:
+    """Filtros de los trabajadores que abarca un reporte: solo trabajadores activos"""
+    filtros = [Trabajador.estado == True]
+    if departamento_id:
+        filtros.append(Trabajador.departamento == departamento_id)
+    if trabajador_id:
+        filtros.append(Trabajador.id == trabajador_id)
+    if trabajador_ids is not None:
+        filtros.append(Trabajador.id.in_(trabajador_ids))
+    return filtros
+
+
+def cargar_trabajadores(db: Session, filtros: list) -> List[Trabajador]:
+    """Trabajadores del alcance con su departamento (sin la huella ni otras columnas pesadas)"""
+    return db.query(Trabajador).options(
+        load_only(
+            Trabajador.id,
+            Trabajador.nombre,
+            Trabajador.apellidoPaterno,
+            Trabajador.apellidoMaterno,
+            Trabajador.rfc,
+            Trabajador.puesto,
+            Trabajador.correo,
+            Trabajador.departamento,
+            Trabajador.id_horario
+        ),
+        joinedload(Trabajador.departamento_rel)
+    ).filter(*filtros).order_by(Trabajador.id).all()
+
+
+def cargar_datos_reporte(
+    db: Session,
+    fecha_inicio: date,
+    fecha_fin: date,
+    departamento_id: Optional[int] = None,
+    trabajador_id: Optional[int] = None,
+    trabajador_ids: Optional[List[int]] = None,
+    desde_resumen: bool = False
+) -> DatosReporte:
+    """
+    Carga todos los datos de un reporte con un número fijo de consultas
+    (trabajadores, registros, justificaciones y días festivos), sin importar
+    cuántos trabajadores o días abarque.
+
+    Args:
+        db (Session): Sesión de la base de datos
+        fecha_inicio (date): Fecha de inicio del período
+        fecha_fin (date): Fecha de fin del período
+        departamento_id (Optional[int]): ID del departamento (opcional)
+        trabajador_id (Optional[int]): ID del trabajador (opcional)
+        trabajador_ids (Optional[List[int]]): Lista de IDs de trabajadores (opcional)
+        desde_resumen (bool): Leer los días ya resueltos de la tabla resumen_diario
+            en lugar de los registros y las justificaciones
+
+    Returns:
+        DatosReporte: Datos indexados por trabajador y día
+    """
+    fecha_inicio_dt = datetime.combine(fecha_inicio, time.min)
+    fecha_fin_dt = datetime.combine(fecha_fin, time.max)
+
+    filtros = filtros_alcance(departamento_id, trabajador_id, trabajador_ids)
+
+    # 1. Trabajadores con su departamento
+    trabajadores = cargar_trabajadores(db, filtros)
+
+    # Subconsulta con los IDs del alcance, para no enviar listas enormes de IDs
+    ids_alcance = db.query(Trabajador.id).filter(*filtros).scalar_subquery()
+
+    registros = {}
+    justificaciones = {}
+    resumen = None
+
+    if desde_resumen:
+        # 2. Días ya resueltos del período, con la justificación y su regla
+        resumen = {}
+        for fila, fecha_justificacion, descripcion in db.query(
+            ResumenDiario, Justificacion.fecha, ReglaJustificacion.descripcion
+        ).outerjoin(
+            Justificacion, ResumenDiario.id_justificacion == Justificacion.id
+        ).outerjoin(
+            ReglaJustificacion, Justificacion.id_descripcion == ReglaJustificacion.id
+        ).filter(
+            ResumenDiario.id_trabajador.in_(ids_alcance),
+            ResumenDiario.fecha >= fecha_inicio,
+            ResumenDiario.fecha <= fecha_fin
+        ):
+            resumen.setdefault(fila.id_trabajador, {})[fila.fecha] = DiaResuelto(
+                estatus=fila.estatus,
+                hora_entrada=fila.hora_entrada,
+                hora_salida=fila.hora_salida,
+                id_justificacion=fila.id_justificacion,
+                fecha_justificacion=fecha_justificacion,
+                justificacion=descripcion
+            )
+    else:
+        # 2. Registros de asistencia del período, en orden cronológico
+        for registro in db.query(RegistroAsistencia).filter(
+            RegistroAsistencia.id_trabajador.in_(ids_alcance),
+            RegistroAsistencia.fecha >= fecha_inicio_dt,
+            RegistroAsistencia.fecha <= fecha_fin_dt
+        ).order_by(RegistroAsistencia.id_trabajador, RegistroAsistencia.fecha, RegistroAsistencia.id):
+            registros.setdefault(registro.id_trabajador, {}).setdefault(
+                registro.fecha.date(), []
+            ).append(registro)
+
+        # 3. Justificaciones que cubren algún día del período con la descripción de su regla
+        for justificacion, descripcion in db.query(
+            Justificacion, ReglaJustificacion.descripcion
+        ).options(*opciones_justificacion()).outerjoin(
+            ReglaJustificacion, Justificacion.id_descripcion == ReglaJustificacion.id
+        ).filter(
+            Justificacion.id_trabajador.in_(ids_alcance),
+            *filtros_justificaciones(fecha_inicio_dt, fecha_fin_dt)
+        ).order_by(Justificacion.id_trabajador, Justificacion.fecha, Justificacion.id):
+            if justificacion.id_trabajador not in justificaciones:
+                justificaciones[justificacion.id_trabajador] = IntervalosJustificacion()
+            justificaciones[justificacion.id_trabajador].agregar(justificacion, descripcion)
+
+    # 4. Días festivos del período
+    dias_festivos = db.query(DiaFestivo).filter(
+        DiaFestivo.fecha >= fecha_inicio_dt,
+        DiaFestivo.fecha <= fecha_fin_dt
+    ).order_by(DiaFestivo.fecha).all()
+
+    return DatosReporte(
+        fecha_inicio,
+        fecha_fin,
+        trabajadores,
+        registros,
+        justificaciones,
+        dias_festivos,
+        resumen
+    )
@@ -0,0 +1,65 @@
+from sqlalchemy.orm import Session
+from datetime import datetime, date
+from typing import List, Union
+from app.config import settings
+from app.services.datos_reporte import filas_resumen_rango
+from app.services.resumen_service import actualizar_resumen_rango
+from app.services.mapa_asistencia_service import actualizar_mapa_rango
+from app.services.puntualidad_service import actualizar_contadores_rango, rango_quincenas
+
+# Tablas derivadas de los registros y las justificaciones: resumen_diario,
+# mapa_asistencia y contador_puntualidad. Los días del rango se resuelven una
+# sola vez y cada tabla activa se escribe a partir de esas filas; con los
+# contadores activos el rango se amplía a quincenas completas, porque cada
+# quincena se vuelve a contar entera.
+
+
+def actualizar_derivados_rango(
+    db: Session,
+    trabajador_ids: List[int],
+    fecha_inicio: Union[date, datetime],
+    fecha_fin: Union[date, datetime]
+) -> None:
+    """
+    Recalcula las tablas derivadas de varios trabajadores en un rango de días.
+    Se llama después de crear, modificar o borrar registros o justificaciones,
+    antes del commit.
+
+    Args:
+        db (Session): Sesión de la base de datos
+        trabajador_ids (List[int]): IDs de los trabajadores
+        fecha_inicio (date | datetime): Primer día a recalcular
+        fecha_fin (date | datetime): Último día a recalcular
+    """
+    if isinstance(fecha_inicio, datetime):
+        fecha_inicio = fecha_inicio.date()
+    if isinstance(fecha_fin, datetime):
+        fecha_fin = fecha_fin.date()
+
+    trabajador_ids = sorted({id_trabajador for id_trabajador in trabajador_ids if id_trabajador is not None})
+    if not trabajador_ids:
+        return
+
+    por_dia = settings.RESUMEN_DIARIO_ACTIVO or settings.MAPA_ASISTENCIA_ACTIVO
+    if not por_dia and not settings.CONTADORES_PUNTUALIDAD_ACTIVO:
+        return
+
+    inicio, fin = fecha_inicio, fecha_fin
+    if settings.CONTADORES_PUNTUALIDAD_ACTIVO:
+        inicio, fin = rango_quincenas(fecha_inicio, fecha_fin)
+
+    # La sesión no hace autoflush: enviar los cambios pendientes antes de leer
+    db.flush()
+    filas = filas_resumen_rango(db, inicio, fin, trabajador_ids)
+
+    if por_dia:
+        del_rango = [fila for fila in filas if fecha_inicio <= fila["fecha"] <= fecha_fin]
+        actualizar_resumen_rango(db, trabajador_ids, fecha_inicio, fecha_fin, del_rango)
+        actualizar_mapa_rango(db, trabajador_ids, fecha_inicio, fecha_fin, del_rango)
+
+    actualizar_contadores_rango(db, trabajador_ids, inicio, fin, filas)
+
+
+def actualizar_derivados_dia(db: Session, id_trabajador: int, fecha: Union[date, datetime]) -> None:
+    """Recalcula las tablas derivadas de un trabajador en un día; ver actualizar_derivados_rango"""
+    actualizar_derivados_rango(db, [id_trabajador], fecha, fecha)
@@ -0,0 +1,243 @@
+import csv
+import io
+from sqlalchemy.orm import Session
+from datetime import date, timedelta
+from typing import Optional, Iterator, List, Any, Tuple, Dict, Callable
+from app.config import settings
+from app.database import SessionLocal
+from app.models.models import Trabajador
+from app.services.datos_reporte import cargar_datos_reporte
+from app.services.matriz_asistencia import MatrizAsistencia
+from app.services.reporte_sevice import resumir_trabajador, resumir_retardos_faltas
+from app.utils.xlsx import EscritorXlsx, SalidaEnBloques
+
+# Trabajadores que se cargan y procesan por bloque al exportar
+TRABAJADORES_POR_BLOQUE = 200
+
+# Bytes comprimidos que se acumulan antes de enviar un fragmento del XLSX
+TAMANO_FRAGMENTO_XLSX = 64 * 1024
+
+
+def encabezados_reporte(fecha_inicio: date, fecha_fin: date, tipo: str = "asistencias") -> List[str]:
+    """Encabezados del reporte: datos del trabajador, estadísticas y una columna por día"""
+    if tipo == "retardos-faltas":
+        headers = ["ID", "Nombre", "RFC", "Departamento", "Puesto", "Días Laborables",
+                   "Asistencias", "Retardos", "Retardos Menores", "Retardos Mayores", "Faltas", "% Asistencia"]
+    else:
+        headers = ["ID", "Nombre", "RFC", "Departamento", "Puesto", "Días Laborables",
+                   "Asistencias", "Retardos", "Faltas", "Justificados", "% Asistencia"]
+
+    fecha = fecha_inicio
+    while fecha <= fecha_fin:
+        headers.append(f"{fecha.day}/{fecha.month}/{fecha.year}")
+        fecha += timedelta(days=1)
+
+    return headers
+
+
+def _fila_asistencias(matriz: MatrizAsistencia, indice: int) -> Tuple[List[Any], Dict[date, str]]:
+    resumen = resumir_trabajador(matriz, indice)
+    estadisticas = resumen["estadisticas"]
+    row = [
+        resumen["id"],
+        resumen["nombre"],
+        resumen["rfc"],
+        resumen["departamento"],
+        resumen["puesto"],
+        estadisticas["dias_laborables"],
+        estadisticas["asistencias"],
+        estadisticas["retardos"],
+        estadisticas["faltas"],
+        estadisticas["justificados"],
+        f"{estadisticas['porcentaje_asistencia']:.2f}%"
+    ]
+    return row, {r["fecha"]: r["estatus"] for r in resumen["registros_diarios"]}
+
+
+def _fila_retardos_faltas(matriz: MatrizAsistencia, indice: int) -> Tuple[List[Any], Dict[date, str]]:
+    resumen = resumir_retardos_faltas(matriz, indice)
+    estadisticas = resumen["estadisticas"]
+    row = [
+        resumen["id"],
+        resumen["nombre"],
+        resumen["rfc"],
+        resumen["departamento"],
+        resumen["puesto"],
+        estadisticas["dias_laborables"],
+        estadisticas["asistencias"],
+        estadisticas["retardos"],
+        estadisticas["retardos_menores"],
+        estadisticas["retardos_mayores"],
+        estadisticas["faltas"],
+        f"{estadisticas['porcentaje_asistencia']:.2f}%"
+    ]
+    return row, {date.fromisoformat(r["fecha"]): r["estatus"] for r in resumen["registros_diarios"]}
+
+
+# Función que arma la fila de cada tipo de reporte exportable
+FILAS_POR_TIPO = {
+    "asistencias": _fila_asistencias,
+    "retardos-faltas": _fila_retardos_faltas,
+}
+
+
+def generar_filas_reporte(
+    db: Session,
+    fecha_inicio: date,
+    fecha_fin: date,
+    departamento_id: Optional[int] = None,
+    por_departamento: bool = False,
+    tipo: str = "asistencias",
+    al_avanzar: Optional[Callable[[int, int], None]] = None
+) -> Iterator[List[Any]]:
+    """
+    Genera las filas del reporte de asistencias trabajador por trabajador.
+    Los trabajadores se cargan por bloques, así que la memoria no depende del
+    número de trabajadores ni del tamaño del período.
+
+    Args:
+        db (Session): Sesión de la base de datos
+        fecha_inicio (date): Fecha de inicio del período
+        fecha_fin (date): Fecha de fin del período
+        departamento_id (Optional[int]): ID del departamento (opcional)
+        por_departamento (bool): Ordenar por departamento (para separar hojas)
+        tipo (str): Tipo de reporte ("asistencias" o "retardos-faltas")
+        al_avanzar (Optional[Callable[[int, int], None]]): Se llama al terminar cada
+            bloque con (trabajadores procesados, total de trabajadores)
+
+    Yields:
+        List[Any]: Una fila por trabajador, en el orden de encabezados_reporte
+    """
+    armar_fila = FILAS_POR_TIPO[tipo]
+
+    query = db.query(Trabajador.id).filter(Trabajador.estado == True)
+    if departamento_id:
+        query = query.filter(Trabajador.departamento == departamento_id)
+    if por_departamento:
+        query = query.order_by(Trabajador.departamento, Trabajador.id)
+    else:
+        query = query.order_by(Trabajador.id)
+
+    ids = [fila.id for fila in query]
+    if al_avanzar:
+        al_avanzar(0, len(ids))
+
+    for inicio in range(0, len(ids), TRABAJADORES_POR_BLOQUE):
+        bloque = ids[inicio:inicio + TRABAJADORES_POR_BLOQUE]
+        datos = cargar_datos_reporte(
+            db,
+            fecha_inicio,
+            fecha_fin,
+            trabajador_ids=bloque,
+            desde_resumen=settings.RESUMEN_DIARIO_ACTIVO
+        )
+
+        matriz = MatrizAsistencia(datos)
+
+        # El cargador ordena por ID; respetar el orden del bloque
+        for trabajador_id in bloque:
+            indice = matriz.indice_trabajador.get(trabajador_id)
+            if indice is None:
+                continue
+
+            row, estatus_por_fecha = armar_fila(matriz, indice)
+
+            # Estatus de cada día del período (vacío en días no laborables)
+            fecha = fecha_inicio
+            while fecha <= fecha_fin:
+                row.append(estatus_por_fecha.get(fecha, ""))
+                fecha += timedelta(days=1)
+
+            yield row
+
+        # Liberar los objetos del bloque antes de cargar el siguiente
+        db.expunge_all()
+
+        if al_avanzar:
+            al_avanzar(inicio + len(bloque), len(ids))
+
+
+def generar_csv_reporte(
+    fecha_inicio: date,
+    fecha_fin: date,
+    departamento_id: Optional[int] = None,
+    tipo: str = "asistencias",
+    al_avanzar: Optional[Callable[[int, int], None]] = None
+) -> Iterator[str]:
+    """
+    Genera el CSV del reporte en fragmentos, a medida que se calculan las filas.
+    Abre su propia sesión porque se consume después de que el endpoint termina.
+    """
+    db = SessionLocal()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def vaciar() -> str:
+        contenido = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return contenido
+
+    try:
+        writer.writerow(encabezados_reporte(fecha_inicio, fecha_fin, tipo))
+        yield vaciar()
+
+        filas = generar_filas_reporte(
+            db, fecha_inicio, fecha_fin, departamento_id, tipo=tipo, al_avanzar=al_avanzar
+        )
+        for i, row in enumerate(filas, start=1):
+            writer.writerow(row)
+            if i % 50 == 0:
+                yield vaciar()
+
+        contenido = vaciar()
+        if contenido:
+            yield contenido
+    finally:
+        db.close()
+
+
+def generar_xlsx_reporte(
+    fecha_inicio: date,
+    fecha_fin: date,
+    departamento_id: Optional[int] = None,
+    tipo: str = "asistencias",
+    por_departamento: bool = True,
+    al_avanzar: Optional[Callable[[int, int], None]] = None
+) -> Iterator[bytes]:
+    """
+    Genera el XLSX del reporte en fragmentos, con las mismas filas que el CSV.
+    Con por_departamento cada departamento va en su propia hoja.
+    Abre su propia sesión porque se consume después de que el endpoint termina.
+    """
+    db = SessionLocal()
+    salida = SalidaEnBloques()
+    libro = EscritorXlsx(salida)
+    encabezados = encabezados_reporte(fecha_inicio, fecha_fin, tipo)
+    hoja_actual = None
+
+    try:
+        filas = generar_filas_reporte(
+            db, fecha_inicio, fecha_fin, departamento_id,
+            por_departamento=por_departamento, tipo=tipo, al_avanzar=al_avanzar
+        )
+        for row in filas:
+            # La columna 3 es el departamento; las filas vienen agrupadas por él
+            hoja = row[3] if por_departamento else "Reporte"
+            if hoja != hoja_actual:
+                libro.nueva_hoja(hoja)
+                libro.escribir_fila(encabezados, estilo=1)
+                hoja_actual = hoja
+
+            libro.escribir_fila(row)
+            if salida.pendiente() >= TAMANO_FRAGMENTO_XLSX:
+                yield salida.vaciar()
+
+        if hoja_actual is None:
+            libro.nueva_hoja("Reporte")
+            libro.escribir_fila(encabezados, estilo=1)
+
+        libro.cerrar()
+        yield salida.vaciar()
+    finally:
+        db.close()
@@ -0,0 +1,159 @@
+import numpy as np
+from bisect import bisect_right
+from sqlalchemy.orm import Session
+from datetime import datetime, date, time, timedelta
+from typing import Optional, Dict, List, Tuple, Iterator
+from app.models.models import Trabajador, Horario, AsignacionHorario
+
+# Prefijos de las columnas de Horario por día de la semana (0 = lunes)
+DIAS_HORARIO = ("lunes", "martes", "miercoles", "jueves", "viernes")
+
+
+def entrada_del_dia(horario: Optional[Horario], dia_semana: int) -> Optional[time]:
+    """Hora de entrada del horario en un día de la semana (None en fin de semana o sin horario)"""
+    if horario is None or dia_semana >= len(DIAS_HORARIO):
+        return None
+    return getattr(horario, f"{DIAS_HORARIO[dia_semana]}Entrada")
+
+
+def salida_del_dia(horario: Optional[Horario], dia_semana: int) -> Optional[time]:
+    """Hora de salida del horario en un día de la semana (None en fin de semana o sin horario)"""
+    if horario is None or dia_semana >= len(DIAS_HORARIO):
+        return None
+    return getattr(horario, f"{DIAS_HORARIO[dia_semana]}Salida")
+
+
+def historial_inicial(
+    db: Session,
+    trabajador_ids: Optional[List[int]] = None,
+    antes_de: Optional[datetime] = None
+) -> List[dict]:
+    """
+    Filas de asignacionhorarios con el horario actual, desde su fecha de
+    ingreso, de los trabajadores con horario y sin historial. Se insertan
+    antes de asignarles un horario nuevo, para que los días anteriores al
+    cambio sigan resolviendo al horario que tenían.
+
+    Args:
+        db (Session): Sesión de la base de datos
+        trabajador_ids (Optional[List[int]]): IDs de los trabajadores (por defecto, todos)
+        antes_de (Optional[datetime]): Inicio de la asignación nueva; los que
+            ingresaron a partir de ese día no necesitan la fila
+
+    Returns:
+        List[dict]: Filas para bulk_insert_mappings(AsignacionHorario, ...)
+    """
+    query = db.query(Trabajador.id, Trabajador.id_horario, Trabajador.fechaIngresoSep).filter(
+        Trabajador.id_horario.isnot(None),
+        ~Trabajador.id.in_(db.query(AsignacionHorario.id_trabajador).filter(AsignacionHorario.id_trabajador.isnot(None)))
+    )
+    if trabajador_ids is not None:
+        query = query.filter(Trabajador.id.in_(trabajador_ids))
+    if antes_de is not None:
+        query = query.filter(Trabajador.fechaIngresoSep < antes_de)
+    return [
+        {"id_trabajador": id_trabajador, "id_horario": id_horario, "fehcaInicio": fecha_ingreso}
+        for id_trabajador, id_horario, fecha_ingreso in query.order_by(Trabajador.id)
+    ]
+
+
+def horario_vigente(db: Session, trabajador: Trabajador, fecha: date) -> Optional[Horario]:
+    """
+    Horario que rige a un trabajador en un día, con las mismas reglas que
+    ResolutorHorarios pero consultando solo su última asignación y ese
+    horario (para clasificar un solo registro al checar)
+    """
+    asignaciones = db.query(AsignacionHorario.id_horario).filter(AsignacionHorario.id_trabajador == trabajador.id)
+    ultima = asignaciones.filter(
+        AsignacionHorario.fehcaInicio < datetime.combine(fecha + timedelta(days=1), time.min)
+    ).order_by(AsignacionHorario.fehcaInicio.desc(), AsignacionHorario.id.desc()).first()
+    if ultima is None:
+        # Antes de la primera asignación rige la primera; sin historial, el horario actual
+        ultima = asignaciones.order_by(AsignacionHorario.fehcaInicio, AsignacionHorario.id).first()
+    id_horario = ultima.id_horario if ultima is not None else trabajador.id_horario
+    return db.get(Horario, id_horario) if id_horario is not None else None
+
+
+class ResolutorHorarios:
+    """
+    Horario vigente de cada trabajador en cada día, según el historial de
+    asignacionhorarios.
+
+    El historial de cada trabajador se carga una sola vez como una lista de
+    días de inicio ordenada; el horario de un día se busca con bisect. Una
+    asignación rige desde el día de su fehcaInicio hasta el día anterior a la
+    siguiente, y la última desde su fehcaInicio en adelante; antes de la
+    primera rige la primera. Trabajador.id_horario solo rige para los
+    trabajadores sin historial (al asignarles un horario se guarda antes el
+    anterior, ver historial_inicial).
+    """
+
+    def __init__(self, db: Session, trabajador_ids: Optional[List[int]] = None):
+        query_trabajadores = db.query(Trabajador.id, Trabajador.id_horario)
+        query_asignaciones = db.query(
+            AsignacionHorario.id_trabajador, AsignacionHorario.fehcaInicio, AsignacionHorario.id_horario
+        )
+        if trabajador_ids is not None:
+            query_trabajadores = query_trabajadores.filter(Trabajador.id.in_(trabajador_ids))
+            query_asignaciones = query_asignaciones.filter(AsignacionHorario.id_trabajador.in_(trabajador_ids))
+
+        # Horario actual de cada trabajador
+        self.actual: Dict[int, Optional[int]] = dict(query_trabajadores.all())
+
+        # Días de inicio y horario de cada asignación; las del mismo día se
+        # quedan en orden de captura y la última es la que rige
+        self.inicios: Dict[int, List[date]] = {}
+        self.asignados: Dict[int, List[Optional[int]]] = {}
+        for id_trabajador, fecha_inicio, id_horario in query_asignaciones.order_by(
+            AsignacionHorario.id_trabajador, AsignacionHorario.fehcaInicio, AsignacionHorario.id
+        ):
+            self.inicios.setdefault(id_trabajador, []).append(fecha_inicio.date())
+            self.asignados.setdefault(id_trabajador, []).append(id_horario)
+
+        # Catálogo de horarios (una fila por horario, tabla pequeña)
+        self.horarios: Dict[int, Horario] = {horario.id: horario for horario in db.query(Horario)}
+
+    def id_horario(self, trabajador_id: int, fecha: date) -> Optional[int]:
+        """ID del horario que rige al trabajador en el día"""
+        inicios = self.inicios.get(trabajador_id)
+        if inicios:
+            # Rige la última asignación que empezó a más tardar ese día (antes de la primera, la primera)
+            k = bisect_right(inicios, fecha)
+            return self.asignados[trabajador_id][max(k - 1, 0)]
+        return self.actual.get(trabajador_id)
+
+    def horario(self, trabajador_id: int, fecha: date) -> Optional[Horario]:
+        """Horario que rige al trabajador en el día"""
+        return self.horarios.get(self.id_horario(trabajador_id, fecha))
+
+    def tramos(self, trabajador_id: int, desde: date, hasta: date) -> Iterator[Tuple[date, date, Optional[int]]]:
+        """Tramos (inicio, fin, id_horario) de días consecutivos con el mismo horario en [desde, hasta]"""
+        inicios = self.inicios.get(trabajador_id, [])
+        # Los días de cambio dentro del rango; el horario de cada tramo es el de su primer día
+        cortes = [desde] + [inicio for inicio in inicios if desde < inicio <= hasta]
+        for k, inicio in enumerate(cortes):
+            fin = cortes[k + 1] - timedelta(days=1) if k + 1 < len(cortes) else hasta
+            if fin >= inicio:
+                yield inicio, fin, self.id_horario(trabajador_id, inicio)
+
+    def matriz(self, trabajador_ids: List[int], fecha_inicio: date, numero_dias: int) -> np.ndarray:
+        """
+        Matriz trabajadores × días con el ID del horario de cada día (0 sin
+        horario), en el mismo orden que las filas de MatrizAsistencia
+        """
+        horarios = np.zeros((len(trabajador_ids), max(numero_dias, 0)), dtype=np.int32)
+        fecha_fin = fecha_inicio + timedelta(days=numero_dias - 1)
+        for i, trabajador_id in enumerate(trabajador_ids):
+            for inicio, fin, id_horario in self.tramos(trabajador_id, fecha_inicio, fecha_fin):
+                horarios[i, (inicio - fecha_inicio).days:(fin - fecha_inicio).days + 1] = id_horario or 0
+        return horarios
+
+    def tabla_entradas(self) -> np.ndarray:
+        """Segundos del día de la hora de entrada por (ID de horario, día de la semana); -1 sin entrada"""
+        tabla = np.full((max(self.horarios, default=0) + 1, 7), -1, dtype=np.int32)
+        for id_horario, horario in self.horarios.items():
+            for dia_semana in range(7):
+                entrada = entrada_del_dia(horario, dia_semana)
+                if entrada is not None:
+                    tabla[id_horario, dia_semana] = entrada.hour * 3600 + entrada.minute * 60 + entrada.second
+        return tabla
@@ -0,0 +1,203 @@
+import numpy as np
+from sqlalchemy.orm import Session
+from datetime import datetime, date, time, timedelta
+from typing import Optional, Dict, Any
+from app.models.models import Trabajador, RegistroAsistencia, Justificacion, DiaFestivo
+from app.services.datos_reporte import (
+    DatosReporte,
+    cargar_trabajadores,
+    filtros_alcance,
+    filtros_justificaciones,
+    opciones_justificacion,
+    rango_justificacion
+)
+from app.services.horarios_service import ResolutorHorarios, entrada_del_dia, salida_del_dia
+from app.services.recalculo_service import inicios_de_grupo, registros_de_salida
+
+# Horas trabajadas contra horas programadas por trabajador y día. Las entradas
+# se emparejan con su salida y los minutos se acumulan en una matriz
+# trabajadores × días con NumPy; las horas programadas salen del horario
+# vigente de cada día (ResolutorHorarios). Todo el período se carga con un
+# número fijo de consultas, sin importar cuántos trabajadores abarque.
+
+
+def _tabla_programados(resolutor: ResolutorHorarios) -> np.ndarray:
+    """
+    Minutos programados por (ID de horario, día de la semana). Las entradas y
+    salidas se emparejan dentro del mismo día, así que un turno que cruza la
+    medianoche no se programa
+    """
+    tabla = np.zeros((max(resolutor.horarios, default=0) + 1, 7), dtype=np.int32)
+    for id_horario, horario in resolutor.horarios.items():
+        for dia_semana in range(7):
+            entrada = entrada_del_dia(horario, dia_semana)
+            salida = salida_del_dia(horario, dia_semana)
+            if entrada is not None and salida is not None:
+                minutos = (salida.hour * 60 + salida.minute) - (entrada.hour * 60 + entrada.minute)
+                tabla[id_horario, dia_semana] = max(minutos, 0)
+    return tabla
+
+
+def _minutos_trabajados(db: Session, fecha_inicio: date, numero_dias: int, ids_alcance, indice: Dict[int, int]) -> np.ndarray:
+    """
+    Minutos trabajados por trabajador y día. Cada salida se empareja con la
+    primera entrada después de la salida anterior del mismo día (una entrada
+    repetida no acorta el tramo); las entradas sin salida no suman.
+    """
+    trabajados = np.zeros((len(indice), numero_dias), dtype=np.int32)
+
+    filas = db.query(
+        RegistroAsistencia.id_trabajador, RegistroAsistencia.fecha, RegistroAsistencia.estatus
+    ).filter(
+        RegistroAsistencia.id_trabajador.in_(ids_alcance),
+        RegistroAsistencia.fecha >= datetime.combine(fecha_inicio, time.min),
+        RegistroAsistencia.fecha <= datetime.combine(fecha_inicio + timedelta(days=numero_dias - 1), time.max),
+        RegistroAsistencia.estatus != "JUSTIFICADO"
+    ).order_by(RegistroAsistencia.id_trabajador, RegistroAsistencia.fecha, RegistroAsistencia.id).all()
+
+    if not filas:
+        return trabajados
+
+    trabajadores, fechas, estatus = zip(*filas)
+    trabajadores = np.array(trabajadores, dtype=np.int64)
+    estatus = np.array(estatus, dtype=object)
+    dia = np.array([(fecha.date() - fecha_inicio).days for fecha in fechas], dtype=np.int32)
+    minuto = np.array([fecha.hour * 60 + fecha.minute for fecha in fechas], dtype=np.int32)
+
+    salida = registros_de_salida(estatus, trabajadores, dia)
+
+    # Un tramo empieza al inicio del día o después de una salida
+    inicio_tramo = inicios_de_grupo(trabajadores, dia)
+    inicio_tramo[1:] |= salida[:-1]
+    indices = np.arange(len(filas))
+    primero_del_tramo = np.maximum.accumulate(np.where(inicio_tramo, indices, 0))
+
+    # Salidas con al menos una entrada antes en su tramo
+    emparejadas = salida & (primero_del_tramo < indices)
+    fila = np.array([indice.get(t, -1) for t in trabajadores.tolist()], dtype=np.int64)
+    emparejadas &= fila >= 0
+
+    minutos = minuto[emparejadas] - minuto[primero_del_tramo[emparejadas]]
+    np.add.at(trabajados, (fila[emparejadas], dia[emparejadas]), minutos)
+    return trabajados
+
+
+def _dias_justificados(db: Session, fecha_inicio: date, numero_dias: int, ids_alcance, indice: Dict[int, int]) -> np.ndarray:
+    """Matriz booleana de los días cubiertos por una justificación"""
+    justificados = np.zeros((len(indice), numero_dias), dtype=bool)
+    fecha_fin = fecha_inicio + timedelta(days=numero_dias - 1)
+    for justificacion in db.query(Justificacion).options(*opciones_justificacion()).filter(
+        Justificacion.id_trabajador.in_(ids_alcance),
+        *filtros_justificaciones(datetime.combine(fecha_inicio, time.min), datetime.combine(fecha_fin, time.max))
+    ):
+        i = indice.get(justificacion.id_trabajador)
+        if i is None:
+            continue
+        inicio, fin = rango_justificacion(justificacion)
+        desde = max((inicio - fecha_inicio).days, 0)
+        hasta = min((fin - fecha_inicio).days, numero_dias - 1)
+        justificados[i, desde:hasta + 1] = True
+    return justificados
+
+
+def generar_reporte_horas_trabajadas(
+    db: Session,
+    fecha_inicio: date,
+    fecha_fin: date,
+    departamento_id: Optional[int] = None,
+    trabajador_id: Optional[int] = None,
+    detalle: bool = False
+) -> Dict[str, Any]:
+    """
+    Genera el reporte de minutos trabajados, programados, extra y faltantes
+    por trabajador en un período.
+
+    Los minutos programados son los del horario vigente de cada día (cero en
+    días festivos y fines de semana). Los extra son los trabajados de más en
+    cada día y los faltantes los que faltaron para cubrir el horario, sin
+    contar los días justificados ni los de hoy en adelante.
+
+    Args:
+        db (Session): Sesión de la base de datos
+        fecha_inicio (date): Fecha de inicio del período
+        fecha_fin (date): Fecha de fin del período
+        departamento_id (Optional[int]): ID del departamento (opcional)
+        trabajador_id (Optional[int]): ID del trabajador (opcional)
+        detalle (bool): Incluir los minutos de cada día
+
+    Returns:
+        Dict[str, Any]: Diccionario con los resultados del reporte
+    """
+    filtros = filtros_alcance(departamento_id, trabajador_id)
+    trabajadores = cargar_trabajadores(db, filtros)
+    ids_alcance = db.query(Trabajador.id).filter(*filtros).scalar_subquery()
+    indice = {trabajador.id: i for i, trabajador in enumerate(trabajadores)}
+
+    numero_dias = (fecha_fin - fecha_inicio).days + 1
+    fechas = [fecha_inicio + timedelta(days=j) for j in range(numero_dias)]
+    dias_semana = np.array([fecha.weekday() for fecha in fechas], dtype=np.int8)
+
+    festivos = np.zeros(numero_dias, dtype=bool)
+    for (fecha_festivo,) in db.query(DiaFestivo.fecha).filter(
+        DiaFestivo.fecha >= datetime.combine(fecha_inicio, time.min),
+        DiaFestivo.fecha <= datetime.combine(fecha_fin, time.max)
+    ):
+        festivos[(fecha_festivo.date() - fecha_inicio).days] = True
+
+    # Minutos programados: horario vigente de cada trabajador en cada día
+    resolutor = ResolutorHorarios(db, list(indice))
+    tabla = _tabla_programados(resolutor)
+    horarios = resolutor.matriz(list(indice), fecha_inicio, numero_dias)
+    horarios[horarios >= len(tabla)] = 0
+    programados = tabla[horarios, dias_semana[np.newaxis, :]]
+    programados[:, festivos] = 0
+
+    trabajados = _minutos_trabajados(db, fecha_inicio, numero_dias, ids_alcance, indice)
+    justificados = _dias_justificados(db, fecha_inicio, numero_dias, ids_alcance, indice)
+
+    extra = np.maximum(trabajados - programados, 0)
+    faltantes = np.where(justificados, 0, np.maximum(programados - trabajados, 0))
+    # Hoy y los días siguientes todavía no tienen minutos faltantes
+    faltantes[:, max((date.today() - fecha_inicio).days, 0):] = 0
+
+    totales = {
+        "minutos_programados": programados.sum(axis=1).tolist(),
+        "minutos_trabajados": trabajados.sum(axis=1).tolist(),
+        "minutos_extra": extra.sum(axis=1).tolist(),
+        "minutos_faltantes": faltantes.sum(axis=1).tolist(),
+        "dias_trabajados": (trabajados > 0).sum(axis=1).tolist()
+    }
+
+    resultados = []
+    for i, trabajador in enumerate(trabajadores):
+        resultado = {
+            "id": trabajador.id,
+            "nombre": f"{trabajador.nombre} {trabajador.apellidoPaterno} {trabajador.apellidoMaterno}",
+            "rfc": trabajador.rfc,
+            "departamento": DatosReporte.nombre_departamento(trabajador),
+            "totales": {campo: valores[i] for campo, valores in totales.items()}
+        }
+        if detalle:
+            resultado["dias"] = [
+                {
+                    "fecha": fechas[j],
+                    "minutos_programados": int(programados[i, j]),
+                    "minutos_trabajados": int(trabajados[i, j]),
+                    "minutos_extra": int(extra[i, j]),
+                    "minutos_faltantes": int(faltantes[i, j]),
+                    "justificado": bool(justificados[i, j])
+                }
+                for j in np.flatnonzero(programados[i] | trabajados[i]).tolist()
+            ]
+        resultados.append(resultado)
+
+    return {
+        "periodo": {
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin
+        },
+        "departamento": departamento_id,
+        "trabajador": trabajador_id,
+        "totales": {campo: int(sum(valores)) for campo, valores in totales.items()},
+        "trabajadores": resultados
+    }
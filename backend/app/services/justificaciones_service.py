@@ -0,0 +1,174 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from datetime import datetime, date, time, timedelta
+from typing import List, Dict, Any
+from app.config import settings
+from app.models.models import Justificacion, RegistroAsistencia, DiaFestivo, AgregadoMensual
+from app.services.cache_reportes import invalidar_fechas
+from app.services.derivados_service import actualizar_derivados_rango
+from app.services.datos_reporte import (
+    IntervalosJustificacion,
+    filtros_justificaciones,
+    opciones_justificacion,
+    rango_justificacion
+)
+
+
+def dias_habiles(db: Session, fecha_inicio: date, fecha_fin: date) -> List[date]:
+    """Días de lunes a viernes del rango que no son festivos"""
+    festivos = {
+        fecha.date() for (fecha,) in db.query(DiaFestivo.fecha).filter(
+            DiaFestivo.fecha >= datetime.combine(fecha_inicio, time.min),
+            DiaFestivo.fecha <= datetime.combine(fecha_fin, time.max)
+        )
+    }
+    return [
+        dia for dia in (fecha_inicio + timedelta(days=n) for n in range((fecha_fin - fecha_inicio).days + 1))
+        if dia.weekday() < 5 and dia not in festivos
+    ]
+
+
+def crear_justificaciones_periodo(
+    db: Session,
+    trabajador_ids: List[int],
+    fecha_inicio: date,
+    fecha_fin: date,
+    id_descripcion: int
+) -> List[Dict[str, Any]]:
+    """
+    Justifica un rango de días para varios trabajadores en una sola transacción.
+
+    Con JUSTIFICACIONES_POR_PERIODO_ACTIVO se crea una justificación por
+    trabajador que cubre todo el rango (fecha a fecha_fin); si no, una por
+    trabajador y día hábil. La asistencia del rango se actualiza con
+    operaciones por conjunto: los registros que no son SALIDA pasan a
+    JUSTIFICADO y los días hábiles (lunes a viernes, sin festivos) sin
+    registros reciben uno JUSTIFICADO, igual que al justificar día por día.
+
+    Args:
+        db (Session): Sesión de la base de datos
+        trabajador_ids (List[int]): IDs de los trabajadores (ya validados)
+        fecha_inicio (date): Primer día justificado
+        fecha_fin (date): Último día justificado
+        id_descripcion (int): ID de la regla de justificación (ya validada)
+
+    Returns:
+        List[Dict[str, Any]]: Justificaciones creadas
+    """
+    inicio_dt = datetime.combine(fecha_inicio, time.min)
+    fin_dt = datetime.combine(fecha_fin, time.max)
+    dias = dias_habiles(db, fecha_inicio, fecha_fin)
+
+    if settings.JUSTIFICACIONES_POR_PERIODO_ACTIVO:
+        justificaciones = [
+            Justificacion(
+                id_trabajador=id_trabajador,
+                fecha=inicio_dt,
+                fecha_fin=datetime.combine(fecha_fin, time.min),
+                id_descripcion=id_descripcion
+            )
+            for id_trabajador in trabajador_ids
+        ]
+    else:
+        justificaciones = [
+            Justificacion(id_trabajador=id_trabajador, fecha=datetime.combine(dia, time.min), id_descripcion=id_descripcion)
+            for id_trabajador in trabajador_ids
+            for dia in dias
+        ]
+    db.add_all(justificaciones)
+
+    filtros_registros = [
+        RegistroAsistencia.id_trabajador.in_(trabajador_ids),
+        RegistroAsistencia.fecha >= inicio_dt,
+        RegistroAsistencia.fecha <= fin_dt
+    ]
+
+    dias_con_registro = {
+        (id_trabajador, fecha.date())
+        for id_trabajador, fecha in db.query(
+            RegistroAsistencia.id_trabajador, RegistroAsistencia.fecha
+        ).filter(*filtros_registros)
+    }
+
+    # Solo los días hábiles: las checadas de fines de semana y festivos se conservan
+    actualizados = 0
+    if dias:
+        actualizados = db.query(RegistroAsistencia).filter(
+            *filtros_registros,
+            func.date(RegistroAsistencia.fecha).in_(dias),
+            RegistroAsistencia.estatus != "SALIDA"
+        ).update({RegistroAsistencia.estatus: "JUSTIFICADO"}, synchronize_session=False)
+
+    nuevos = [
+        {"id_trabajador": id_trabajador, "fecha": datetime.combine(dia, time.min), "estatus": "JUSTIFICADO"}
+        for id_trabajador in trabajador_ids
+        for dia in dias
+        if (id_trabajador, dia) not in dias_con_registro
+    ]
+    if nuevos:
+        db.bulk_insert_mappings(RegistroAsistencia, nuevos)
+
+    actualizar_derivados_rango(db, trabajador_ids, fecha_inicio, fecha_fin)
+
+    # Los cambios por conjunto no pasan por los eventos de la sesión (y sin días
+    # hábiles no hay justificaciones que enviar): los agregados y la caché del
+    # rango se invalidan aquí
+    if settings.AGREGADOS_MENSUALES_ACTIVO:
+        db.query(AgregadoMensual).filter(
+            AgregadoMensual.id_trabajador.in_(trabajador_ids),
+            AgregadoMensual.anio * 100 + AgregadoMensual.mes >= fecha_inicio.year * 100 + fecha_inicio.month,
+            AgregadoMensual.anio * 100 + AgregadoMensual.mes <= fecha_fin.year * 100 + fecha_fin.month
+        ).delete(synchronize_session=False)
+    db.flush()
+
+    # Armar la respuesta antes del commit, que expira los objetos
+    creadas = [
+        {
+            "id": justificacion.id,
+            "id_trabajador": justificacion.id_trabajador,
+            "fecha": justificacion.fecha,
+            "fecha_fin": justificacion.fecha_fin if settings.JUSTIFICACIONES_POR_PERIODO_ACTIVO else None,
+            "id_descripcion": justificacion.id_descripcion
+        }
+        for justificacion in justificaciones
+    ]
+    db.commit()
+    invalidar_fechas(fecha_inicio, fecha_fin)
+
+    print(f"📝 Justificaciones {fecha_inicio} a {fecha_fin}: {len(creadas)} creadas, "
+          f"{actualizados} registros actualizados, {len(nuevos)} registros nuevos")
+    return creadas
+
+
+def revertir_justificacion_periodo(db: Session, justificacion: Justificacion) -> int:
+    """
+    Pasa a FALTA los registros JUSTIFICADO de los días que cubría una
+    justificación por período, antes de borrarla: solo los días hábiles que
+    no cubre otra justificación del trabajador.
+
+    Returns:
+        int: Número de registros actualizados
+    """
+    inicio, fin = rango_justificacion(justificacion)
+    inicio_dt = datetime.combine(inicio, time.min)
+    fin_dt = datetime.combine(fin, time.max)
+
+    otras = IntervalosJustificacion()
+    for otra in db.query(Justificacion).options(*opciones_justificacion()).filter(
+        Justificacion.id_trabajador == justificacion.id_trabajador,
+        Justificacion.id != justificacion.id,
+        *filtros_justificaciones(inicio_dt, fin_dt)
+    ).order_by(Justificacion.fecha, Justificacion.id):
+        otras.agregar(otra, None)
+
+    dias = [dia for dia in dias_habiles(db, inicio, fin) if otras.buscar(dia)[0] is None]
+    if not dias:
+        return 0
+
+    return db.query(RegistroAsistencia).filter(
+        RegistroAsistencia.id_trabajador == justificacion.id_trabajador,
+        RegistroAsistencia.fecha >= inicio_dt,
+        RegistroAsistencia.fecha <= fin_dt,
+        func.date(RegistroAsistencia.fecha).in_(dias),
+        RegistroAsistencia.estatus == "JUSTIFICADO"
+    ).update({RegistroAsistencia.estatus: "FALTA"}, synchronize_session=False)
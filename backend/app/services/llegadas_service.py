@@ -0,0 +1,206 @@
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from datetime import datetime, date, time, timedelta
+from typing import Optional, Dict, Any, List
+from app.models.models import Trabajador, RegistroAsistencia, DiaFestivo, Departamento, CentroTrabajo
+from app.services.datos_reporte import filtros_alcance
+from app.services.horarios_service import ResolutorHorarios
+
+MINUTOS_DIA = 24 * 60
+DIAS_SEMANA = ("lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo")
+PERCENTILES = (10, 25, 50, 75, 90)
+AGRUPACIONES = ("departamento", "centro_trabajo")
+
+# Distribución de las horas de llegada por departamento (o centro de trabajo)
+# y día de la semana. La base de datos agrupa los registros en la primera
+# entrada de cada trabajador por día; sobre esas llegadas se cuentan minutos
+# del día con bincount (una fila de 1440 contadores por grupo), y de esos
+# conteos salen el histograma por cubetas y los percentiles, sin ordenar ni
+# recorrer las llegadas una por una.
+
+
+def _hora(minuto: int) -> str:
+    return f"{minuto // 60:02d}:{minuto % 60:02d}"
+
+
+def _percentiles(conteos: np.ndarray) -> np.ndarray:
+    """Percentiles (rango más cercano) de cada fila de conteos; índices de columna"""
+    acumulado = conteos.cumsum(axis=1)
+    total = acumulado[:, -1]
+    resultado = np.zeros((len(conteos), len(PERCENTILES)), dtype=np.int64)
+    for k, percentil in enumerate(PERCENTILES):
+        objetivo = np.maximum(np.ceil(total * percentil / 100), 1)
+        resultado[:, k] = (acumulado < objetivo[:, np.newaxis]).sum(axis=1)
+    return resultado
+
+
+def _primeras_entradas(db: Session, fecha_inicio: date, fecha_fin: date, ids_alcance):
+    """Hora de la primera entrada de cada trabajador en cada día (agrupada en SQL)"""
+    return db.query(
+        RegistroAsistencia.id_trabajador, func.min(RegistroAsistencia.fecha)
+    ).filter(
+        RegistroAsistencia.id_trabajador.in_(ids_alcance),
+        RegistroAsistencia.fecha >= datetime.combine(fecha_inicio, time.min),
+        RegistroAsistencia.fecha <= datetime.combine(fecha_fin, time.max),
+        # Los JUSTIFICADO son registros sintéticos a las 00:00, no llegadas
+        RegistroAsistencia.estatus.notin_(("SALIDA", "JUSTIFICADO"))
+    ).group_by(
+        RegistroAsistencia.id_trabajador, func.date(RegistroAsistencia.fecha)
+    ).all()
+
+
+def generar_distribucion_llegadas(
+    db: Session,
+    fecha_inicio: date,
+    fecha_fin: date,
+    departamento_id: Optional[int] = None,
+    centro_trabajo_id: Optional[int] = None,
+    agrupar_por: str = "departamento",
+    minutos_cubeta: int = 15
+) -> Dict[str, Any]:
+    """
+    Genera la distribución de las horas de llegada por grupo y día de la semana.
+
+    Para cada grupo (departamento o centro de trabajo) y día de la semana, y
+    para el grupo en toda la semana, devuelve el histograma de llegadas por
+    cubetas de minutos_cubeta minutos, los percentiles de la hora de llegada y
+    el retraso respecto a la entrada del horario vigente ese día (solo días
+    laborables con entrada en el horario y que no son festivos).
+
+    Args:
+        db (Session): Sesión de la base de datos
+        fecha_inicio (date): Fecha de inicio del período
+        fecha_fin (date): Fecha de fin del período
+        departamento_id (Optional[int]): ID del departamento (opcional)
+        centro_trabajo_id (Optional[int]): ID del centro de trabajo (opcional)
+        agrupar_por (str): "departamento" o "centro_trabajo"
+        minutos_cubeta (int): Ancho de las cubetas del histograma (divisor de 1440)
+
+    Returns:
+        Dict[str, Any]: Diccionario con los resultados del reporte
+    """
+    filtros = filtros_alcance(departamento_id)
+    if centro_trabajo_id:
+        filtros.append(Trabajador.id_centroTrabajo == centro_trabajo_id)
+
+    columna_grupo = Trabajador.departamento if agrupar_por == "departamento" else Trabajador.id_centroTrabajo
+    trabajadores = db.query(Trabajador.id, columna_grupo).filter(*filtros).order_by(Trabajador.id).all()
+    indice = {id_trabajador: i for i, (id_trabajador, _) in enumerate(trabajadores)}
+
+    # Grupos presentes en el alcance (None = sin departamento / centro)
+    claves_grupo = sorted({grupo for _, grupo in trabajadores}, key=lambda g: (g is None, g or 0))
+    posicion_grupo = {grupo: g for g, grupo in enumerate(claves_grupo)}
+    grupo_trabajador = np.array([posicion_grupo[grupo] for _, grupo in trabajadores], dtype=np.int64)
+
+    if agrupar_por == "departamento":
+        nombres = dict(db.query(Departamento.id, Departamento.descripcion))
+        sin_grupo = "Sin departamento"
+    else:
+        nombres = dict(db.query(CentroTrabajo.id, CentroTrabajo.plantel))
+        sin_grupo = "Sin centro de trabajo"
+
+    ids_alcance = db.query(Trabajador.id).filter(*filtros).scalar_subquery()
+    llegadas = _primeras_entradas(db, fecha_inicio, fecha_fin, ids_alcance)
+
+    numero_grupos = len(claves_grupo)
+    # Contadores por (grupo, día de la semana) y minuto; la fila 7 de cada grupo es toda la semana
+    conteos = np.zeros((numero_grupos * 8, MINUTOS_DIA), dtype=np.int64)
+    retrasos = np.zeros((numero_grupos * 8, 2 * MINUTOS_DIA - 1), dtype=np.int64)
+
+    if llegadas:
+        trabajador, fecha = zip(*llegadas)
+        fila = np.array([indice.get(t, -1) for t in trabajador], dtype=np.int64)
+        dia = np.array([(f.date() - fecha_inicio).days for f in fecha], dtype=np.int64)
+        minuto = np.array([f.hour * 60 + f.minute for f in fecha], dtype=np.int64)
+        validas = fila >= 0
+        fila, dia, minuto = fila[validas], dia[validas], minuto[validas]
+
+        numero_dias = (fecha_fin - fecha_inicio).days + 1
+        dias_semana = np.array([(fecha_inicio + timedelta(days=j)).weekday() for j in range(numero_dias)], dtype=np.int64)
+        dia_semana = dias_semana[dia]
+        clave = grupo_trabajador[fila] * 8 + dia_semana
+
+        conteos += np.bincount(
+            clave * MINUTOS_DIA + minuto, minlength=numero_grupos * 8 * MINUTOS_DIA
+        ).reshape(conteos.shape)
+
+        # Retraso en minutos respecto a la entrada del horario vigente ese día
+        resolutor = ResolutorHorarios(db, list(indice))
+        tabla_entradas = resolutor.tabla_entradas()
+        horarios = resolutor.matriz(list(indice), fecha_inicio, numero_dias)
+        horarios[horarios >= len(tabla_entradas)] = 0
+        entrada = tabla_entradas[horarios[fila, dia], dia_semana]
+
+        festivos = np.zeros(numero_dias, dtype=bool)
+        for (fecha_festivo,) in db.query(DiaFestivo.fecha).filter(
+            DiaFestivo.fecha >= datetime.combine(fecha_inicio, time.min),
+            DiaFestivo.fecha <= datetime.combine(fecha_fin, time.max)
+        ):
+            festivos[(fecha_festivo.date() - fecha_inicio).days] = True
+
+        con_horario = (entrada >= 0) & ~festivos[dia]
+        retraso = minuto[con_horario] - entrada[con_horario] // 60
+        retrasos += np.bincount(
+            clave[con_horario] * retrasos.shape[1] + retraso + MINUTOS_DIA - 1,
+            minlength=retrasos.size
+        ).reshape(retrasos.shape)
+
+        # Toda la semana de cada grupo
+        por_grupo = conteos.reshape(numero_grupos, 8, -1)
+        por_grupo[:, 7] = por_grupo[:, :7].sum(axis=1)
+        por_grupo = retrasos.reshape(numero_grupos, 8, -1)
+        por_grupo[:, 7] = por_grupo[:, :7].sum(axis=1)
+
+    totales = conteos.sum(axis=1)
+    percentiles_llegada = _percentiles(conteos)
+    totales_retraso = retrasos.sum(axis=1)
+    percentiles_retraso = _percentiles(retrasos) - (MINUTOS_DIA - 1)
+    desplazamientos = np.arange(retrasos.shape[1]) - (MINUTOS_DIA - 1)
+    suma_retrasos = retrasos @ desplazamientos
+    tarde = retrasos[:, MINUTOS_DIA:].sum(axis=1)
+    cubetas = conteos.reshape(len(conteos), MINUTOS_DIA // minutos_cubeta, minutos_cubeta).sum(axis=2)
+
+    grupos: List[Dict[str, Any]] = []
+    for g, grupo in enumerate(claves_grupo):
+        for d in range(8):
+            k = g * 8 + d
+            if d < 7 and totales[k] == 0:
+                continue
+            resultado = {
+                agrupar_por: {"id": grupo, "nombre": nombres.get(grupo, sin_grupo) if grupo is not None else sin_grupo},
+                "dia_semana": DIAS_SEMANA[d] if d < 7 else None,
+                "llegadas": int(totales[k]),
+                "percentiles": {
+                    f"p{percentil}": _hora(int(percentiles_llegada[k, n])) if totales[k] else None
+                    for n, percentil in enumerate(PERCENTILES)
+                },
+                "histograma": [
+                    {"desde": _hora(c * minutos_cubeta), "llegadas": int(cubetas[k, c])}
+                    for c in np.flatnonzero(cubetas[k]).tolist()
+                ],
+                "retraso": {
+                    "llegadas_con_horario": int(totales_retraso[k]),
+                    "llegadas_tarde": int(tarde[k]),
+                    "porcentaje_tarde": round(tarde[k] * 100 / totales_retraso[k], 2) if totales_retraso[k] else 0,
+                    "promedio_minutos": round(suma_retrasos[k] / totales_retraso[k], 2) if totales_retraso[k] else None,
+                    "percentiles_minutos": {
+                        f"p{percentil}": int(percentiles_retraso[k, n]) if totales_retraso[k] else None
+                        for n, percentil in enumerate(PERCENTILES)
+                    }
+                }
+            }
+            grupos.append(resultado)
+
+    return {
+        "periodo": {
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin
+        },
+        "departamento": departamento_id,
+        "centro_trabajo": centro_trabajo_id,
+        "agrupar_por": agrupar_por,
+        "minutos_cubeta": minutos_cubeta,
+        "llegadas": int(totales[7::8].sum()),
+        "grupos": grupos
+    }
@@ -0,0 +1,357 @@
+import numpy as np
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from datetime import datetime, date, time, timedelta
+from typing import Optional, Dict, List, Tuple, Any
+from app.config import settings
+from app.models.models import Trabajador, DiaFestivo, MapaAsistencia
+from app.services.datos_reporte import DatosReporte, cargar_trabajadores, filtros_alcance, filas_resumen_rango
+from app.services.horarios_service import ResolutorHorarios
+
+# Índice de ausencias: por trabajador y año, un mapa de bits de los días con
+# entrada (presentes) y de los días justificados. Se mantiene con cada cambio
+# de registros o justificaciones (actualizar_derivados_rango).
+#
+# Los días laborables no se guardan: dependen del horario vigente, de los días
+# festivos y de la fecha de hoy, y se calculan al consultar. Así una ausencia
+# es laborable & ~presente & ~justificado y los conteos son sumas de bits, sin
+# resolver los registros día por día.
+
+DIAS_ANIO = 366
+BYTES_ANIO = (DIAS_ANIO + 7) // 8
+
+# Días que se reconstruyen por bloque (cada bloque se confirma por separado)
+DIAS_POR_BLOQUE = 31
+
+
+def _dia_del_anio(fecha: date) -> int:
+    return (fecha - date(fecha.year, 1, 1)).days
+
+
+def _desempacar(datos: List[bytes]) -> np.ndarray:
+    """Matriz booleana filas × 366 a partir de los mapas de bits guardados"""
+    if not datos:
+        return np.zeros((0, DIAS_ANIO), dtype=bool)
+    octetos = np.frombuffer(b"".join(datos), dtype=np.uint8).reshape(len(datos), BYTES_ANIO)
+    return np.unpackbits(octetos, axis=1, bitorder="little")[:, :DIAS_ANIO].astype(bool)
+
+
+def _empacar(bits: np.ndarray) -> bytes:
+    return np.packbits(bits, bitorder="little").tobytes()
+
+
+def _clasificar(filas: list, indice: Dict[int, int], fecha_inicio: date, numero_dias: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Matrices trabajadores × días de días presentes y justificados a partir de
+    filas de resumen. Presente es un día con entrada que no es falta (una
+    entrada fuera de la última tolerancia cuenta como falta, como en los
+    reportes); justificado, un día cubierto por una justificación.
+    """
+    presentes = np.zeros((len(indice), numero_dias), dtype=bool)
+    justificados = np.zeros((len(indice), numero_dias), dtype=bool)
+    for fila in filas:
+        i = indice.get(fila["id_trabajador"])
+        if i is None:
+            continue
+        j = (fila["fecha"] - fecha_inicio).days
+        estatus = fila["estatus"]
+        if fila["id_justificacion"] is not None or estatus == "JUSTIFICADO":
+            justificados[i, j] = True
+        if fila["hora_entrada"] is not None and estatus != "JUSTIFICADO" and "FALTA" not in estatus:
+            presentes[i, j] = True
+    return presentes, justificados
+
+
+def actualizar_mapa_rango(db: Session, trabajador_ids: List[int], fecha_inicio: date, fecha_fin: date, filas: list) -> None:
+    """
+    Reescribe los bits de varios trabajadores en un rango de días a partir de
+    los días ya resueltos (filas_resumen_rango). Se llama desde
+    actualizar_derivados_rango, antes del commit.
+    """
+    if not settings.MAPA_ASISTENCIA_ACTIVO or not trabajador_ids:
+        return
+
+    trabajador_ids = sorted(trabajador_ids)
+
+    for anio in range(fecha_inicio.year, fecha_fin.year + 1):
+        desde = max(fecha_inicio, date(anio, 1, 1))
+        hasta = min(fecha_fin, date(anio, 12, 31))
+        indice = {id_trabajador: i for i, id_trabajador in enumerate(trabajador_ids)}
+
+        mapas = {
+            mapa.id_trabajador: mapa
+            for mapa in db.query(MapaAsistencia).filter(
+                MapaAsistencia.id_trabajador.in_(trabajador_ids),
+                MapaAsistencia.anio == anio
+            )
+        }
+        vacio = bytes(BYTES_ANIO)
+        presentes = _desempacar([mapas[t].presentes if t in mapas else vacio for t in trabajador_ids])
+        justificados = _desempacar([mapas[t].justificados if t in mapas else vacio for t in trabajador_ids])
+
+        a, b = _dia_del_anio(desde), _dia_del_anio(hasta) + 1
+        nuevos_presentes, nuevos_justificados = _clasificar(
+            [fila for fila in filas if desde <= fila["fecha"] <= hasta], indice, desde, b - a
+        )
+        presentes[:, a:b] = nuevos_presentes
+        justificados[:, a:b] = nuevos_justificados
+
+        for i, id_trabajador in enumerate(trabajador_ids):
+            mapa = mapas.get(id_trabajador)
+            if mapa is None:
+                if not presentes[i].any() and not justificados[i].any():
+                    continue
+                mapa = MapaAsistencia(id_trabajador=id_trabajador, anio=anio)
+                db.add(mapa)
+            mapa.presentes = _empacar(presentes[i])
+            mapa.justificados = _empacar(justificados[i])
+
+
+def reconstruir_mapa(db: Session, anio: int, trabajador_id: Optional[int] = None) -> int:
+    """
+    Reconstruye los mapas de un año desde los registros y las justificaciones,
+    por bloques de días (cada bloque se confirma por separado).
+
+    Args:
+        db (Session): Sesión de la base de datos
+        anio (int): Año a reconstruir
+        trabajador_id (Optional[int]): ID del trabajador (opcional)
+
+    Returns:
+        int: Número de trabajadores con mapa en el año
+    """
+    query_ids = db.query(Trabajador.id)
+    if trabajador_id:
+        query_ids = query_ids.filter(Trabajador.id == trabajador_id)
+    trabajador_ids = [id_trabajador for (id_trabajador,) in query_ids]
+
+    bloque_inicio = date(anio, 1, 1)
+    while bloque_inicio.year == anio:
+        bloque_fin = min(bloque_inicio + timedelta(days=DIAS_POR_BLOQUE - 1), date(anio, 12, 31))
+        filas = filas_resumen_rango(db, bloque_inicio, bloque_fin, trabajador_ids)
+        actualizar_mapa_rango(db, trabajador_ids, bloque_inicio, bloque_fin, filas)
+        db.commit()
+        print(f"🗺️ Mapa de asistencia {bloque_inicio} a {bloque_fin} reconstruido")
+        bloque_inicio = bloque_fin + timedelta(days=1)
+
+    query_mapas = db.query(func.count()).select_from(MapaAsistencia).filter(MapaAsistencia.anio == anio)
+    if trabajador_id:
+        query_mapas = query_mapas.filter(MapaAsistencia.id_trabajador == trabajador_id)
+    return query_mapas.scalar()
+
+
+def _estados(db: Session, trabajador_ids: List[int], fecha_inicio: date, fecha_fin: date) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Matrices trabajadores × días de días presentes y justificados: desde
+    mapa_asistencia si está activo, o resolviendo los registros si no
+    """
+    numero_dias = (fecha_fin - fecha_inicio).days + 1
+    indice = {id_trabajador: i for i, id_trabajador in enumerate(trabajador_ids)}
+
+    if not settings.MAPA_ASISTENCIA_ACTIVO:
+        return _clasificar(filas_resumen_rango(db, fecha_inicio, fecha_fin, trabajador_ids), indice, fecha_inicio, numero_dias)
+
+    presentes = np.zeros((len(indice), numero_dias), dtype=bool)
+    justificados = np.zeros((len(indice), numero_dias), dtype=bool)
+    for anio in range(fecha_inicio.year, fecha_fin.year + 1):
+        desde = max(fecha_inicio, date(anio, 1, 1))
+        hasta = min(fecha_fin, date(anio, 12, 31))
+        mapas = db.query(
+            MapaAsistencia.id_trabajador, MapaAsistencia.presentes, MapaAsistencia.justificados
+        ).filter(
+            MapaAsistencia.id_trabajador.in_(trabajador_ids),
+            MapaAsistencia.anio == anio
+        ).all()
+        if not mapas:
+            continue
+        filas = np.array([indice[id_trabajador] for id_trabajador, _, _ in mapas], dtype=np.int64)
+        a, b = _dia_del_anio(desde), _dia_del_anio(hasta) + 1
+        j = (desde - fecha_inicio).days
+        presentes[filas, j:j + b - a] = _desempacar([p for _, p, _ in mapas])[:, a:b]
+        justificados[filas, j:j + b - a] = _desempacar([x for _, _, x in mapas])[:, a:b]
+    return presentes, justificados
+
+
+def _laborables(db: Session, trabajador_ids: List[int], fecha_inicio: date, fecha_fin: date) -> np.ndarray:
+    """
+    Días laborables ya transcurridos de cada trabajador: desde su ingreso, con
+    entrada en su horario vigente y no festivos
+    """
+    numero_dias = (fecha_fin - fecha_inicio).days + 1
+    fechas = [fecha_inicio + timedelta(days=j) for j in range(numero_dias)]
+
+    resolutor = ResolutorHorarios(db, trabajador_ids)
+    tabla_entradas = resolutor.tabla_entradas()
+    horarios = resolutor.matriz(trabajador_ids, fecha_inicio, numero_dias)
+    horarios[horarios >= len(tabla_entradas)] = 0
+    dias_semana = np.array([fecha.weekday() for fecha in fechas], dtype=np.int64)
+    laborables = tabla_entradas[horarios, dias_semana[np.newaxis, :]] >= 0
+
+    for (fecha_festivo,) in db.query(DiaFestivo.fecha).filter(
+        DiaFestivo.fecha >= datetime.combine(fecha_inicio, time.min),
+        DiaFestivo.fecha <= datetime.combine(fecha_fin, time.max)
+    ):
+        laborables[:, (fecha_festivo.date() - fecha_inicio).days] = False
+
+    # Antes del ingreso el resolutor aplica el primer horario: no son días laborables
+    indice = {id_trabajador: i for i, id_trabajador in enumerate(trabajador_ids)}
+    for id_trabajador, ingreso in db.query(Trabajador.id, Trabajador.fechaIngresoSep).filter(
+        Trabajador.id.in_(trabajador_ids),
+        Trabajador.fechaIngresoSep > datetime.combine(fecha_inicio, time.min)
+    ):
+        laborables[indice[id_trabajador], :(ingreso.date() - fecha_inicio).days] = False
+
+    # Un día de hoy o posterior todavía no es una ausencia
+    laborables[:, max((date.today() - fecha_inicio).days, 0):] = False
+    return laborables
+
+
+def ausencias_trabajadores(
+    db: Session,
+    trabajador_ids: List[int],
+    fecha_inicio: date,
+    fecha_fin: date,
+    filas: Optional[list] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Matrices trabajadores × días de días laborables ya transcurridos,
+    presentes, justificados y ausencias sin justificar (laborable & ~presente
+    & ~justificado). Si se pasan las filas de filas_resumen_rango del rango,
+    se clasifican esas en lugar de leer mapa_asistencia.
+    """
+    laborables = _laborables(db, trabajador_ids, fecha_inicio, fecha_fin)
+    if filas is None:
+        presentes, justificados = _estados(db, trabajador_ids, fecha_inicio, fecha_fin)
+    else:
+        indice = {id_trabajador: i for i, id_trabajador in enumerate(trabajador_ids)}
+        presentes, justificados = _clasificar(filas, indice, fecha_inicio, (fecha_fin - fecha_inicio).days + 1)
+    return laborables, presentes, justificados, laborables & ~presentes & ~justificados
+
+
+def _ausencias(db: Session, fecha_inicio: date, fecha_fin: date, departamento_id: Optional[int], trabajador_id: Optional[int]):
+    trabajadores = cargar_trabajadores(db, filtros_alcance(departamento_id, trabajador_id))
+    trabajador_ids = [trabajador.id for trabajador in trabajadores]
+    return (trabajadores, *ausencias_trabajadores(db, trabajador_ids, fecha_inicio, fecha_fin))
+
+
+def _datos_trabajador(trabajador: Trabajador) -> Dict[str, Any]:
+    return {
+        "id": trabajador.id,
+        "nombre": f"{trabajador.nombre} {trabajador.apellidoPaterno} {trabajador.apellidoMaterno}",
+        "rfc": trabajador.rfc,
+        "departamento": DatosReporte.nombre_departamento(trabajador)
+    }
+
+
+def consultar_ausencias(
+    db: Session,
+    fecha_inicio: date,
+    fecha_fin: date,
+    departamento_id: Optional[int] = None,
+    trabajador_id: Optional[int] = None,
+    solo_con_ausencias: bool = True
+) -> Dict[str, Any]:
+    """
+    Ausencias sin justificar por trabajador en un rango de días (un solo día
+    responde quién faltó ese día).
+
+    Args:
+        db (Session): Sesión de la base de datos
+        fecha_inicio (date): Primer día del rango
+        fecha_fin (date): Último día del rango
+        departamento_id (Optional[int]): ID del departamento (opcional)
+        trabajador_id (Optional[int]): ID del trabajador (opcional)
+        solo_con_ausencias (bool): Omitir a los trabajadores sin ausencias
+
+    Returns:
+        Dict[str, Any]: Conteos por trabajador y días de ausencia
+    """
+    trabajadores, laborables, presentes, justificados, ausentes = _ausencias(
+        db, fecha_inicio, fecha_fin, departamento_id, trabajador_id
+    )
+
+    conteos = {
+        "dias_laborables": laborables.sum(axis=1).tolist(),
+        "presentes": (laborables & presentes).sum(axis=1).tolist(),
+        "justificados": (laborables & justificados).sum(axis=1).tolist(),
+        "ausencias": ausentes.sum(axis=1).tolist()
+    }
+
+    resultados = []
+    for i, trabajador in enumerate(trabajadores):
+        if solo_con_ausencias and not conteos["ausencias"][i]:
+            continue
+        resultado = _datos_trabajador(trabajador)
+        resultado.update({campo: valores[i] for campo, valores in conteos.items()})
+        resultado["fechas_ausencia"] = [
+            fecha_inicio + timedelta(days=j) for j in np.flatnonzero(ausentes[i]).tolist()
+        ]
+        resultados.append(resultado)
+
+    return {
+        "periodo": {
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin
+        },
+        "departamento": departamento_id,
+        "total_ausencias": int(ausentes.sum()),
+        "trabajadores": resultados
+    }
+
+
+def consultar_ausencias_consecutivas(
+    db: Session,
+    fecha_inicio: date,
+    fecha_fin: date,
+    minimo: int = 3,
+    departamento_id: Optional[int] = None,
+    trabajador_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Trabajadores con minimo o más ausencias sin justificar consecutivas. Se
+    cuentan días laborables consecutivos: un fin de semana o un día festivo
+    entre dos ausencias no corta la racha.
+
+    Args:
+        db (Session): Sesión de la base de datos
+        fecha_inicio (date): Primer día del rango
+        fecha_fin (date): Último día del rango
+        minimo (int): Ausencias consecutivas mínimas
+        departamento_id (Optional[int]): ID del departamento (opcional)
+        trabajador_id (Optional[int]): ID del trabajador (opcional)
+
+    Returns:
+        Dict[str, Any]: Rachas (primer día, último día, ausencias) por trabajador
+    """
+    trabajadores, laborables, _, _, ausentes = _ausencias(db, fecha_inicio, fecha_fin, departamento_id, trabajador_id)
+
+    resultados = []
+    for i in np.flatnonzero(ausentes.sum(axis=1) >= minimo).tolist():
+        # Ausencias en la secuencia de días laborables del trabajador
+        dias = np.flatnonzero(laborables[i])
+        secuencia = np.concatenate(([False], ausentes[i, dias], [False])).astype(np.int8)
+        cambios = np.diff(secuencia)
+        inicios, fines = np.flatnonzero(cambios == 1), np.flatnonzero(cambios == -1)
+        largas = (fines - inicios) >= minimo
+        rachas = [
+            {
+                "desde": fecha_inicio + timedelta(days=int(dias[inicio])),
+                "hasta": fecha_inicio + timedelta(days=int(dias[fin - 1])),
+                "ausencias": int(fin - inicio)
+            }
+            for inicio, fin in zip(inicios[largas], fines[largas])
+        ]
+        if rachas:
+            resultado = _datos_trabajador(trabajadores[i])
+            resultado["rachas"] = rachas
+            resultados.append(resultado)
+
+    return {
+        "periodo": {
+            "fecha_inicio": fecha_inicio,
+            "fecha_fin": fecha_fin
+        },
+        "departamento": departamento_id,
+        "minimo": minimo,
+        "trabajadores": resultados
+    }
@@ -0,0 +1,167 @@
+import numpy as np
+from datetime import date, timedelta
+from functools import cached_property
+from typing import Dict, List, Tuple
+from app.services.datos_reporte import DatosReporte, DiaResuelto, DIA_SIN_REGISTROS
+
+# Matriz trabajadores × días del período con el estatus de cada día codificado
+# en int8, más las máscaras de fines de semana y días festivos y la capa de
+# justificaciones. Las estadísticas de los reportes se calculan con
+# reducciones de NumPy sobre la matriz en lugar de recorrer día por día.
+#
+# Los códigos de estatus apuntan a un catálogo que se arma con los estatus que
+# aparecen en el período (el código 0 es NO_REGISTRADO), así que se conserva
+# exactamente el texto de cada registro.
+
+
+class MatrizAsistencia:
+    """
+    Estatus diarios de un período en forma de matriz.
+
+    Atributos:
+        fechas: días del período (columnas)
+        fin_semana / festivo: máscaras por día
+        estatus: int8 (trabajadores × días), código en catalogo
+        con_entrada: el día tiene registro de entrada
+        justificado: el día tiene justificación
+        con_regla: la justificación tiene la descripción de su regla
+        minuto_registro: int16, minuto del día de la hora de registro (-1 sin registro)
+    """
+
+    def __init__(self, datos: DatosReporte):
+        self.datos = datos
+        self.trabajadores = datos.trabajadores
+        self.indice_trabajador = {trabajador.id: i for i, trabajador in enumerate(self.trabajadores)}
+
+        numero_dias = (datos.fecha_fin - datos.fecha_inicio).days + 1
+        self.fechas = [datos.fecha_inicio + timedelta(days=j) for j in range(max(numero_dias, 0))]
+        self.fin_semana = np.array([fecha.weekday() >= 5 for fecha in self.fechas], dtype=bool)
+        self.festivo = np.array([datos.es_festivo(fecha) for fecha in self.fechas], dtype=bool)
+
+        forma = (len(self.trabajadores), len(self.fechas))
+        self.estatus = np.zeros(forma, dtype=np.int8)
+        self.con_entrada = np.zeros(forma, dtype=bool)
+        self.justificado = np.zeros(forma, dtype=bool)
+        self.con_regla = np.zeros(forma, dtype=bool)
+        # Minuto del día del registro (entrada, o justificación sin entrada); -1 sin registro
+        self.minuto_registro = np.full(forma, -1, dtype=np.int16)
+
+        # Días con datos (los demás son DIA_SIN_REGISTROS)
+        self.dias: Dict[Tuple[int, int], DiaResuelto] = {}
+
+        self.catalogo: List[str] = ["NO_REGISTRADO"]
+        codigos = {"NO_REGISTRADO": 0}
+
+        for trabajador_id, fecha, dia in datos.dias_con_datos():
+            i = self.indice_trabajador.get(trabajador_id)
+            j = (fecha - datos.fecha_inicio).days
+            if i is None or not 0 <= j < forma[1]:
+                continue
+
+            codigo = codigos.get(dia.estatus)
+            if codigo is None:
+                codigo = codigos[dia.estatus] = len(self.catalogo)
+                self.catalogo.append(dia.estatus)
+
+            self.estatus[i, j] = codigo
+            self.con_entrada[i, j] = dia.hora_entrada is not None
+            self.justificado[i, j] = dia.id_justificacion is not None
+            self.con_regla[i, j] = dia.id_justificacion is not None and dia.justificacion is not None
+            self.dias[i, j] = dia
+
+            hora_registro = dia.hora_entrada or (dia.fecha_justificacion if dia.id_justificacion else None)
+            if hora_registro is not None:
+                self.minuto_registro[i, j] = hora_registro.hour * 60 + hora_registro.minute
+
+    def dia(self, i: int, j: int) -> DiaResuelto:
+        return self.dias.get((i, j), DIA_SIN_REGISTROS)
+
+    def _es(self, condicion, laborables: np.ndarray) -> np.ndarray:
+        """Matriz booleana de los días laborables cuyo estatus cumple la condición"""
+        por_codigo = np.array([condicion(estatus) for estatus in self.catalogo], dtype=bool)
+        return por_codigo[self.estatus[:, laborables]]
+
+    @cached_property
+    def laborables_asistencia(self) -> np.ndarray:
+        """Días laborables del reporte de asistencias: sin fines de semana ni festivos"""
+        return ~self.fin_semana & ~self.festivo
+
+    @cached_property
+    def laborables_retardos_faltas(self) -> np.ndarray:
+        """Días laborables del reporte de retardos y faltas: de lunes a viernes"""
+        return ~self.fin_semana
+
+    @cached_property
+    def estadisticas_asistencia(self) -> Dict[str, np.ndarray]:
+        """
+        Conteos por trabajador del reporte de asistencias. El estatus cuenta solo
+        si hay entrada; sin entrada, el día cuenta como justificado si tiene
+        justificación.
+        """
+        laborables = self.laborables_asistencia
+        entrada = self.con_entrada[:, laborables]
+        por_codigo = lambda condicion: self._es(condicion, laborables)
+
+        dias_laborables = int(laborables.sum())
+        asistencias = (entrada & por_codigo(lambda e: e == "ASISTENCIA")).sum(axis=1)
+        retardos = (entrada & por_codigo(lambda e: "RETARDO" in e)).sum(axis=1)
+        faltas = (entrada & por_codigo(lambda e: e == "FALTA")).sum(axis=1)
+        justificados = (~entrada & self.justificado[:, laborables]).sum(axis=1)
+
+        return {
+            "dias_laborables": dias_laborables,
+            "asistencias": asistencias,
+            "retardos": retardos,
+            "faltas": faltas,
+            "justificados": justificados,
+            "no_registrados": dias_laborables - (asistencias + retardos + faltas + justificados),
+            "porcentaje_asistencia": (asistencias / dias_laborables) * 100 if dias_laborables > 0 else None
+        }
+
+    @cached_property
+    def estadisticas_retardos_faltas(self) -> Dict[str, np.ndarray]:
+        """
+        Conteos por trabajador del reporte de retardos y faltas. Un día sin
+        entrada es falta; una justificación con regla anula la falta o el
+        retardo del día.
+        """
+        laborables = self.laborables_retardos_faltas
+        entrada = self.con_entrada[:, laborables]
+        con_regla = self.con_regla[:, laborables]
+        por_codigo = lambda condicion: self._es(condicion, laborables)
+
+        menor = entrada & por_codigo(lambda e: e == "RETARDO_MENOR")
+        mayor = entrada & por_codigo(lambda e: e == "RETARDO_MAYOR")
+        falta = ~entrada | (entrada & por_codigo(lambda e: e == "FALTA"))
+
+        # Justificaciones: sin entrada el estatus del día es FALTA
+        justifica_falta = con_regla & (~entrada | por_codigo(lambda e: "FALTA" in e))
+        justifica_retardo = con_regla & entrada & por_codigo(lambda e: "RETARDO" in e and "FALTA" not in e)
+        justifica_menor = justifica_retardo & por_codigo(lambda e: "MENOR" in e)
+        justifica_mayor = justifica_retardo & ~por_codigo(lambda e: "MENOR" in e)
+
+        dias_laborables = int(laborables.sum())
+        asistencias = (entrada & por_codigo(lambda e: e == "ASISTENCIA")).sum(axis=1)
+
+        return {
+            "dias_laborables": dias_laborables,
+            "asistencias": asistencias,
+            "retardos": (menor | mayor).sum(axis=1) - justifica_retardo.sum(axis=1),
+            "retardos_menores": menor.sum(axis=1) - justifica_menor.sum(axis=1),
+            "retardos_mayores": mayor.sum(axis=1) - justifica_mayor.sum(axis=1),
+            "faltas": falta.sum(axis=1) - justifica_falta.sum(axis=1),
+            "porcentaje_asistencia": (asistencias / dias_laborables) * 100 if dias_laborables > 0 else None
+        }
+
+    def ranking_retardos_faltas(self) -> List[int]:
+        """Índices de los trabajadores ordenados de más a menos faltas y retardos"""
+        estadisticas = self.estadisticas_retardos_faltas
+        # lexsort es estable: los empates conservan el orden original
+        return np.lexsort((-estadisticas["retardos"], -estadisticas["faltas"])).tolist()
+
+    def horarios_por_dia(self, resolutor) -> np.ndarray:
+        """ID del horario vigente de cada trabajador en cada día (0 sin horario), con un ResolutorHorarios"""
+        return resolutor.matriz([trabajador.id for trabajador in self.trabajadores], self.datos.fecha_inicio, len(self.fechas))
+
+    def dias_laborables(self, laborables: np.ndarray) -> List[Tuple[int, date]]:
+        return [(j, self.fechas[j]) for j in np.flatnonzero(laborables).tolist()]
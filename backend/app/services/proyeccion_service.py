@@ -0,0 +1,163 @@
+from datetime import datetime, date, time
+from json.encoder import encode_basestring
+from typing import List, Tuple, Iterable
+from sqlalchemy.orm import Session, Query
+from app.models.models import RegistroAsistencia, Trabajador
+
+
+def _codificar_texto(valor) -> str:
+    return encode_basestring(valor)
+
+def _codificar_numero(valor) -> str:
+    return str(valor)
+
+def _codificar_booleano(valor) -> str:
+    return "true" if valor else "false"
+
+def _codificar_fecha(valor) -> str:
+    return '"' + valor.isoformat() + '"'
+
+_CODIFICADORES = {
+    int: _codificar_numero,
+    float: _codificar_numero,
+    str: _codificar_texto,
+    bool: _codificar_booleano,
+    datetime: _codificar_fecha,
+    date: _codificar_fecha,
+    time: _codificar_fecha,
+}
+
+
+class CodificadorFilas:
+    """
+    Codificador JSON precompilado para filas planas de una consulta.
+
+    La plantilla del objeto y la función de conversión de cada columna se
+    resuelven una sola vez al crear el codificador; codificar una fila es
+    solo aplicar las funciones y formatear la plantilla.
+    """
+
+    def __init__(self, campos: List[Tuple[str, type]], nulos: Iterable[str] = ()):
+        nulos = set(nulos)
+        partes = []
+        self._convertidores = []
+        for nombre, tipo in campos:
+            partes.append(encode_basestring(nombre) + ":%s")
+            convertir = _CODIFICADORES[tipo]
+            if nombre in nulos:
+                convertir = self._admitir_nulo(convertir)
+            self._convertidores.append(convertir)
+        self._plantilla = "{" + ",".join(partes) + "}"
+
+    @staticmethod
+    def _admitir_nulo(convertir):
+        def convertir_o_nulo(valor):
+            return "null" if valor is None else convertir(valor)
+        return convertir_o_nulo
+
+    def codificar_fila(self, fila) -> str:
+        return self._plantilla % tuple(
+            convertir(valor) for convertir, valor in zip(self._convertidores, fila)
+        )
+
+    def codificar(self, filas) -> bytes:
+        """Codifica todas las filas como un arreglo JSON en bytes"""
+        return ("[" + ",".join(map(self.codificar_fila, filas)) + "]").encode("utf-8")
+
+
+# Columnas de RegistroAsistenciaOut
+COLUMNAS_ASISTENCIA = [
+    RegistroAsistencia.id,
+    RegistroAsistencia.id_trabajador,
+    RegistroAsistencia.fecha,
+    RegistroAsistencia.estatus,
+]
+
+CODIFICADOR_ASISTENCIA = CodificadorFilas([
+    ("id", int),
+    ("id_trabajador", int),
+    ("fecha", datetime),
+    ("estatus", str),
+])
+
+# Columnas escalares de TrabajadorOut (sin relaciones anidadas)
+COLUMNAS_TRABAJADOR = [
+    Trabajador.id,
+    Trabajador.nombre,
+    Trabajador.apellidoPaterno,
+    Trabajador.apellidoMaterno,
+    Trabajador.rfc,
+    Trabajador.curp,
+    Trabajador.correo,
+    Trabajador.id_tipo,
+    Trabajador.departamento,
+    Trabajador.puesto,
+    Trabajador.id_horario,
+    Trabajador.estado,
+    Trabajador.id_centroTrabajo,
+    Trabajador.id_gradoEstudios,
+    Trabajador.titulo,
+    Trabajador.cedula,
+    Trabajador.escuelaEgreso,
+    Trabajador.turno,
+    Trabajador.fechaIngresoSep,
+    Trabajador.fechaIngresoRama,
+    Trabajador.fechaIngresoGobFed,
+    Trabajador.id_rol,
+]
+
+CODIFICADOR_TRABAJADOR = CodificadorFilas(
+    [
+        ("id", int),
+        ("nombre", str),
+        ("apellidoPaterno", str),
+        ("apellidoMaterno", str),
+        ("rfc", str),
+        ("curp", str),
+        ("correo", str),
+        ("id_tipo", int),
+        ("departamento", int),
+        ("puesto", str),
+        ("id_horario", int),
+        ("estado", bool),
+        ("id_centroTrabajo", int),
+        ("id_gradoEstudios", int),
+        ("titulo", str),
+        ("cedula", str),
+        ("escuelaEgreso", str),
+        ("turno", str),
+        ("fechaIngresoSep", datetime),
+        ("fechaIngresoRama", datetime),
+        ("fechaIngresoGobFed", datetime),
+        ("id_rol", int),
+    ],
+    nulos=["id_tipo", "departamento", "id_horario", "id_centroTrabajo", "id_gradoEstudios", "id_rol"]
+)
+
+
+def proyectar(db: Session, query: Query, columnas, codificador: CodificadorFilas) -> bytes:
+    """
+    Ejecuta la consulta (con sus filtros, orden y paginación) seleccionando solo
+    las columnas indicadas mediante Core, sin construir objetos ORM ni modelos
+    Pydantic, y devuelve el JSON ya codificado.
+
+    Args:
+        db (Session): Sesión de la base de datos
+        query (Query): Consulta ORM ya filtrada y paginada
+        columnas: Columnas a seleccionar, en el orden del codificador
+        codificador (CodificadorFilas): Codificador precompilado de las filas
+
+    Returns:
+        bytes: Arreglo JSON con las filas
+    """
+    statement = query.with_entities(*columnas).statement
+    filas = db.execute(statement).all()
+    return codificador.codificar(filas)
+
+
+def proyectar_asistencias(db: Session, query: Query) -> bytes:
+    return proyectar(db, query, COLUMNAS_ASISTENCIA, CODIFICADOR_ASISTENCIA)
+
+
+def proyectar_trabajadores(db: Session, query: Query) -> bytes:
+    return proyectar(db, query, COLUMNAS_TRABAJADOR, CODIFICADOR_TRABAJADOR)
@@ -0,0 +1,243 @@
+import calendar
+from sqlalchemy.orm import Session
+from sqlalchemy import or_, and_
+from datetime import date, timedelta
+from typing import Optional, Dict, List, Tuple, Any
+from app.config import settings
+from app.models.models import Trabajador, ContadorPuntualidad
+from app.services.datos_reporte import filas_resumen_rango
+from app.services.mapa_asistencia_service import ausencias_trabajadores
+
+# Contadores de puntualidad por trabajador y quincena. Cada cambio de
+# registros o justificaciones vuelve a contar solo la quincena del día
+# afectado (a lo más 16 días de un trabajador), así que el costo no crece con
+# el historial y los contadores no se desfasan si un cambio se aplica dos
+# veces. El mes es la suma de sus dos quincenas.
+#
+# Las faltas no se guardan: un día laborable sin registros no produce ningún
+# cambio que vuelva a contar su quincena. Se cuentan al consultar como las
+# ausencias sin justificar de mapa_asistencia_service (días laborables ya
+# transcurridos sin entrada válida ni justificación), que incluyen los días
+# cuya entrada quedó como FALTA.
+
+CAMPOS_CONTADOR = ("asistencias", "retardos_menores", "retardos_mayores", "justificados")
+
+
+def quincena_de(fecha: date) -> Tuple[int, int, int]:
+    """(año, mes, quincena) de un día"""
+    return fecha.year, fecha.month, 1 if fecha.day <= 15 else 2
+
+
+def limites_quincena(anio: int, mes: int, quincena: int) -> Tuple[date, date]:
+    """Primer y último día de una quincena"""
+    if quincena == 1:
+        return date(anio, mes, 1), date(anio, mes, 15)
+    return date(anio, mes, 16), date(anio, mes, calendar.monthrange(anio, mes)[1])
+
+
+def _quincenas(fecha_inicio: date, fecha_fin: date) -> List[Tuple[int, int, int]]:
+    """Quincenas que tocan el rango, en orden"""
+    quincenas = []
+    fecha = fecha_inicio
+    while fecha <= fecha_fin:
+        quincena = quincena_de(fecha)
+        quincenas.append(quincena)
+        fecha = limites_quincena(*quincena)[1] + timedelta(days=1)
+    return quincenas
+
+
+def rango_quincenas(fecha_inicio: date, fecha_fin: date) -> Tuple[date, date]:
+    """Primer día de la quincena de fecha_inicio y último de la de fecha_fin"""
+    return limites_quincena(*quincena_de(fecha_inicio))[0], limites_quincena(*quincena_de(fecha_fin))[1]
+
+
+def _campo_del_dia(fila: dict) -> Optional[str]:
+    """
+    Contador al que suma un día con registros: la justificación anula el
+    retardo del día, como en el reporte de retardos y faltas; una entrada
+    FALTA no suma aquí, cuenta como ausencia
+    """
+    estatus = fila["estatus"]
+    if fila["id_justificacion"] is not None or estatus == "JUSTIFICADO":
+        return "justificados"
+    if fila["hora_entrada"] is None:
+        return None
+    return {
+        "ASISTENCIA": "asistencias",
+        "RETARDO_MENOR": "retardos_menores",
+        "RETARDO_MAYOR": "retardos_mayores"
+    }.get(estatus)
+
+
+def _contar(filas: List[dict], trabajador_ids: List[int], quincenas: List[Tuple[int, int, int]]) -> Dict[Tuple[int, int, int, int], Dict[str, int]]:
+    """Conteos por (trabajador, año, mes, quincena) desde las filas por día de filas_resumen_rango"""
+    conteos = {
+        (id_trabajador, *quincena): dict.fromkeys(CAMPOS_CONTADOR, 0)
+        for id_trabajador in trabajador_ids
+        for quincena in quincenas
+    }
+    for fila in filas:
+        campo = _campo_del_dia(fila)
+        clave = (fila["id_trabajador"], *quincena_de(fila["fecha"]))
+        if campo and clave in conteos:
+            conteos[clave][campo] += 1
+    return conteos
+
+
+def actualizar_contadores_rango(
+    db: Session,
+    trabajador_ids: List[int],
+    fecha_inicio: date,
+    fecha_fin: date,
+    filas: List[dict]
+) -> None:
+    """
+    Vuelve a contar las quincenas que tocan el rango para varios trabajadores.
+    Se llama desde actualizar_derivados_rango, antes del commit; filas son las
+    de filas_resumen_rango para esos trabajadores en rango_quincenas(fecha_inicio, fecha_fin).
+    """
+    if not settings.CONTADORES_PUNTUALIDAD_ACTIVO or not trabajador_ids:
+        return
+
+    trabajador_ids = sorted({id_trabajador for id_trabajador in trabajador_ids if id_trabajador is not None})
+    if not trabajador_ids:
+        return
+
+    quincenas = _quincenas(fecha_inicio, fecha_fin)
+    conteos = _contar(filas, trabajador_ids, quincenas)
+
+    db.query(ContadorPuntualidad).filter(
+        ContadorPuntualidad.id_trabajador.in_(trabajador_ids),
+        or_(*[
+            and_(
+                ContadorPuntualidad.anio == anio,
+                ContadorPuntualidad.mes == mes,
+                ContadorPuntualidad.quincena == quincena
+            )
+            for anio, mes, quincena in quincenas
+        ])
+    ).delete(synchronize_session=False)
+
+    contadores = [
+        {"id_trabajador": id_trabajador, "anio": anio, "mes": mes, "quincena": quincena, **valores}
+        for (id_trabajador, anio, mes, quincena), valores in conteos.items()
+        if any(valores.values())
+    ]
+    if contadores:
+        db.bulk_insert_mappings(ContadorPuntualidad, contadores)
+
+
+def reconstruir_contadores(
+    db: Session,
+    fecha_inicio: date,
+    fecha_fin: date,
+    trabajador_id: Optional[int] = None
+) -> int:
+    """
+    Reconstruye contador_puntualidad de las quincenas que tocan el rango, una
+    quincena a la vez (cada una se confirma por separado).
+
+    Args:
+        db (Session): Sesión de la base de datos
+        fecha_inicio (date): Primer día a reconstruir
+        fecha_fin (date): Último día a reconstruir
+        trabajador_id (Optional[int]): ID del trabajador (opcional)
+
+    Returns:
+        int: Número de quincenas reconstruidas
+    """
+    query_ids = db.query(Trabajador.id)
+    if trabajador_id:
+        query_ids = query_ids.filter(Trabajador.id == trabajador_id)
+    trabajador_ids = [id_trabajador for (id_trabajador,) in query_ids]
+
+    quincenas = _quincenas(fecha_inicio, fecha_fin)
+    for quincena in quincenas:
+        inicio, fin = limites_quincena(*quincena)
+        filas = filas_resumen_rango(db, inicio, fin, trabajador_ids)
+        actualizar_contadores_rango(db, trabajador_ids, inicio, fin, filas)
+        db.commit()
+        print(f"⏱️ Contadores de puntualidad {inicio} a {fin} reconstruidos")
+    return len(quincenas)
+
+
+def _indice(conteos: Dict[str, int]) -> Dict[str, Any]:
+    """Conteos de un período con las faltas por acumulación de retardos y el índice de puntualidad"""
+    resultado = dict(conteos)
+    acumuladas = 0
+    if settings.RETARDOS_MENORES_POR_FALTA > 0:
+        acumuladas += conteos["retardos_menores"] // settings.RETARDOS_MENORES_POR_FALTA
+    if settings.RETARDOS_MAYORES_POR_FALTA > 0:
+        acumuladas += conteos["retardos_mayores"] // settings.RETARDOS_MAYORES_POR_FALTA
+    resultado["faltas_por_retardos"] = acumuladas
+
+    # Porcentaje de días con entrada puntual entre los días con entrada o falta
+    dias = conteos["asistencias"] + conteos["retardos_menores"] + conteos["retardos_mayores"] + conteos["faltas"]
+    resultado["indice_puntualidad"] = round(conteos["asistencias"] * 100 / dias, 2) if dias else None
+    return resultado
+
+
+def obtener_puntualidad(db: Session, trabajador_id: int, fecha: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Contadores e índice de puntualidad de un trabajador en la quincena y el
+    mes de un día (por defecto, hoy): desde contador_puntualidad si está
+    activo, o contando los registros del mes si no. Las faltas son los días
+    laborables ya transcurridos sin entrada válida ni justificación.
+
+    Args:
+        db (Session): Sesión de la base de datos
+        trabajador_id (int): ID del trabajador
+        fecha (Optional[date]): Día de referencia (opcional)
+
+    Returns:
+        Dict[str, Any]: Conteos de la quincena y del mes
+    """
+    fecha = fecha or date.today()
+    anio, mes, quincena = quincena_de(fecha)
+    quincenas = [(anio, mes, 1), (anio, mes, 2)]
+    inicio_mes, fin_mes = date(anio, mes, 1), limites_quincena(anio, mes, 2)[1]
+
+    filas = None
+    if settings.CONTADORES_PUNTUALIDAD_ACTIVO:
+        conteos = {
+            (trabajador_id, *q): dict.fromkeys(CAMPOS_CONTADOR, 0) for q in quincenas
+        }
+        for contador in db.query(ContadorPuntualidad).filter(
+            ContadorPuntualidad.id_trabajador == trabajador_id,
+            ContadorPuntualidad.anio == anio,
+            ContadorPuntualidad.mes == mes
+        ):
+            conteos[(trabajador_id, anio, mes, contador.quincena)] = {
+                campo: getattr(contador, campo) for campo in CAMPOS_CONTADOR
+            }
+    else:
+        filas = filas_resumen_rango(db, inicio_mes, fin_mes, [trabajador_id])
+        conteos = _contar(filas, [trabajador_id], quincenas)
+
+    laborables, _, _, ausentes = ausencias_trabajadores(db, [trabajador_id], inicio_mes, fin_mes, filas)
+    for q in quincenas:
+        inicio, fin = limites_quincena(*q)
+        dias = slice((inicio - inicio_mes).days, (fin - inicio_mes).days + 1)
+        conteos[(trabajador_id, *q)]["faltas"] = int(ausentes[0, dias].sum())
+        conteos[(trabajador_id, *q)]["dias_laborables"] = int(laborables[0, dias].sum())
+
+    de_quincena = conteos[(trabajador_id, anio, mes, quincena)]
+    del_mes = {
+        campo: sum(conteos[(trabajador_id, *q)][campo] for q in quincenas) for campo in de_quincena
+    }
+    inicio_quincena, fin_quincena = limites_quincena(anio, mes, quincena)
+
+    return {
+        "id_trabajador": trabajador_id,
+        "fecha": fecha,
+        "quincena": {
+            "fecha_inicio": inicio_quincena,
+            "fecha_fin": fin_quincena,
+            **_indice(de_quincena)
+        },
+        "mes": {
+            "fecha_inicio": inicio_mes,
+            "fecha_fin": fin_mes,
+            **_indice(del_mes)
+        }
+    }
@@ -0,0 +1,260 @@
+import numpy as np
+from collections import Counter
+from sqlalchemy.orm import Session
+from sqlalchemy import delete, and_, or_
+from datetime import datetime, date, time, timedelta
+from typing import Optional, List, Dict, Any
+from app.config import settings
+from app.models.models import RegistroAsistencia, ReglaRetardo, DiaFestivo, AgregadoMensual
+from app.services.horarios_service import ResolutorHorarios
+from app.services.derivados_service import actualizar_derivados_rango
+from app.services.cache_reportes import invalidar_fechas
+
+# Recálculo masivo de los estatus de RegistroAsistencia con las reglas de
+# retardo, los horarios (según su historial) y los días festivos actuales. Las
+# entradas se clasifican por bloques de días con operaciones de NumPy y los
+# cambios se escriben con un UPDATE por estatus, igual que lo haría
+# determinar_estatus_asistencia registro por registro.
+
+# Días que se recalculan por bloque (cada bloque se confirma por separado)
+DIAS_POR_BLOQUE = 31
+
+# IDs por sentencia UPDATE
+IDS_POR_SENTENCIA = 1000
+
+# Estatus que no vienen de clasificar un registro del checador
+ESTATUS_NO_RECALCULABLES = ("JUSTIFICADO",)
+
+# Límites de las reglas por defecto (sin reglas en la BD), en minutos de diferencia
+REGLAS_POR_DEFECTO = ((10, "ASISTENCIA"), (20, "RETARDO_MENOR"), (30, "RETARDO_MAYOR"))
+
+
+def estatus_de_regla(regla: ReglaRetardo) -> str:
+    """Estatus que asigna una regla de retardo a partir de su descripción"""
+    estatus = regla.descripcion.upper().replace(' ', '_')
+    if 'TOLERANCIA' in estatus:
+        return "ASISTENCIA"
+    elif 'FALTA' in estatus:
+        return "FALTA"
+    return estatus
+
+
+def clasificar_entradas(minutos: np.ndarray, reglas: List[ReglaRetardo]) -> np.ndarray:
+    """
+    Estatus de varias entradas según sus minutos de diferencia con la hora de
+    entrada del horario. Las reglas se aplican en orden de minutosMin y gana la
+    primera que contiene la diferencia; sin regla que la contenga es FALTA.
+
+    Args:
+        minutos (np.ndarray): Minutos de diferencia de cada entrada
+        reglas (List[ReglaRetardo]): Reglas ordenadas por minutosMin
+
+    Returns:
+        np.ndarray: Estatus de cada entrada (dtype object)
+    """
+    estatus = np.full(len(minutos), "FALTA", dtype=object)
+    pendientes = np.ones(len(minutos), dtype=bool)
+
+    if not reglas:
+        for limite, nombre in REGLAS_POR_DEFECTO:
+            mascara = pendientes & (minutos <= limite)
+            estatus[mascara] = nombre
+            pendientes &= ~mascara
+        return estatus
+
+    for regla in reglas:
+        mascara = pendientes & (minutos >= regla.minutosMin) & (minutos <= regla.minutosMax)
+        estatus[mascara] = estatus_de_regla(regla)
+        pendientes &= ~mascara
+    return estatus
+
+
+def clasificar_entrada(minutos: int, reglas: List[ReglaRetardo]) -> str:
+    """Estatus de una sola entrada; ver clasificar_entradas"""
+    return clasificar_entradas(np.array([minutos]), reglas)[0]
+
+
+def inicios_de_grupo(*claves: np.ndarray) -> np.ndarray:
+    """Filas (ordenadas por las claves) donde empieza un grupo nuevo"""
+    inicio = np.zeros(len(claves[0]), dtype=bool)
+    inicio[:1] = True
+    for clave in claves:
+        inicio[1:] |= clave[1:] != clave[:-1]
+    return inicio
+
+
+def registros_de_salida(estatus: np.ndarray, trabajadores: np.ndarray, dias: np.ndarray) -> np.ndarray:
+    """
+    Qué registros (ordenados por trabajador y hora) son salidas. Los registros
+    de un día festivo no dicen si fueron entrada o salida: se alternan por su
+    posición en el día.
+    """
+    indices = np.arange(len(estatus))
+    posicion = indices - np.maximum.accumulate(np.where(inicios_de_grupo(trabajadores, dias), indices, 0))
+    return (estatus == "SALIDA") | ((estatus == "DIA_FESTIVO") & (posicion % 2 == 1))
+
+
+def _recalcular_bloque(
+    db: Session,
+    fecha_inicio: date,
+    fecha_fin: date,
+    trabajador_ids: Optional[List[int]],
+    resolutor: ResolutorHorarios,
+    tabla_entradas: np.ndarray,
+    reglas: List[ReglaRetardo]
+) -> Dict[str, Any]:
+    query = db.query(
+        RegistroAsistencia.id, RegistroAsistencia.id_trabajador, RegistroAsistencia.fecha, RegistroAsistencia.estatus
+    ).filter(
+        RegistroAsistencia.fecha >= datetime.combine(fecha_inicio, time.min),
+        RegistroAsistencia.fecha <= datetime.combine(fecha_fin, time.max),
+        RegistroAsistencia.id_trabajador.isnot(None),
+        RegistroAsistencia.estatus.notin_(ESTATUS_NO_RECALCULABLES)
+    )
+    if trabajador_ids is not None:
+        query = query.filter(RegistroAsistencia.id_trabajador.in_(trabajador_ids))
+    filas = query.order_by(RegistroAsistencia.id_trabajador, RegistroAsistencia.fecha, RegistroAsistencia.id).all()
+
+    if not filas:
+        return {"revisados": 0, "cambios": [], "trabajadores": set()}
+
+    ids, trabajadores, fechas, anteriores = zip(*filas)
+    ids = np.array(ids, dtype=np.int64)
+    trabajadores = np.array(trabajadores, dtype=np.int64)
+    anteriores = np.array(anteriores, dtype=object)
+    dia = np.array([(fecha.date() - fecha_inicio).days for fecha in fechas], dtype=np.int32)
+    segundos = np.array([fecha.hour * 3600 + fecha.minute * 60 + fecha.second for fecha in fechas], dtype=np.int32)
+
+    numero_dias = (fecha_fin - fecha_inicio).days + 1
+    dias_semana = np.array([(fecha_inicio + timedelta(days=j)).weekday() for j in range(numero_dias)], dtype=np.int8)
+    festivos = np.zeros(numero_dias, dtype=bool)
+    for (fecha_festivo,) in db.query(DiaFestivo.fecha).filter(
+        DiaFestivo.fecha >= datetime.combine(fecha_inicio, time.min),
+        DiaFestivo.fecha <= datetime.combine(fecha_fin, time.max)
+    ):
+        festivos[(fecha_festivo.date() - fecha_inicio).days] = True
+
+    # Horario vigente de cada registro: matriz trabajadores × días del resolutor
+    ids_trabajadores, fila_trabajador = np.unique(trabajadores, return_inverse=True)
+    horarios = resolutor.matriz(ids_trabajadores.tolist(), fecha_inicio, numero_dias)[fila_trabajador, dia]
+    horarios[horarios >= len(tabla_entradas)] = 0
+    entrada = tabla_entradas[horarios, dias_semana[dia]]
+
+    salida = registros_de_salida(anteriores, trabajadores, dia)
+
+    # Mismo orden de decisión que determinar_estatus_asistencia
+    nuevos = np.full(len(ids), "ASISTENCIA", dtype=object)
+    nuevos[salida] = "SALIDA"
+    clasificables = ~salida & (entrada >= 0)
+    if clasificables.any():
+        # int() trunca hacia cero, como en el cálculo registro por registro
+        minutos = np.trunc((segundos[clasificables] - entrada[clasificables]) / 60).astype(np.int32)
+        nuevos[clasificables] = clasificar_entradas(minutos, reglas)
+    nuevos[festivos[dia]] = "DIA_FESTIVO"
+
+    cambiados = np.flatnonzero(nuevos != anteriores)
+    return {
+        "revisados": len(ids),
+        "cambios": [(int(ids[k]), anteriores[k], nuevos[k], int(trabajadores[k]), fechas[k]) for k in cambiados],
+        "trabajadores": set(trabajadores[cambiados].tolist())
+    }
+
+
+def _escribir_cambios(db: Session, cambios: list) -> None:
+    """Un UPDATE por estatus nuevo (en tandas de IDS_POR_SENTENCIA IDs)"""
+    por_estatus = {}
+    for id_registro, _, nuevo, _, _ in cambios:
+        por_estatus.setdefault(nuevo, []).append(id_registro)
+    for estatus, ids in por_estatus.items():
+        for k in range(0, len(ids), IDS_POR_SENTENCIA):
+            db.query(RegistroAsistencia).filter(
+                RegistroAsistencia.id.in_(ids[k:k + IDS_POR_SENTENCIA])
+            ).update({RegistroAsistencia.estatus: estatus}, synchronize_session=False)
+
+
+def _borrar_agregados(db: Session, cambios: list) -> None:
+    """Borra los agregados mensuales de los trabajadores y meses con cambios"""
+    meses = {(id_trabajador, fecha.year, fecha.month) for _, _, _, id_trabajador, fecha in cambios}
+    condiciones = [
+        and_(AgregadoMensual.id_trabajador == id_trabajador, AgregadoMensual.anio == anio, AgregadoMensual.mes == mes)
+        for id_trabajador, anio, mes in meses
+    ]
+    for k in range(0, len(condiciones), IDS_POR_SENTENCIA):
+        db.execute(delete(AgregadoMensual).where(or_(*condiciones[k:k + IDS_POR_SENTENCIA])))
+
+
+def recalcular_estatus(
+    db: Session,
+    fecha_inicio: date,
+    fecha_fin: date,
+    trabajador_ids: Optional[List[int]] = None,
+    simular: bool = False
+) -> Dict[str, Any]:
+    """
+    Vuelve a clasificar los registros de asistencia de un rango con las reglas
+    de retardo, los horarios y los días festivos actuales. Los registros
+    JUSTIFICADO no se tocan.
+
+    Args:
+        db (Session): Sesión de la base de datos
+        fecha_inicio (date): Primer día a recalcular
+        fecha_fin (date): Último día a recalcular
+        trabajador_ids (Optional[List[int]]): IDs de los trabajadores (opcional, todos)
+        simular (bool): Solo calcular el resumen de cambios, sin escribirlos
+
+    Returns:
+        Dict[str, Any]: Resumen de los cambios (revisados, cambiados y por transición)
+    """
+    resolutor = ResolutorHorarios(db, trabajador_ids)
+    tabla_entradas = resolutor.tabla_entradas()
+    reglas = db.query(ReglaRetardo).order_by(ReglaRetardo.minutosMin).all()
+
+    revisados = 0
+    transiciones = Counter()
+    por_trabajador = Counter()
+    ejemplos = []
+
+    bloque_inicio = fecha_inicio
+    while bloque_inicio <= fecha_fin:
+        bloque_fin = min(bloque_inicio + timedelta(days=DIAS_POR_BLOQUE - 1), fecha_fin)
+        resultado = _recalcular_bloque(
+            db, bloque_inicio, bloque_fin, trabajador_ids, resolutor, tabla_entradas, reglas
+        )
+        cambios = resultado["cambios"]
+        revisados += resultado["revisados"]
+
+        for id_registro, anterior, nuevo, id_trabajador, fecha in cambios:
+            transiciones[f"{anterior} -> {nuevo}"] += 1
+            por_trabajador[id_trabajador] += 1
+            if len(ejemplos) < 20:
+                ejemplos.append({
+                    "id": id_registro,
+                    "id_trabajador": id_trabajador,
+                    "fecha": fecha,
+                    "anterior": anterior,
+                    "nuevo": nuevo
+                })
+
+        if cambios and not simular:
+            # Los UPDATE por conjunto no pasan por los eventos de la sesión:
+            # el resumen, los agregados y la caché se actualizan aquí
+            _escribir_cambios(db, cambios)
+            actualizar_derivados_rango(db, sorted(resultado["trabajadores"]), bloque_inicio, bloque_fin)
+            if settings.AGREGADOS_MENSUALES_ACTIVO:
+                _borrar_agregados(db, cambios)
+            db.commit()
+            invalidar_fechas(bloque_inicio, bloque_fin)
+
+        print(f"🔄 Recálculo {bloque_inicio} a {bloque_fin}: {resultado['revisados']} revisados, {len(cambios)} cambios")
+        bloque_inicio = bloque_fin + timedelta(days=1)
+
+    return {
+        "fecha_inicio": fecha_inicio,
+        "fecha_fin": fecha_fin,
+        "simulado": simular,
+        "revisados": revisados,
+        "cambiados": sum(transiciones.values()),
+        "transiciones": dict(transiciones.most_common()),
+        "trabajadores_afectados": len(por_trabajador),
+        "ejemplos": ejemplos
+    }
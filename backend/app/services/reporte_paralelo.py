@@ -0,0 +1,106 @@
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Optional, List, Dict, Any
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.models.models import Trabajador
+from app.services.datos_reporte import cargar_datos_reporte, filtros_alcance
+from app.services.matriz_asistencia import MatrizAsistencia
+from app.services.reporte_sevice import resumir_retardos_faltas
+
+# Cálculo de reportes grandes en paralelo: los trabajadores del alcance se
+# parten en rangos de IDs contiguos y cada rango se calcula en un proceso del
+# pool (settings.PROCESOS_REPORTES) con su propia sesión de base de datos.
+# Los procesos de los trabajos en segundo plano ya forman su propio pool y
+# calculan en serie: su inicializador apaga usar_pool.
+
+# Con menos trabajadores por fragmento no compensa el costo de los procesos
+TRABAJADORES_MINIMOS_POR_FRAGMENTO = 100
+
+_pool: Optional[ProcessPoolExecutor] = None
+usar_pool = True
+
+
+def _inicializar_proceso() -> None:
+    # Las conexiones heredadas del proceso padre no se pueden compartir
+    engine.dispose(close=False)
+
+
+def _obtener_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.PROCESOS_REPORTES, initializer=_inicializar_proceso)
+    return _pool
+
+
+def _fragmento_retardos_faltas(fecha_inicio: date, fecha_fin: date, trabajador_ids: List[int], detalle: bool) -> List[Dict[str, Any]]:
+    """Calcula un fragmento del reporte de retardos y faltas, ya ordenado por faltas y retardos"""
+    db = SessionLocal()
+    try:
+        datos = cargar_datos_reporte(
+            db,
+            fecha_inicio,
+            fecha_fin,
+            trabajador_ids=trabajador_ids,
+            desde_resumen=settings.RESUMEN_DIARIO_ACTIVO
+        )
+        matriz = MatrizAsistencia(datos)
+        return [resumir_retardos_faltas(matriz, i, detalle=detalle) for i in matriz.ranking_retardos_faltas()]
+    finally:
+        db.close()
+
+
+def _orden_retardos_faltas(trabajador: Dict[str, Any]):
+    # Más faltas primero, luego más retardos; los empates por ID, como en el cálculo en serie
+    return (-trabajador["estadisticas"]["faltas"], -trabajador["estadisticas"]["retardos"], trabajador["id"])
+
+
+def retardos_faltas_en_paralelo(
+    db: Session,
+    fecha_inicio: date,
+    fecha_fin: date,
+    departamento_id: Optional[int] = None,
+    detalle: bool = True
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Calcula los trabajadores del reporte de retardos y faltas repartidos en
+    el pool de procesos y mezcla los fragmentos en el mismo orden que el
+    cálculo en serie.
+
+    Returns:
+        Optional[List[Dict[str, Any]]]: Trabajadores ordenados de más a menos
+            faltas y retardos, o None si el reporte es chico, se llama desde
+            un trabajo en segundo plano o el pool falló (el llamador lo
+            calcula en serie)
+    """
+    if not usar_pool:
+        return None
+
+    ids = [fila.id for fila in db.query(Trabajador.id).filter(
+        *filtros_alcance(departamento_id)
+    ).order_by(Trabajador.id)]
+
+    fragmentos = min(settings.PROCESOS_REPORTES, len(ids) // TRABAJADORES_MINIMOS_POR_FRAGMENTO)
+    if fragmentos < 2:
+        return None
+
+    tamano = -(-len(ids) // fragmentos)
+    rangos = [ids[inicio:inicio + tamano] for inicio in range(0, len(ids), tamano)]
+    print(f"⚙️ Reporte de retardos y faltas en {len(rangos)} fragmentos de hasta {tamano} trabajadores")
+
+    global _pool
+    try:
+        futuros = [
+            _obtener_pool().submit(_fragmento_retardos_faltas, fecha_inicio, fecha_fin, rango, detalle)
+            for rango in rangos
+        ]
+        resultados = [futuro.result() for futuro in futuros]
+    except BrokenProcessPool:
+        print("❌ El pool de procesos de reportes falló; se calcula en serie")
+        _pool = None
+        return None
+
+    return list(heapq.merge(*resultados, key=_orden_retardos_faltas))
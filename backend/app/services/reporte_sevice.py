@@ -1,158 +1,237 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, cast, Date
-from datetime import datetime, date, time, timedelta
-import calendar
-from typing import Optional, Dict, List, Any
-from app.models.models import (
-    RegistroAsistencia, 
-    Trabajador, 
-    Departamento,
-    Justificacion,
-    DiaFestivo
-)
+from datetime import date
+from typing import Optional, Dict, Any, List
+from app.config import settings
+from app.services.datos_reporte import cargar_datos_reporte
+from app.services.matriz_asistencia import MatrizAsistencia
 
-def generar_reporte_asistencias_por_periodo(
-    db: Session,
-    fecha_inicio: date,
-    fecha_fin: date,
-    departamento_id: Optional[int] = None,
-    trabajador_id: Optional[int] = None
-) -> Dict[str, Any]:
+def resumir_trabajador(matriz: MatrizAsistencia, indice: int) -> Dict[str, Any]:
     """
-    Genera un reporte de asistencias para un período determinado.
+    Arma las estadísticas y los registros diarios de un trabajador en el
+    período de la matriz (solo días laborables). Las estadísticas ya están
+    calculadas para todos los trabajadores en la matriz.
     
     Args:
-        db (Session): Sesión de la base de datos
-        fecha_inicio (date): Fecha de inicio del período
-        fecha_fin (date): Fecha de fin del período
-        departamento_id (Optional[int]): ID del departamento (opcional)
-        trabajador_id (Optional[int]): ID del trabajador (opcional)
+        matriz (MatrizAsistencia): Matriz de asistencia del período
+        indice (int): Índice del trabajador en la matriz
     
     Returns:
-        Dict[str, Any]: Diccionario con los resultados del reporte
+        Dict[str, Any]: Datos del trabajador, estadísticas y registros diarios
     """
-    # Convertir fechas a datetime para la consulta
-    fecha_inicio_dt = datetime.combine(fecha_inicio, time.min)
-    fecha_fin_dt = datetime.combine(fecha_fin, time.max)
+    trabajador = matriz.trabajadores[indice]
     
-    # Consulta base para obtener trabajadores
-    query_trabajadores = db.query(Trabajador)
+    # Registros diarios
+    registros_diarios = []
     
-    # Filtrar por departamento si se proporciona
-    if departamento_id:
-        query_trabajadores = query_trabajadores.filter(Trabajador.departamento == departamento_id)
+    for j, fecha in matriz.dias_laborables(matriz.laborables_asistencia):
+        # Estado del día ya resuelto (entrada del día o justificación)
+        dia = matriz.dia(indice, j)
+        hora_registro = None
+        
+        if dia.hora_entrada:
+            hora_registro = dia.hora_entrada
+        elif dia.id_justificacion:
+            hora_registro = dia.fecha_justificacion
+        
+        registros_diarios.append({
+            "fecha": fecha,
+            "estatus": dia.estatus,
+            "hora_registro": hora_registro
+        })
+    
+    return {
+        "id": trabajador.id,
+        "nombre": f"{trabajador.nombre} {trabajador.apellidoPaterno} {trabajador.apellidoMaterno}",
+        "rfc": trabajador.rfc,
+        "departamento": matriz.datos.nombre_departamento(trabajador),
+        "puesto": trabajador.puesto,
+        "estadisticas": _estadisticas_asistencia(matriz, indice),
+        "registros_diarios": registros_diarios
+    }
+
+def _estadisticas_asistencia(matriz: MatrizAsistencia, indice: int) -> Dict[str, Any]:
+    estadisticas = matriz.estadisticas_asistencia
+    dias_laborables = estadisticas["dias_laborables"]
+    return {
+        "dias_laborables": dias_laborables,
+        "asistencias": int(estadisticas["asistencias"][indice]),
+        "retardos": int(estadisticas["retardos"][indice]),
+        "faltas": int(estadisticas["faltas"][indice]),
+        "justificados": int(estadisticas["justificados"][indice]),
+        "no_registrados": int(estadisticas["no_registrados"][indice]),
+        "porcentaje_asistencia": float(estadisticas["porcentaje_asistencia"][indice]) if dias_laborables > 0 else 0
+    }
+
+def resumir_asistencias_columnar(matriz: MatrizAsistencia) -> Dict[str, Any]:
+    """
+    Arma el reporte de asistencias en formato columnar: un solo eje de fechas
+    (días laborables), un diccionario de estatus y, por trabajador, un arreglo
+    de códigos de estatus y otro con el minuto del día de su registro.
     
-    # Filtrar por trabajador si se proporciona
-    if trabajador_id:
-        query_trabajadores = query_trabajadores.filter(Trabajador.id == trabajador_id)
+    Args:
+        matriz (MatrizAsistencia): Matriz de asistencia del período
     
-    # Filtrar solo trabajadores activos
-    query_trabajadores = query_trabajadores.filter(Trabajador.estado == True)
+    Returns:
+        Dict[str, Any]: fechas, estatus y trabajadores; estatus[codigo] es el texto
+            del estatus y minutos[k] es None si el día no tiene registro
+    """
+    laborables = matriz.laborables_asistencia
+    codigos = matriz.estatus[:, laborables].tolist()
+    minutos = matriz.minuto_registro[:, laborables].tolist()
     
-    # Obtener todos los trabajadores que cumplen con los criterios
-    trabajadores = query_trabajadores.all()
+    trabajadores = []
+    for i, trabajador in enumerate(matriz.trabajadores):
+        trabajadores.append({
+            "id": trabajador.id,
+            "nombre": f"{trabajador.nombre} {trabajador.apellidoPaterno} {trabajador.apellidoMaterno}",
+            "rfc": trabajador.rfc,
+            "departamento": matriz.datos.nombre_departamento(trabajador),
+            "puesto": trabajador.puesto,
+            "estadisticas": _estadisticas_asistencia(matriz, i),
+            "estatus": codigos[i],
+            "minutos": [minuto if minuto >= 0 else None for minuto in minutos[i]]
+        })
     
-    # Obtener todos los días festivos del período
-    dias_festivos = db.query(DiaFestivo).filter(
-        DiaFestivo.fecha.between(fecha_inicio_dt, fecha_fin_dt)
-    ).all()
+    return {
+        "fechas": [fecha for _, fecha in matriz.dias_laborables(laborables)],
+        "estatus": matriz.catalogo,
+        "trabajadores": trabajadores
+    }
+
+DIAS_SEMANA = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+
+def registros_diarios_retardos_faltas(matriz: MatrizAsistencia, indice: int) -> List[Dict[str, Any]]:
+    """
+    Detalle diario de un trabajador para el reporte de retardos y faltas, con
+    el estatus de cada día ya ajustado por sus justificaciones.
     
-    dias_festivos_set = {festivo.fecha.date() for festivo in dias_festivos}
+    Args:
+        matriz (MatrizAsistencia): Matriz de asistencia del período
+        indice (int): Índice del trabajador en la matriz
     
-    # Construir el diccionario de resultados
-    resultados = []
+    Returns:
+        List[Dict[str, Any]]: Un registro por día laborable
+    """
+    registros_diarios = []
     
-    for trabajador in trabajadores:
-        # Obtener todas las asistencias del trabajador para el período
-        asistencias = db.query(RegistroAsistencia).filter(
-            RegistroAsistencia.id_empleado == trabajador.id,
-            RegistroAsistencia.fecha.between(fecha_inicio_dt, fecha_fin_dt)
-        ).all()
-        
-        # Obtener todas las justificaciones del trabajador para el período
-        justificaciones = db.query(Justificacion).filter(
-            Justificacion.id_empleado == trabajador.id,
-            Justificacion.fecha.between(fecha_inicio_dt, fecha_fin_dt)
-        ).all()
+    # Solo días laborables (Lunes=0 a Viernes=4)
+    for j, fecha_actual in matriz.dias_laborables(matriz.laborables_retardos_faltas):
+        # Estado del día ya resuelto (entrada, salida y justificación)
+        dia = matriz.dia(indice, j)
         
-        # Crear diccionarios para mapear fechas a asistencias y justificaciones
-        asistencias_por_fecha = {a.fecha.date(): a for a in asistencias}
-        justificaciones_por_fecha = {j.fecha.date(): j for j in justificaciones}
+        # Sin registro de entrada el día es falta
+        hora_entrada_str = None
+        hora_salida_str = None
+        estatus_dia = "FALTA"
+        justificacion = None
         
-        # Obtener el nombre del departamento
-        departamento = db.query(Departamento).filter(Departamento.id == trabajador.departamento).first()
-        departamento_nombre = departamento.descripcion if departamento else "Sin departamento"
+        if dia.hora_entrada:
+            hora_entrada_str = dia.hora_entrada.strftime("%H:%M:%S")
+            estatus_dia = dia.estatus
         
-        # Calcular estadísticas
-        dias_laborables = 0
-        asistencias_count = 0
-        retardos_count = 0
-        faltas_count = 0
-        justificados_count = 0
+        if dia.hora_salida:
+            hora_salida_str = dia.hora_salida.strftime("%H:%M:%S")
         
-        # Registros diarios
-        registros_diarios = []
+        # Justificación del día con la descripción de su regla
+        if dia.id_justificacion and dia.justificacion is not None:
+            justificacion = dia.justificacion
+            if "FALTA" in estatus_dia:
+                estatus_dia = "FALTA JUSTIFICADA"
+            elif "RETARDO" in estatus_dia:
+                estatus_dia = f"{estatus_dia} JUSTIF."
         
-        # Iterar por cada día del período
-        fecha_actual = fecha_inicio
-        while fecha_actual <= fecha_fin:
-            # Verificar si es fin de semana (5 = sábado, 6 = domingo)
-            es_fin_semana = fecha_actual.weekday() >= 5
-            
-            # Verificar si es día festivo
-            es_festivo = fecha_actual in dias_festivos_set
-            
-            # Si no es fin de semana ni día festivo, es día laborable
-            if not es_fin_semana and not es_festivo:
-                dias_laborables += 1
-                
-                # Determinar el estatus para este día
-                estatus = "NO_REGISTRADO"
-                hora_registro = None
-                
-                if fecha_actual in asistencias_por_fecha:
-                    estatus = asistencias_por_fecha[fecha_actual].estatus
-                    hora_registro = asistencias_por_fecha[fecha_actual].fecha
-                    
-                    if estatus == "ASISTENCIA":
-                        asistencias_count += 1
-                    elif "RETARDO" in estatus:
-                        retardos_count += 1
-                    elif estatus == "FALTA":
-                        faltas_count += 1
-                
-                elif fecha_actual in justificaciones_por_fecha:
-                    estatus = "JUSTIFICADO"
-                    hora_registro = justificaciones_por_fecha[fecha_actual].fecha
-                    justificados_count += 1
-                
-                # Agregar registro diario
-                registros_diarios.append({
-                    "fecha": fecha_actual,
-                    "estatus": estatus,
-                    "hora_registro": hora_registro
-                })
-            
-            fecha_actual += timedelta(days=1)
-        
-        resultados.append({
-            "id": trabajador.id,
-            "nombre": f"{trabajador.nombre} {trabajador.apellidoPaterno} {trabajador.apellidoMaterno}",
-            "rfc": trabajador.rfc,
-            "departamento": departamento_nombre,
-            "puesto": trabajador.puesto,
-            "estadisticas": {
-                "dias_laborables": dias_laborables,
-                "asistencias": asistencias_count,
-                "retardos": retardos_count,
-                "faltas": faltas_count,
-                "justificados": justificados_count,
-                "no_registrados": dias_laborables - (asistencias_count + retardos_count + faltas_count + justificados_count),
-                "porcentaje_asistencia": (asistencias_count / dias_laborables) * 100 if dias_laborables > 0 else 0
-            },
-            "registros_diarios": registros_diarios
+        registros_diarios.append({
+            "fecha": fecha_actual.isoformat(),
+            "dia_semana": DIAS_SEMANA[fecha_actual.weekday()],
+            "hora_entrada": hora_entrada_str,
+            "hora_salida": hora_salida_str,
+            "estatus": estatus_dia,
+            "observaciones": None,
+            "justificacion": justificacion
         })
     
+    return registros_diarios
+
+def resumir_retardos_faltas(matriz: MatrizAsistencia, indice: int, detalle: bool = True) -> Dict[str, Any]:
+    """
+    Arma asistencias, retardos y faltas de un trabajador en el período de la
+    matriz. Las estadísticas ya están calculadas para todos los trabajadores.
+    
+    Args:
+        matriz (MatrizAsistencia): Matriz de asistencia del período
+        indice (int): Índice del trabajador en la matriz
+        detalle (bool): Incluir los registros diarios
+    
+    Returns:
+        Dict[str, Any]: Datos del trabajador, estadísticas y (con detalle) registros diarios
+    """
+    trabajador = matriz.trabajadores[indice]
+    estadisticas = matriz.estadisticas_retardos_faltas
+    
+    dias_laborables = estadisticas["dias_laborables"]
+    porcentaje_asistencia = 0
+    if dias_laborables > 0:
+        porcentaje_asistencia = round(float(estadisticas["porcentaje_asistencia"][indice]), 2)
+    
+    resumen = {
+        "id": trabajador.id,
+        "nombre": f"{trabajador.nombre} {trabajador.apellidoPaterno} {trabajador.apellidoMaterno}".strip(),
+        "rfc": trabajador.rfc,
+        "departamento": matriz.datos.nombre_departamento(trabajador),
+        "puesto": trabajador.puesto,
+        "telefono": "",
+        "email": trabajador.correo,
+        "estadisticas": {
+            "dias_laborables": dias_laborables,
+            "asistencias": int(estadisticas["asistencias"][indice]),
+            "retardos": int(estadisticas["retardos"][indice]),
+            "retardos_menores": int(estadisticas["retardos_menores"][indice]),
+            "retardos_mayores": int(estadisticas["retardos_mayores"][indice]),
+            "faltas": int(estadisticas["faltas"][indice]),
+            "porcentaje_asistencia": porcentaje_asistencia
+        }
+    }
+    
+    if detalle:
+        resumen["registros_diarios"] = registros_diarios_retardos_faltas(matriz, indice)
+    
+    return resumen
+
+def generar_reporte_asistencias_por_periodo(
+    db: Session,
+    fecha_inicio: date,
+    fecha_fin: date,
+    departamento_id: Optional[int] = None,
+    trabajador_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Genera un reporte de asistencias para un período determinado.
+    
+    Args:
+        db (Session): Sesión de la base de datos
+        fecha_inicio (date): Fecha de inicio del período
+        fecha_fin (date): Fecha de fin del período
+        departamento_id (Optional[int]): ID del departamento (opcional)
+        trabajador_id (Optional[int]): ID del trabajador (opcional)
+    
+    Returns:
+        Dict[str, Any]: Diccionario con los resultados del reporte
+    """
+    # Cargar trabajadores, registros, justificaciones y días festivos del período en bloque
+    datos = cargar_datos_reporte(
+        db,
+        fecha_inicio,
+        fecha_fin,
+        departamento_id=departamento_id,
+        trabajador_id=trabajador_id,
+        desde_resumen=settings.RESUMEN_DIARIO_ACTIVO
+    )
+    dias_festivos = datos.dias_festivos
+    
+    # Estadísticas de todos los trabajadores sobre la matriz del período
+    matriz = MatrizAsistencia(datos)
+    resultados = [resumir_trabajador(matriz, i) for i in range(len(matriz.trabajadores))]
+    
     return {
         "periodo": {
             "fecha_inicio": fecha_inicio,
@@ -164,51 +243,130 @@ def generar_reporte_asistencias_por_periodo(
         "trabajadores": resultados
     }
 
-def generar_reporte_asistencias_diarias(
+def generar_reporte_retardos_faltas(
     db: Session,
-    fecha: date,
-    departamento_id: Optional[int] = None
+    fecha_inicio: date,
+    fecha_fin: date,
+    departamento_id: Optional[int] = None,
+    trabajador_id: Optional[int] = None,
+    detalle: bool = True
 ) -> Dict[str, Any]:
     """
-    Genera un reporte de asistencias para un día específico.
+    Genera el reporte de retardos y faltas de un período, con los trabajadores
+    ordenados de más a menos faltas y retardos.
     
     Args:
         db (Session): Sesión de la base de datos
-        fecha (date): Fecha del reporte
+        fecha_inicio (date): Fecha de inicio del período
+        fecha_fin (date): Fecha de fin del período
         departamento_id (Optional[int]): ID del departamento (opcional)
+        trabajador_id (Optional[int]): ID del trabajador (opcional)
+        detalle (bool): Incluir los registros diarios de cada trabajador;
+            sin detalle solo se calculan las estadísticas y el resumen
     
     Returns:
         Dict[str, Any]: Diccionario con los resultados del reporte
     """
-    # Definir el rango de fechas para el día
-    fecha_inicio = datetime.combine(fecha, time.min)
-    fecha_fin = datetime.combine(fecha, time.max)
+    trabajadores_data = None
     
-    # Consulta base para obtener trabajadores
-    query_trabajadores = db.query(Trabajador)
+    # Reportes de toda la institución: repartir los trabajadores entre procesos
+    if trabajador_id is None and settings.PROCESOS_REPORTES > 1:
+        from app.services.reporte_paralelo import retardos_faltas_en_paralelo
+        trabajadores_data = retardos_faltas_en_paralelo(db, fecha_inicio, fecha_fin, departamento_id, detalle)
     
-    # Filtrar por departamento si se proporciona
-    if departamento_id:
-        query_trabajadores = query_trabajadores.filter(Trabajador.departamento == departamento_id)
+    if trabajadores_data is None:
+        # Cargar trabajadores, registros y justificaciones del período en bloque
+        datos = cargar_datos_reporte(
+            db,
+            fecha_inicio,
+            fecha_fin,
+            departamento_id=departamento_id,
+            trabajador_id=trabajador_id,
+            desde_resumen=settings.RESUMEN_DIARIO_ACTIVO
+        )
+        print(f"🔍 DEBUG: Encontrados {len(datos.trabajadores)} trabajadores activos")
+        
+        # Agregar datos de todos los trabajadores (incluso si no tienen retardos/faltas para ver todos),
+        # ordenados por faltas y retardos (los peores primero)
+        matriz = MatrizAsistencia(datos)
+        trabajadores_data = [
+            resumir_retardos_faltas(matriz, i, detalle=detalle) for i in matriz.ranking_retardos_faltas()
+        ]
     
-    # Filtrar solo trabajadores activos
-    query_trabajadores = query_trabajadores.filter(Trabajador.estado == True)
+    print(f"✅ DEBUG: Reporte generado con {len(trabajadores_data)} trabajadores")
     
-    # Obtener todos los trabajadores que cumplen con los criterios
-    trabajadores = query_trabajadores.all()
+    # Calcular resumen
+    return {
+        "fecha_inicio": fecha_inicio.isoformat(),
+        "fecha_fin": fecha_fin.isoformat(),
+        "trabajadores": trabajadores_data,
+        "resumen": {
+            "total_trabajadores": len(trabajadores_data),
+            "total_retardos": sum(t["estadisticas"]["retardos"] for t in trabajadores_data),
+            "total_faltas": sum(t["estadisticas"]["faltas"] for t in trabajadores_data),
+            "promedio_asistencia": round(
+                sum(t["estadisticas"]["porcentaje_asistencia"] for t in trabajadores_data) / len(trabajadores_data),
+                2
+            ) if trabajadores_data else 0
+        }
+    }
+
+def generar_detalle_retardos_faltas(
+    db: Session,
+    fecha_inicio: date,
+    fecha_fin: date,
+    trabajador_id: int
+) -> Optional[Dict[str, Any]]:
+    """
+    Genera el detalle diario de retardos y faltas de un solo trabajador, para
+    consultarlo bajo demanda desde el reporte en modo resumen.
     
-    # Verificar si es día festivo
-    dia_festivo = db.query(DiaFestivo).filter(
-        cast(DiaFestivo.fecha, Date) == fecha
-    ).first()
+    Args:
+        db (Session): Sesión de la base de datos
+        fecha_inicio (date): Fecha de inicio del período
+        fecha_fin (date): Fecha de fin del período
+        trabajador_id (int): ID del trabajador
+    
+    Returns:
+        Optional[Dict[str, Any]]: Datos del trabajador con estadísticas y registros
+            diarios, o None si el trabajador no existe o no está activo
+    """
+    datos = cargar_datos_reporte(
+        db,
+        fecha_inicio,
+        fecha_fin,
+        trabajador_id=trabajador_id,
+        desde_resumen=settings.RESUMEN_DIARIO_ACTIVO
+    )
+    if not datos.trabajadores:
+        return None
     
+    return {
+        "fecha_inicio": fecha_inicio.isoformat(),
+        "fecha_fin": fecha_fin.isoformat(),
+        "trabajador": resumir_retardos_faltas(MatrizAsistencia(datos), 0)
+    }
+
+def generar_reporte_asistencias_diarias(
+    db: Session,
+    fecha: date,
+    departamento_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Genera un reporte de asistencias para un día específico.
+    
+    Args:
+        db (Session): Sesión de la base de datos
+        fecha (date): Fecha del reporte
+        departamento_id (Optional[int]): ID del departamento (opcional)
+    
+    Returns:
+        Dict[str, Any]: Diccionario con los resultados del reporte
+    """
     # Verificar si es fin de semana (5 = sábado, 6 = domingo)
     es_fin_semana = fecha.weekday() >= 5
     
-    # Construir el diccionario de resultados
-    resultados = []
-    
-    # Si es fin de semana o día festivo, devolver la información
+    # Si es fin de semana, no hace falta consultar la base de datos
     if es_fin_semana:
         return {
             "fecha": fecha,
@@ -217,6 +375,12 @@ def generar_reporte_asistencias_diarias(
             "trabajadores": []
         }
     
+    # Cargar trabajadores, registros, justificaciones y días festivos del día en bloque
+    datos = cargar_datos_reporte(db, fecha, fecha, departamento_id=departamento_id)
+    
+    # Verificar si es día festivo
+    dia_festivo = datos.dias_festivos[0] if datos.dias_festivos else None
+    
     if dia_festivo:
         return {
             "fecha": fecha,
@@ -225,20 +389,14 @@ def generar_reporte_asistencias_diarias(
             "trabajadores": []
         }
     
-    for trabajador in trabajadores:
-        # Buscar registro de asistencia para este trabajador en la fecha indicada
-        asistencia = db.query(RegistroAsistencia).filter(
-            RegistroAsistencia.id_empleado == trabajador.id,
-            RegistroAsistencia.fecha >= fecha_inicio,
-            RegistroAsistencia.fecha <= fecha_fin
-        ).first()
-        
-        # Buscar justificación para este trabajador en la fecha indicada
-        justificacion = db.query(Justificacion).filter(
-            Justificacion.id_empleado == trabajador.id,
-            Justificacion.fecha >= fecha_inicio,
-            Justificacion.fecha <= fecha_fin
-        ).first()
+    # Construir el diccionario de resultados
+    resultados = []
+    
+    for trabajador in datos.trabajadores:
+        # Registro de asistencia y justificación del trabajador en la fecha indicada
+        registros = datos.registros_del_dia(trabajador.id, fecha)
+        asistencia = registros[0] if registros else None
+        justificacion, _ = datos.justificacion_del_dia(trabajador.id, fecha)
         
         # Determinar el estatus
         estatus = "NO_REGISTRADO"
@@ -251,15 +409,11 @@ def generar_reporte_asistencias_diarias(
             estatus = "JUSTIFICADO"
             hora_registro = justificacion.fecha
         
-        # Obtener el nombre del departamento
-        departamento = db.query(Departamento).filter(Departamento.id == trabajador.departamento).first()
-        departamento_nombre = departamento.descripcion if departamento else "Sin departamento"
-        
         resultados.append({
             "id": trabajador.id,
             "nombre": f"{trabajador.nombre} {trabajador.apellidoPaterno} {trabajador.apellidoMaterno}",
             "rfc": trabajador.rfc,
-            "departamento": departamento_nombre,
+            "departamento": datos.nombre_departamento(trabajador),
             "puesto": trabajador.puesto,
             "estatus": estatus,
             "hora_registro": hora_registro
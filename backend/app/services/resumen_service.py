@@ -0,0 +1,90 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from datetime import date, timedelta
+from typing import Optional, List
+from app.config import settings
+from app.models.models import RegistroAsistencia, Justificacion, ResumenDiario
+from app.services.datos_reporte import filas_resumen_rango
+
+# Días que se reconstruyen por bloque (cada bloque se confirma por separado)
+DIAS_POR_BLOQUE = 31
+
+
+def actualizar_resumen_rango(db: Session, trabajador_ids: List[int], fecha_inicio: date, fecha_fin: date, filas: list) -> None:
+    """
+    Reemplaza las filas de resumen_diario de varios trabajadores en un rango de
+    días por las ya resueltas (filas_resumen_rango). Se llama desde
+    actualizar_derivados_rango, antes del commit.
+    """
+    if not settings.RESUMEN_DIARIO_ACTIVO or not trabajador_ids:
+        return
+
+    db.query(ResumenDiario).filter(
+        ResumenDiario.id_trabajador.in_(trabajador_ids),
+        ResumenDiario.fecha >= fecha_inicio,
+        ResumenDiario.fecha <= fecha_fin
+    ).delete(synchronize_session=False)
+    if filas:
+        db.bulk_insert_mappings(ResumenDiario, filas)
+
+
+def reconstruir_resumen(
+    db: Session,
+    fecha_inicio: Optional[date] = None,
+    fecha_fin: Optional[date] = None,
+    trabajador_id: Optional[int] = None
+) -> int:
+    """
+    Reconstruye resumen_diario desde los registros y las justificaciones,
+    por bloques de días. Sin fechas abarca todo el historial.
+
+    Args:
+        db (Session): Sesión de la base de datos
+        fecha_inicio (Optional[date]): Primer día a reconstruir (opcional)
+        fecha_fin (Optional[date]): Último día a reconstruir (opcional)
+        trabajador_id (Optional[int]): ID del trabajador (opcional)
+
+    Returns:
+        int: Número de filas escritas
+    """
+    if fecha_inicio is None or fecha_fin is None:
+        minimo_registros, maximo_registros = db.query(
+            func.min(RegistroAsistencia.fecha), func.max(RegistroAsistencia.fecha)
+        ).one()
+        fin_justificacion = Justificacion.fecha
+        if settings.JUSTIFICACIONES_POR_PERIODO_ACTIVO:
+            fin_justificacion = func.coalesce(Justificacion.fecha_fin, Justificacion.fecha)
+        minimo_justificaciones, maximo_justificaciones = db.query(
+            func.min(Justificacion.fecha), func.max(fin_justificacion)
+        ).one()
+        minimos = [f for f in (minimo_registros, minimo_justificaciones) if f is not None]
+        maximos = [f for f in (maximo_registros, maximo_justificaciones) if f is not None]
+        if not minimos:
+            return 0
+        fecha_inicio = fecha_inicio or min(minimos).date()
+        fecha_fin = fecha_fin or max(maximos).date()
+
+    total = 0
+    bloque_inicio = fecha_inicio
+    while bloque_inicio <= fecha_fin:
+        bloque_fin = min(bloque_inicio + timedelta(days=DIAS_POR_BLOQUE - 1), fecha_fin)
+        query_resumen = db.query(ResumenDiario).filter(
+            ResumenDiario.fecha >= bloque_inicio,
+            ResumenDiario.fecha <= bloque_fin
+        )
+        if trabajador_id:
+            query_resumen = query_resumen.filter(ResumenDiario.id_trabajador == trabajador_id)
+
+        filas = filas_resumen_rango(db, bloque_inicio, bloque_fin, [trabajador_id] if trabajador_id else None)
+
+        query_resumen.delete(synchronize_session=False)
+        if filas:
+            db.bulk_insert_mappings(ResumenDiario, filas)
+        db.commit()
+        db.expunge_all()
+
+        total += len(filas)
+        print(f"📊 Resumen {bloque_inicio} a {bloque_fin}: {len(filas)} filas")
+        bloque_inicio = bloque_fin + timedelta(days=1)
+
+    return total
@@ -0,0 +1,96 @@
+from typing import Optional, List, Tuple, Dict, Any
+from sqlalchemy.orm import joinedload, load_only
+from app.models.models import Trabajador
+from app.schemas.schemas import TrabajadorOut
+
+# Relaciones que se pueden incluir y las columnas que se cargan de cada una
+# (las mismas que exponen los schemas anidados de TrabajadorOut)
+RELACIONES_TRABAJADOR = {
+    "tipo_trabajador": (Trabajador.tipo_trabajador, ["id", "descripcion"]),
+    "departamento_rel": (Trabajador.departamento_rel, ["id", "descripcion"]),
+    "horario_rel": (Trabajador.horario_rel, ["id", "descripcion"]),
+    "centro_trabajo_rel": (Trabajador.centro_trabajo_rel, ["id", "plantel", "ubicacion"]),
+    "grado_estudios_rel": (Trabajador.grado_estudios_rel, ["id", "descripcion"]),
+    "rol_rel": (Trabajador.rol_rel, ["id", "descripcion"]),
+}
+
+# Campos escalares de TrabajadorOut (sin relaciones)
+CAMPOS_TRABAJADOR = [
+    campo for campo in TrabajadorOut.model_fields if campo not in RELACIONES_TRABAJADOR
+]
+
+
+def _separar_lista(valor: Optional[str]) -> List[str]:
+    if not valor:
+        return []
+    return [parte.strip() for parte in valor.split(",") if parte.strip()]
+
+
+def parsear_campos(fields: Optional[str], include: Optional[str]) -> Tuple[List[str], List[str]]:
+    """
+    Interpreta los parámetros fields= e include= (listas separadas por comas).
+
+    Args:
+        fields (Optional[str]): Campos escalares solicitados (por defecto, todos)
+        include (Optional[str]): Relaciones a incluir (por defecto, ninguna)
+
+    Returns:
+        Tuple[List[str], List[str]]: Campos y relaciones a cargar
+
+    Raises:
+        ValueError: Si se solicita un campo o una relación que no existe
+    """
+    campos = _separar_lista(fields) or list(CAMPOS_TRABAJADOR)
+    relaciones = _separar_lista(include)
+
+    desconocidos = [c for c in campos if c not in CAMPOS_TRABAJADOR]
+    if desconocidos:
+        raise ValueError(f"Campos no válidos: {', '.join(desconocidos)}")
+
+    desconocidas = [r for r in relaciones if r not in RELACIONES_TRABAJADOR]
+    if desconocidas:
+        raise ValueError(f"Relaciones no válidas: {', '.join(desconocidas)}")
+
+    # El ID siempre se incluye (lo necesitan la paginación y el cliente)
+    if "id" not in campos:
+        campos.insert(0, "id")
+
+    return campos, relaciones
+
+
+def opciones_carga(campos: Optional[List[str]] = None, relaciones: Optional[List[str]] = None) -> list:
+    """
+    Construye las opciones de carga para cargar de la BD solo las columnas y
+    relaciones solicitadas. Sin argumentos carga todo lo que expone TrabajadorOut,
+    pero sin las columnas pesadas (huella, logo del centro de trabajo, etc.).
+    """
+    if campos is None:
+        campos = CAMPOS_TRABAJADOR
+    if relaciones is None:
+        relaciones = list(RELACIONES_TRABAJADOR)
+
+    opciones = [load_only(*[getattr(Trabajador, campo) for campo in campos])]
+
+    for nombre in relaciones:
+        relacion, columnas = RELACIONES_TRABAJADOR[nombre]
+        modelo = relacion.property.mapper.class_
+        opciones.append(
+            joinedload(relacion).load_only(*[getattr(modelo, columna) for columna in columnas])
+        )
+
+    return opciones
+
+
+def serializar_trabajador(trabajador: Trabajador, campos: List[str], relaciones: List[str]) -> Dict[str, Any]:
+    """Construye la representación parcial de un trabajador con los campos solicitados"""
+    resultado = {campo: getattr(trabajador, campo) for campo in campos}
+
+    for nombre in relaciones:
+        _, columnas = RELACIONES_TRABAJADOR[nombre]
+        relacionado = getattr(trabajador, nombre)
+        resultado[nombre] = (
+            {columna: getattr(relacionado, columna) for columna in columnas}
+            if relacionado is not None else None
+        )
+
+    return resultado
@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, Future
+from datetime import datetime, date
+from typing import Optional, Dict, Any
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.services.reporte_sevice import generar_reporte_asistencias_por_periodo, generar_reporte_retardos_faltas
+from app.services.exportacion_service import generar_csv_reporte, generar_xlsx_reporte
+from app.utils.helpers import serializar_json
+
+# Trabajos de reportes en segundo plano. Cada trabajo se ejecuta en un pool de
+# procesos acotado (settings.PROCESOS_TRABAJOS) y deja en DIRECTORIO_TRABAJOS
+# dos archivos: <id>.json con el estado y el avance, y <id>.<formato> con el
+# resultado. El estado se escribe siempre de forma atómica (archivo temporal +
+# os.replace), así que cualquier proceso de la API puede leerlo.
+
+EXTENSIONES = {"json": "json", "csv": "csv", "xlsx": "xlsx"}
+
+ESTADOS_ACTIVOS = ("pendiente", "ejecutando")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+_futuros: Dict[str, Future] = {}
+_pendientes: Dict[str, str] = {}  # clave de los parámetros -> id del trabajo
+
+
+def _ruta_estado(id_trabajo: str) -> str:
+    return os.path.join(settings.DIRECTORIO_TRABAJOS, f"{id_trabajo}.json")
+
+
+def _ruta_resultado(id_trabajo: str, formato: str) -> str:
+    return os.path.join(settings.DIRECTORIO_TRABAJOS, f"{id_trabajo}.resultado.{EXTENSIONES[formato]}")
+
+
+def _id_valido(id_trabajo: str) -> bool:
+    return len(id_trabajo) == 32 and all(c in "0123456789abcdef" for c in id_trabajo)
+
+
+def _escribir_estado(estado: Dict[str, Any]) -> None:
+    ruta = _ruta_estado(estado["id"])
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        archivo.write(serializar_json(estado))
+    os.replace(temporal, ruta)
+
+
+def _leer_estado(id_trabajo: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_ruta_estado(id_trabajo), encoding="utf-8") as archivo:
+            return json.load(archivo)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _inicializar_proceso() -> None:
+    # Las conexiones heredadas del proceso padre no se pueden compartir
+    engine.dispose(close=False)
+    # Cada trabajo ya ocupa un proceso: sin un pool de reportes por trabajo
+    from app.services import reporte_paralelo
+    reporte_paralelo.usar_pool = False
+
+
+def _obtener_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=max(1, settings.PROCESOS_TRABAJOS),
+            initializer=_inicializar_proceso
+        )
+    return _pool
+
+
+def _ejecutar_trabajo(id_trabajo: str, tipo: str, formato: str, parametros: Dict[str, Any]) -> None:
+    """Ejecuta un trabajo dentro de un proceso del pool y guarda su resultado"""
+    estado = _leer_estado(id_trabajo)
+    estado.update(estado="ejecutando", iniciado=datetime.now())
+    _escribir_estado(estado)
+
+    fecha_inicio = date.fromisoformat(parametros["fecha_inicio"])
+    fecha_fin = date.fromisoformat(parametros["fecha_fin"])
+    departamento_id = parametros.get("departamento_id")
+    trabajador_id = parametros.get("trabajador_id")
+
+    ruta = _ruta_resultado(id_trabajo, formato)
+    temporal = f"{ruta}.tmp"
+
+    def al_avanzar(procesados: int, total: int) -> None:
+        estado.update(procesados=procesados, total=total)
+        _escribir_estado(estado)
+
+    try:
+        if formato == "json":
+            db = SessionLocal()
+            try:
+                if tipo == "retardos-faltas":
+                    resultado = generar_reporte_retardos_faltas(
+                        db, fecha_inicio, fecha_fin, departamento_id, trabajador_id
+                    )
+                else:
+                    resultado = generar_reporte_asistencias_por_periodo(
+                        db, fecha_inicio, fecha_fin, departamento_id, trabajador_id
+                    )
+            finally:
+                db.close()
+
+            with open(temporal, "w", encoding="utf-8") as archivo:
+                archivo.write(serializar_json(resultado))
+            estado.update(procesados=len(resultado["trabajadores"]), total=len(resultado["trabajadores"]))
+        elif formato == "csv":
+            with open(temporal, "w", encoding="utf-8", newline="") as archivo:
+                for fragmento in generar_csv_reporte(
+                    fecha_inicio, fecha_fin, departamento_id, tipo=tipo, al_avanzar=al_avanzar
+                ):
+                    archivo.write(fragmento)
+        else:
+            with open(temporal, "wb") as archivo:
+                for fragmento in generar_xlsx_reporte(
+                    fecha_inicio, fecha_fin, departamento_id, tipo=tipo, al_avanzar=al_avanzar
+                ):
+                    archivo.write(fragmento)
+
+        os.replace(temporal, ruta)
+        estado.update(estado="terminado", terminado=datetime.now())
+        _escribir_estado(estado)
+    except Exception as e:
+        print(f"❌ Error en el trabajo {id_trabajo}: {str(e)}")
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        estado.update(estado="error", error=str(e), terminado=datetime.now())
+        _escribir_estado(estado)
+
+
+def _limpiar_trabajos_vencidos() -> None:
+    """Borra los archivos de trabajos terminados hace más de HORAS_RETENCION_TRABAJOS"""
+    limite = time.time() - settings.HORAS_RETENCION_TRABAJOS * 3600
+    for nombre in os.listdir(settings.DIRECTORIO_TRABAJOS):
+        if nombre.split(".", 1)[0] in _futuros:
+            continue
+        ruta = os.path.join(settings.DIRECTORIO_TRABAJOS, nombre)
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+        except OSError:
+            pass
+
+
+def _al_terminar(clave: str, id_trabajo: str):
+    def callback(futuro: Future) -> None:
+        with _lock:
+            _futuros.pop(id_trabajo, None)
+            if _pendientes.get(clave) == id_trabajo:
+                del _pendientes[clave]
+        error = futuro.exception()
+        if error is not None:
+            # El proceso murió antes de poder registrar el error
+            estado = _leer_estado(id_trabajo)
+            if estado and estado["estado"] in ESTADOS_ACTIVOS:
+                estado.update(estado="error", error=str(error), terminado=datetime.now())
+                _escribir_estado(estado)
+    return callback
+
+
+def enviar_trabajo(tipo: str, formato: str, parametros: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Encola un trabajo de reporte. Si ya hay un trabajo pendiente o en ejecución
+    con el mismo tipo, formato y parámetros, devuelve ese en lugar de crear otro.
+
+    Args:
+        tipo (str): Tipo de reporte ("asistencias" o "retardos-faltas")
+        formato (str): Formato del resultado ("json", "csv" o "xlsx")
+        parametros (Dict[str, Any]): fecha_inicio, fecha_fin (ISO), departamento_id y trabajador_id
+
+    Returns:
+        Dict[str, Any]: Estado del trabajo
+    """
+    os.makedirs(settings.DIRECTORIO_TRABAJOS, exist_ok=True)
+    clave = hashlib.sha256(
+        serializar_json([tipo, formato, sorted(parametros.items())]).encode("utf-8")
+    ).hexdigest()
+
+    with _lock:
+        _limpiar_trabajos_vencidos()
+
+        id_existente = _pendientes.get(clave)
+        if id_existente:
+            estado = _leer_estado(id_existente)
+            if estado and estado["estado"] in ESTADOS_ACTIVOS:
+                return estado
+
+        id_trabajo = uuid.uuid4().hex
+        estado = {
+            "id": id_trabajo,
+            "tipo": tipo,
+            "formato": formato,
+            "estado": "pendiente",
+            "parametros": parametros,
+            "procesados": 0,
+            "total": None,
+            "creado": datetime.now(),
+            "iniciado": None,
+            "terminado": None,
+            "error": None,
+            "pid_servidor": os.getpid()
+        }
+        _escribir_estado(estado)
+
+        futuro = _obtener_pool().submit(_ejecutar_trabajo, id_trabajo, tipo, formato, parametros)
+        _futuros[id_trabajo] = futuro
+        _pendientes[clave] = id_trabajo
+
+    futuro.add_done_callback(_al_terminar(clave, id_trabajo))
+    print(f"📋 Trabajo {id_trabajo} encolado: {tipo} ({formato}) {parametros}")
+    return _leer_estado(id_trabajo)
+
+
+def _proceso_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def obtener_trabajo(id_trabajo: str) -> Optional[Dict[str, Any]]:
+    """
+    Devuelve el estado de un trabajo, o None si no existe. Un trabajo activo
+    cuyo proceso de la API ya no lo tiene en su pool (por un reinicio) se
+    reporta como interrumpido.
+    """
+    if not _id_valido(id_trabajo):
+        return None
+
+    estado = _leer_estado(id_trabajo)
+    if estado is None:
+        return None
+
+    if estado["estado"] in ESTADOS_ACTIVOS:
+        pid = estado.get("pid_servidor")
+        if pid == os.getpid():
+            perdido = id_trabajo not in _futuros
+        else:
+            perdido = pid is None or not _proceso_vivo(pid)
+        if perdido:
+            estado["estado"] = "interrumpido"
+
+    return estado
+
+
+def ruta_archivo(estado: Dict[str, Any]) -> Optional[str]:
+    """Ruta del archivo generado por un trabajo terminado, si todavía existe"""
+    if estado["estado"] != "terminado":
+        return None
+    ruta = _ruta_resultado(estado["id"], estado["formato"])
+    return ruta if os.path.exists(ruta) else None
@@ -0,0 +1,124 @@
+import base64
+import json
+from datetime import date, datetime, time
+from sqlalchemy import and_, or_, func, text, DateTime, Date
+
+# Filas que cuenta a lo más estimar_total con filtros
+TOPE_TOTAL_ESTIMADO = 10000
+
+
+def _json_default(obj):
+    """Serializa los tipos de fecha que json no soporta de forma nativa"""
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def serializar_json(obj) -> str:
+    """Convierte un objeto a JSON compacto, soportando fechas y horas"""
+    return json.dumps(obj, default=_json_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def codificar_cursor(datos: dict) -> str:
+    """
+    Codifica un diccionario como cursor opaco (base64 url-safe sin padding)
+    """
+    crudo = serializar_json(datos).encode("utf-8")
+    return base64.urlsafe_b64encode(crudo).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> dict:
+    """
+    Decodifica un cursor generado por codificar_cursor.
+    Lanza ValueError si el cursor no es válido.
+    """
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+    if not isinstance(datos, dict):
+        raise ValueError("Cursor inválido")
+
+    return datos
+
+
+def _valor_desde_cursor(columna, valor):
+    """Restaura el tipo Python de un valor de clave guardado en un cursor"""
+    if valor is None:
+        return None
+    tipo = columna.expression.type
+    if isinstance(tipo, DateTime):
+        return datetime.fromisoformat(valor)
+    if isinstance(tipo, Date):
+        return date.fromisoformat(valor)
+    return valor
+
+
+def _condicion_keyset(columnas, valores, descendente: bool):
+    """
+    Construye la condición "(c1, c2, ...) > (v1, v2, ...)" (o "<" si es descendente)
+    de forma compatible con cualquier motor
+    """
+    condiciones = []
+    for i, columna in enumerate(columnas):
+        iguales = [columnas[j] == valores[j] for j in range(i)]
+        siguiente = columna < valores[i] if descendente else columna > valores[i]
+        condiciones.append(and_(*iguales, siguiente))
+    return or_(*condiciones)
+
+
+def paginar_por_cursor(query, columnas, cursor, limite: int, clave, descendente: bool = False):
+    """
+    Aplica paginación por cursor (keyset) a una consulta.
+
+    Args:
+        query: Consulta de SQLAlchemy ya filtrada
+        columnas: Columnas que forman la clave de ordenamiento (la última debe ser única)
+        cursor: Cursor opaco devuelto por la página anterior, o None para la primera
+        limite: Número máximo de elementos por página
+        clave: Función que recibe una fila y devuelve la tupla de valores de la clave
+        descendente: Si el orden es descendente
+
+    Returns:
+        Tupla (elementos, siguiente_cursor); siguiente_cursor es None en la última página
+    """
+    if cursor:
+        valores = decodificar_cursor(cursor).get("k")
+        if not isinstance(valores, list) or len(valores) != len(columnas):
+            raise ValueError("Cursor inválido")
+        valores = [_valor_desde_cursor(c, v) for c, v in zip(columnas, valores)]
+        query = query.filter(_condicion_keyset(columnas, valores, descendente))
+
+    orden = [c.desc() if descendente else c.asc() for c in columnas]
+    filas = query.order_by(None).order_by(*orden).limit(limite + 1).all()
+
+    siguiente_cursor = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente_cursor = codificar_cursor({"k": list(clave(filas[-1]))})
+
+    return filas, siguiente_cursor
+
+
+def estimar_total(db, query, tabla: str, tope: int = TOPE_TOTAL_ESTIMADO) -> int:
+    """
+    Estima el total de filas de una consulta paginada.
+    Sin filtros usa la estadística de InnoDB (no recorre la tabla);
+    con filtros cuenta a lo más `tope` filas, así que un filtro que abarca
+    más devuelve `tope` en lugar de recorrer todo el rango.
+    """
+    if query.whereclause is None:
+        estimado = db.execute(
+            text(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :tabla"
+            ),
+            {"tabla": tabla}
+        ).scalar()
+        if estimado is not None:
+            return int(estimado)
+
+    subconsulta = query.order_by(None).limit(tope).subquery(with_labels=True)
+    return db.query(func.count()).select_from(subconsulta).scalar()
@@ -0,0 +1,204 @@
+import re
+import zipfile
+from datetime import date, datetime, time
+from typing import List, Any, Iterable
+from xml.sax.saxutils import escape
+
+# Escritor mínimo de archivos XLSX en streaming, solo con la biblioteca estándar.
+# Cada hoja se escribe fila por fila directamente en el zip (sin tabla de
+# cadenas compartidas, con cadenas en línea), así que la memoria no depende
+# del tamaño del libro. El zip puede escribirse en una salida que no admite
+# seek (por ejemplo, el cuerpo de una respuesta en streaming).
+
+_CARACTERES_INVALIDOS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_CARACTERES_HOJA = re.compile(r"[\[\]:*?/\\]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{hojas}'
+    '</Types>'
+)
+
+_CONTENT_TYPE_HOJA = (
+    '<Override PartName="/xl/worksheets/sheet{n}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{hojas}</sheets>'
+    '</workbook>'
+)
+
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{hojas}'
+    '<Relationship Id="rIdEstilos" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Estilo 0: normal; estilo 1: negritas (encabezados)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+_INICIO_HOJA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+
+_FIN_HOJA = '</sheetData></worksheet>'
+
+
+def letra_columna(indice: int) -> str:
+    """Convierte un índice de columna (0 = A) a su letra de Excel"""
+    letras = ""
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(65 + resto) + letras
+    return letras
+
+
+def nombre_hoja_valido(nombre: str, usados: Iterable[str]) -> str:
+    """Ajusta un nombre a las reglas de Excel (31 caracteres, sin []:*?/\\) y lo hace único"""
+    base = _CARACTERES_HOJA.sub(" ", str(nombre or "")).strip().strip("'")[:31] or "Hoja"
+    usados = {u.lower() for u in usados}
+    candidato = base
+    n = 2
+    while candidato.lower() in usados:
+        sufijo = f" ({n})"
+        candidato = base[:31 - len(sufijo)] + sufijo
+        n += 1
+    return candidato
+
+
+class EscritorXlsx:
+    """
+    Escribe un libro XLSX en streaming sobre una salida binaria.
+
+    Uso: nueva_hoja(), escribir_fila() tantas veces como filas, y cerrar() al
+    final. Solo hay una hoja abierta a la vez; las hojas se escriben en orden.
+    """
+
+    def __init__(self, salida):
+        self._zip = zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED)
+        self._hojas = []
+        self._hoja = None
+        self._fila = 0
+
+    def nueva_hoja(self, nombre: str) -> str:
+        """Cierra la hoja actual y abre una nueva; devuelve el nombre final de la hoja"""
+        self._cerrar_hoja()
+        nombre = nombre_hoja_valido(nombre, self._hojas)
+        self._hojas.append(nombre)
+        self._hoja = self._zip.open(f"xl/worksheets/sheet{len(self._hojas)}.xml", "w", force_zip64=True)
+        self._hoja.write(_INICIO_HOJA.encode("utf-8"))
+        self._fila = 0
+        return nombre
+
+    def escribir_fila(self, valores: List[Any], estilo: int = 0) -> None:
+        """Agrega una fila a la hoja actual (estilo 1 = negritas)"""
+        self._fila += 1
+        atributo_estilo = f' s="{estilo}"' if estilo else ""
+        celdas = []
+        for i, valor in enumerate(valores):
+            if valor is None or valor == "":
+                continue
+            referencia = f"{letra_columna(i)}{self._fila}"
+            if isinstance(valor, bool):
+                celdas.append(f'<c r="{referencia}" t="b"{atributo_estilo}><v>{int(valor)}</v></c>')
+            elif isinstance(valor, (int, float)):
+                celdas.append(f'<c r="{referencia}"{atributo_estilo}><v>{valor}</v></c>')
+            else:
+                if isinstance(valor, (datetime, date, time)):
+                    valor = valor.isoformat()
+                texto = escape(_CARACTERES_INVALIDOS.sub("", str(valor)))
+                celdas.append(
+                    f'<c r="{referencia}" t="inlineStr"{atributo_estilo}><is><t xml:space="preserve">{texto}</t></is></c>'
+                )
+        self._hoja.write(f'<row r="{self._fila}">{"".join(celdas)}</row>'.encode("utf-8"))
+
+    def _cerrar_hoja(self) -> None:
+        if self._hoja is not None:
+            self._hoja.write(_FIN_HOJA.encode("utf-8"))
+            self._hoja.close()
+            self._hoja = None
+
+    def cerrar(self) -> None:
+        """Cierra la última hoja y escribe las partes del libro"""
+        if not self._hojas:
+            self.nueva_hoja("Hoja")
+        self._cerrar_hoja()
+
+        hojas = range(1, len(self._hojas) + 1)
+        self._zip.writestr("[Content_Types].xml", _CONTENT_TYPES.format(
+            hojas="".join(_CONTENT_TYPE_HOJA.format(n=n) for n in hojas)
+        ))
+        self._zip.writestr("_rels/.rels", _RELS)
+        self._zip.writestr("xl/workbook.xml", _WORKBOOK.format(hojas="".join(
+            f'<sheet name="{escape(nombre, {chr(34): "&quot;"})}" sheetId="{n}" r:id="rId{n}"/>'
+            for n, nombre in zip(hojas, self._hojas)
+        )))
+        self._zip.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS.format(hojas="".join(
+            f'<Relationship Id="rId{n}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{n}.xml"/>'
+            for n in hojas
+        )))
+        self._zip.writestr("xl/styles.xml", _STYLES)
+        self._zip.close()
+
+
+class SalidaEnBloques:
+    """
+    Salida binaria sin seek que acumula lo escrito hasta que se vacía;
+    permite entregar el zip por partes desde un generador.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._tamano = 0
+
+    def write(self, datos) -> int:
+        self._partes.append(bytes(datos))
+        self._tamano += len(datos)
+        return len(datos)
+
+    def flush(self) -> None:
+        pass
+
+    def pendiente(self) -> int:
+        return self._tamano
+
+    def vaciar(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes = []
+        self._tamano = 0
+        return datos
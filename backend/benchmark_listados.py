@@ -0,0 +1,122 @@
+import sys
+import os
+import asyncio
+import time as reloj
+from datetime import datetime, timedelta
+from typing import List
+
+# Agregar el directorio de la aplicación al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, joinedload
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models.models import Base, RegistroAsistencia, Trabajador
+from app.schemas.schemas import RegistroAsistenciaOut, TrabajadorOut
+from app.services.proyeccion_service import proyectar_asistencias, proyectar_trabajadores
+
+# Compara la ruta actual de los listados (objetos ORM -> validación Pydantic ->
+# codificación de FastAPI) contra la proyección ligera (Core select -> JSON
+# precompilado) sobre páginas de 10,000 filas en una base SQLite en memoria.
+
+FILAS = 10_000
+REPETICIONES = 5
+
+def crear_datos(db):
+    """Crear trabajadores y registros de asistencia de prueba"""
+    ahora = datetime(2024, 1, 1, 8, 0)
+    db.bulk_insert_mappings(Trabajador, [
+        {
+            "id": i,
+            "apellidoPaterno": f"Paterno{i}",
+            "apellidoMaterno": f"Materno{i}",
+            "nombre": f"Nombre{i}",
+            "id_tipo": 1,
+            "departamento": 1 + i % 10,
+            "rfc": f"RFC{i:010d}",
+            "curp": f"CURP{i:014d}",
+            "fechaIngresoSep": ahora,
+            "fechaIngresoRama": ahora,
+            "fechaIngresoGobFed": ahora,
+            "puesto": "Docente",
+            "id_horario": 1,
+            "estado": True,
+            "id_centroTrabajo": 1,
+            "id_gradoEstudios": 1,
+            "titulo": "Licenciatura",
+            "cedula": "00000000",
+            "escuelaEgreso": "Universidad",
+            "turno": "MATUTINO",
+            "correo": f"trabajador{i}@sistema.com",
+            "huellaDigital": b"huella",
+            "id_rol": 2,
+        }
+        for i in range(1, FILAS + 1)
+    ])
+    db.bulk_insert_mappings(RegistroAsistencia, [
+        {
+            "id": i,
+            "id_trabajador": 1 + i % 500,
+            "fecha": ahora + timedelta(minutes=i),
+            "estatus": "ASISTENCIA" if i % 7 else "RETARDO_MENOR",
+        }
+        for i in range(1, FILAS + 1)
+    ])
+    db.commit()
+
+def ruta_actual(db, modelo, schema, opciones):
+    """Objetos ORM + response_model + JSONResponse, como lo hace FastAPI"""
+    db.expunge_all()
+    campo = create_response_field(name="Response", type_=List[schema])
+    objetos = db.query(modelo).options(*opciones).order_by(modelo.id).limit(FILAS).all()
+    contenido = asyncio.run(serialize_response(field=campo, response_content=objetos, is_coroutine=False))
+    return JSONResponse(contenido).body
+
+def ruta_ligera(db, modelo, proyectar):
+    """Core select de columnas + codificador precompilado"""
+    return proyectar(db, db.query(modelo).order_by(modelo.id).limit(FILAS))
+
+def medir(nombre, funcion):
+    mejor = None
+    for _ in range(REPETICIONES):
+        inicio = reloj.perf_counter()
+        cuerpo = funcion()
+        duracion = reloj.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    print(f"  {nombre:<10} {mejor * 1000:8.1f} ms  {FILAS / mejor:12,.0f} filas/s  {len(cuerpo):>10,} bytes")
+    return mejor
+
+def main():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    try:
+        crear_datos(db)
+
+        # Mismas relaciones que carga GET /trabajadores
+        opciones_trabajador = [
+            joinedload(Trabajador.tipo_trabajador),
+            joinedload(Trabajador.departamento_rel),
+            joinedload(Trabajador.horario_rel),
+            joinedload(Trabajador.centro_trabajo_rel),
+            joinedload(Trabajador.grado_estudios_rel),
+            joinedload(Trabajador.rol_rel)
+        ]
+
+        for titulo, modelo, schema, opciones, proyectar in [
+            ("GET /asistencias", RegistroAsistencia, RegistroAsistenciaOut, [], proyectar_asistencias),
+            ("GET /trabajadores", Trabajador, TrabajadorOut, opciones_trabajador, proyectar_trabajadores),
+        ]:
+            print(f"\n=== {titulo} - página de {FILAS:,} filas (mejor de {REPETICIONES}) ===")
+            actual = medir("actual", lambda: ruta_actual(db, modelo, schema, opciones))
+            ligera = medir("ligera", lambda: ruta_ligera(db, modelo, proyectar))
+            print(f"  Aceleración: {actual / ligera:.1f}x")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
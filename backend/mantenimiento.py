@@ -0,0 +1,192 @@
+import sys
+import os
+import argparse
+from datetime import date
+
+# Agregar el directorio de la aplicación al path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+from app.database import SessionLocal, engine
+from app.models.models import RegistroAsistencia, Justificacion, AsignacionHorario, ResumenDiario, AgregadoMensual, MapaAsistencia, ContadorPuntualidad
+from app.services.resumen_service import reconstruir_resumen
+from app.services.agregados_service import limpiar_agregados
+from app.services.recalculo_service import recalcular_estatus
+from app.services.horarios_service import historial_inicial
+from app.services.mapa_asistencia_service import reconstruir_mapa
+from app.services.puntualidad_service import reconstruir_contadores
+
+# Tareas de mantenimiento de la base de datos. La base se restaura desde un
+# backup y no se crean tablas al iniciar la API, así que las tablas e índices
+# nuevos se crean aquí.
+#
+#   python mantenimiento.py esquema
+#   python mantenimiento.py reconstruir-resumen [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD] [--trabajador ID]
+#   python mantenimiento.py limpiar-agregados [--desde AAAA-MM-DD] [--hasta AAAA-MM-DD]
+#   python mantenimiento.py recalcular-estatus --desde AAAA-MM-DD --hasta AAAA-MM-DD [--trabajador ID] [--simular]
+#   python mantenimiento.py reconstruir-mapa --anio AAAA [--trabajador ID]
+#   python mantenimiento.py reconstruir-contadores --desde AAAA-MM-DD --hasta AAAA-MM-DD [--trabajador ID]
+
+def crear_esquema():
+    """Crear las tablas, columnas e índices nuevos que falten (no modifica los existentes)"""
+    ResumenDiario.__table__.create(bind=engine, checkfirst=True)
+    print("✅ Tabla resumen_diario creada/verificada")
+
+    AgregadoMensual.__table__.create(bind=engine, checkfirst=True)
+    print("✅ Tabla agregado_mensual creada/verificada")
+
+    MapaAsistencia.__table__.create(bind=engine, checkfirst=True)
+    print("✅ Tabla mapa_asistencia creada/verificada")
+
+    ContadorPuntualidad.__table__.create(bind=engine, checkfirst=True)
+    print("✅ Tabla contador_puntualidad creada/verificada")
+
+    for indice in RegistroAsistencia.__table__.indexes:
+        indice.create(bind=engine, checkfirst=True)
+    print("✅ Índices de registroasistencia creados/verificados")
+
+    for indice in Justificacion.__table__.indexes:
+        indice.create(bind=engine, checkfirst=True)
+    print("✅ Índices de justificaciones creados/verificados")
+
+    # Columna de las justificaciones por período (JUSTIFICACIONES_POR_PERIODO_ACTIVO)
+    columnas = {columna["name"] for columna in inspect(engine).get_columns("justificaciones")}
+    if "fecha_fin" not in columnas:
+        with engine.begin() as conexion:
+            conexion.execute(text("ALTER TABLE justificaciones ADD COLUMN fecha_fin DATETIME NULL"))
+    print("✅ Columna justificaciones.fecha_fin creada/verificada")
+
+    # Horario previo de los trabajadores sin historial de asignaciones, desde su
+    # ingreso: el resolutor de horarios solo usa el horario actual sin historial
+    db = SessionLocal()
+    try:
+        filas = historial_inicial(db)
+        if filas:
+            db.bulk_insert_mappings(AsignacionHorario, filas)
+            db.commit()
+        print(f"✅ Historial inicial de horarios: {len(filas)} asignaciones agregadas")
+    finally:
+        db.close()
+
+def reconstruir(args):
+    """Reconstruir resumen_diario desde los registros y las justificaciones"""
+    db = SessionLocal()
+
+    try:
+        total = reconstruir_resumen(db, args.desde, args.hasta, args.trabajador)
+        print(f"✅ Resumen diario reconstruido: {total} filas")
+    except Exception as e:
+        print(f"❌ Error al reconstruir el resumen: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def limpiar(args):
+    """Borrar agregados mensuales (se recalculan al pedir un reporte)"""
+    db = SessionLocal()
+
+    try:
+        total = limpiar_agregados(db, args.desde, args.hasta)
+        print(f"✅ Agregados mensuales borrados: {total} filas")
+    except Exception as e:
+        print(f"❌ Error al borrar los agregados: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def recalcular(args):
+    """Reclasificar los registros de asistencia con las reglas y horarios actuales"""
+    db = SessionLocal()
+
+    try:
+        resultado = recalcular_estatus(
+            db, args.desde, args.hasta, [args.trabajador] if args.trabajador else None, args.simular
+        )
+        print(f"✅ Registros revisados: {resultado['revisados']}, cambiados: {resultado['cambiados']}"
+              f"{' (simulado)' if args.simular else ''}")
+        for transicion, total in resultado["transiciones"].items():
+            print(f"   {transicion}: {total}")
+    except Exception as e:
+        print(f"❌ Error al recalcular los estatus: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def reconstruir_mapa_anio(args):
+    """Reconstruir mapa_asistencia de un año desde los registros y las justificaciones"""
+    db = SessionLocal()
+
+    try:
+        total = reconstruir_mapa(db, args.anio, args.trabajador)
+        print(f"✅ Mapa de asistencia {args.anio} reconstruido: {total} trabajadores")
+    except Exception as e:
+        print(f"❌ Error al reconstruir el mapa de asistencia: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def reconstruir_puntualidad(args):
+    """Reconstruir contador_puntualidad desde los registros y las justificaciones"""
+    db = SessionLocal()
+
+    try:
+        total = reconstruir_contadores(db, args.desde, args.hasta, args.trabajador)
+        print(f"✅ Contadores de puntualidad reconstruidos: {total} quincenas")
+    except Exception as e:
+        print(f"❌ Error al reconstruir los contadores: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Tareas de mantenimiento del sistema de asistencias")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    subparsers.add_parser("esquema", help="Crear tablas, columnas e índices nuevos")
+
+    parser_resumen = subparsers.add_parser("reconstruir-resumen", help="Reconstruir la tabla resumen_diario")
+    parser_resumen.add_argument("--desde", type=date.fromisoformat, help="Primer día (por defecto, todo el historial)")
+    parser_resumen.add_argument("--hasta", type=date.fromisoformat, help="Último día (por defecto, todo el historial)")
+    parser_resumen.add_argument("--trabajador", type=int, help="ID de un trabajador")
+
+    parser_agregados = subparsers.add_parser("limpiar-agregados", help="Borrar la tabla agregado_mensual (se recalcula sola)")
+    parser_agregados.add_argument("--desde", type=date.fromisoformat, help="Primer mes (por defecto, todos)")
+    parser_agregados.add_argument("--hasta", type=date.fromisoformat, help="Último mes (por defecto, todos)")
+
+    parser_recalculo = subparsers.add_parser("recalcular-estatus", help="Reclasificar registros con las reglas y horarios actuales")
+    parser_recalculo.add_argument("--desde", type=date.fromisoformat, required=True, help="Primer día")
+    parser_recalculo.add_argument("--hasta", type=date.fromisoformat, required=True, help="Último día")
+    parser_recalculo.add_argument("--trabajador", type=int, help="ID de un trabajador")
+    parser_recalculo.add_argument("--simular", action="store_true", help="Mostrar los cambios sin escribirlos")
+
+    parser_mapa = subparsers.add_parser("reconstruir-mapa", help="Reconstruir la tabla mapa_asistencia de un año")
+    parser_mapa.add_argument("--anio", type=int, required=True, help="Año a reconstruir")
+    parser_mapa.add_argument("--trabajador", type=int, help="ID de un trabajador")
+
+    parser_contadores = subparsers.add_parser("reconstruir-contadores", help="Reconstruir la tabla contador_puntualidad")
+    parser_contadores.add_argument("--desde", type=date.fromisoformat, required=True, help="Primer día")
+    parser_contadores.add_argument("--hasta", type=date.fromisoformat, required=True, help="Último día")
+    parser_contadores.add_argument("--trabajador", type=int, help="ID de un trabajador")
+
+    args = parser.parse_args()
+
+    if args.comando == "esquema":
+        crear_esquema()
+    elif args.comando == "reconstruir-resumen":
+        reconstruir(args)
+    elif args.comando == "limpiar-agregados":
+        limpiar(args)
+    elif args.comando == "recalcular-estatus":
+        recalcular(args)
+    elif args.comando == "reconstruir-mapa":
+        reconstruir_mapa_anio(args)
+    elif args.comando == "reconstruir-contadores":
+        reconstruir_puntualidad(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import os
+import sys
+from datetime import datetime, time
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Importar la aplicación desde backend/ sin instalarla
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.models.models import Base, Horario, Trabajador
+
+
+@pytest.fixture(autouse=True)
+def directorio_cache(tmp_path, monkeypatch):
+    """Las invalidaciones de la caché de reportes escriben en un directorio temporal"""
+    monkeypatch.setattr(settings, "DIRECTORIO_CACHE_REPORTES", str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def engine():
+    """Base SQLite en memoria con el esquema de los modelos"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def consultas(engine):
+    """Lista de las sentencias SQL ejecutadas mientras dura la prueba"""
+    sentencias = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement)
+
+    return sentencias
+
+
+@pytest.fixture
+def crear_trabajador(db):
+    """Crea trabajadores con un horario de lunes a viernes de 08:00 a 16:00 (ID 1)"""
+    if db.get(Horario, 1) is None:
+        entrada, salida = time(8, 0), time(16, 0)
+        db.add(Horario(
+            id=1, descripcion="Matutino",
+            lunesEntrada=entrada, lunesSalida=salida, martesEntrada=entrada, martesSalida=salida,
+            miercolesEntrada=entrada, miercolesSalida=salida, juevesEntrada=entrada, juevesSalida=salida,
+            viernesEntrada=entrada, viernesSalida=salida
+        ))
+
+    def crear(id_trabajador: int, **campos) -> Trabajador:
+        datos = dict(
+            id=id_trabajador, nombre=f"N{id_trabajador}", apellidoPaterno=f"P{id_trabajador}", apellidoMaterno="M",
+            rfc=f"RFC{id_trabajador}", curp="C", id_tipo=1, departamento=1, puesto="P", id_horario=1,
+            estado=True, id_centroTrabajo=1, id_gradoEstudios=1, id_rol=1, titulo="t", cedula="c",
+            escuelaEgreso="e", turno="M", correo=f"t{id_trabajador}@correo.mx", huellaDigital=b"h",
+            fechaIngresoSep=datetime(2023, 1, 1), fechaIngresoRama=datetime(2023, 1, 1),
+            fechaIngresoGobFed=datetime(2023, 1, 1)
+        )
+        datos.update(campos)
+        trabajador = Trabajador(**datos)
+        db.add(trabajador)
+        db.commit()
+        return trabajador
+
+    return crear
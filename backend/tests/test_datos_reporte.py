@@ -0,0 +1,89 @@
+from datetime import datetime, date, time, timedelta
+
+import pytest
+
+from app.models.models import (
+    Departamento,
+    Trabajador,
+    RegistroAsistencia,
+    Justificacion,
+    ReglaJustificacion,
+    DiaFestivo,
+    ResumenDiario
+)
+from app.services.datos_reporte import cargar_datos_reporte
+
+INICIO = date(2024, 1, 1)
+
+
+def sembrar(db, numero_trabajadores, numero_dias):
+    """Trabajadores en dos departamentos con entrada y salida cada día y una justificación cada uno"""
+    db.add_all([
+        Departamento(id=1, descripcion="Administración"),
+        Departamento(id=2, descripcion="Docencia"),
+        ReglaJustificacion(id=1, descripcion="Permiso"),
+        DiaFestivo(id=1, fecha=datetime(2024, 1, 15), descripcion="Festivo")
+    ])
+    for i in range(1, numero_trabajadores + 1):
+        db.add(Trabajador(
+            id=i, nombre=f"N{i}", apellidoPaterno=f"P{i}", apellidoMaterno="M", rfc=f"RFC{i}", curp="C",
+            id_tipo=1, departamento=1 + i % 2, puesto="P", id_horario=1, estado=True, id_centroTrabajo=1,
+            id_gradoEstudios=1, id_rol=1, titulo="t", cedula="c", escuelaEgreso="e", turno="M",
+            correo=f"t{i}@correo.mx", huellaDigital=b"h",
+            fechaIngresoSep=datetime(2023, 1, 1), fechaIngresoRama=datetime(2023, 1, 1),
+            fechaIngresoGobFed=datetime(2023, 1, 1)
+        ))
+        for d in range(numero_dias):
+            dia = INICIO + timedelta(days=d)
+            db.add(RegistroAsistencia(id_trabajador=i, fecha=datetime.combine(dia, time(8, 5)), estatus="ASISTENCIA"))
+            db.add(RegistroAsistencia(id_trabajador=i, fecha=datetime.combine(dia, time(16, 0)), estatus="SALIDA"))
+            db.add(ResumenDiario(
+                id_trabajador=i, fecha=dia, estatus="ASISTENCIA",
+                hora_entrada=datetime.combine(dia, time(8, 5)), hora_salida=datetime.combine(dia, time(16, 0))
+            ))
+        db.add(Justificacion(id_trabajador=i, fecha=datetime.combine(INICIO, time.min), id_descripcion=1))
+    db.commit()
+    db.expunge_all()
+
+
+def consumir(datos):
+    """Recorre todo lo que usan los reportes, para detectar cargas perezosas"""
+    dia = datos.fecha_inicio
+    while dia <= datos.fecha_fin:
+        datos.es_festivo(dia)
+        for trabajador in datos.trabajadores:
+            datos.dia(trabajador.id, dia)
+        dia += timedelta(days=1)
+    for trabajador in datos.trabajadores:
+        datos.nombre_departamento(trabajador)
+        datos.registros_por_dia(trabajador.id)
+        datos.justificaciones_por_dia(trabajador.id)
+    list(datos.dias_con_datos())
+
+
+@pytest.mark.parametrize("numero_trabajadores,numero_dias", [(2, 3), (40, 31)])
+@pytest.mark.parametrize("desde_resumen,esperadas", [(False, 4), (True, 3)])
+def test_consultas_fijas(db, consultas, numero_trabajadores, numero_dias, desde_resumen, esperadas):
+    """Trabajadores, registros (o resumen), justificaciones y festivos: sin importar trabajadores ni días"""
+    sembrar(db, numero_trabajadores, numero_dias)
+    consultas.clear()
+
+    datos = cargar_datos_reporte(
+        db, INICIO, INICIO + timedelta(days=numero_dias - 1), desde_resumen=desde_resumen
+    )
+    consumir(datos)
+
+    assert len(consultas) == esperadas
+    assert len(datos.trabajadores) == numero_trabajadores
+
+
+def test_filtra_por_departamento(db, consultas):
+    sembrar(db, 10, 5)
+    consultas.clear()
+
+    datos = cargar_datos_reporte(db, INICIO, INICIO + timedelta(days=4), departamento_id=2)
+    consumir(datos)
+
+    assert len(consultas) == 4
+    assert {trabajador.departamento for trabajador in datos.trabajadores} == {2}
+    assert datos.dia(1, INICIO).id_justificacion is not None
@@ -0,0 +1,58 @@
+from datetime import datetime, date, time, timedelta
+
+from app.models.models import Horario, AsignacionHorario
+from app.services.horarios_service import ResolutorHorarios, horario_vigente, historial_inicial
+
+INICIO = date(2024, 1, 1)
+
+
+def agregar_horarios(db, *ids):
+    entrada, salida = time(9, 0), time(17, 0)
+    for id_horario in ids:
+        db.add(Horario(
+            id=id_horario, descripcion=f"Horario {id_horario}",
+            lunesEntrada=entrada, lunesSalida=salida, martesEntrada=entrada, martesSalida=salida,
+            miercolesEntrada=entrada, miercolesSalida=salida, juevesEntrada=entrada, juevesSalida=salida,
+            viernesEntrada=entrada, viernesSalida=salida
+        ))
+
+
+def asignar(db, id_trabajador, id_horario, inicio):
+    db.add(AsignacionHorario(id_trabajador=id_trabajador, id_horario=id_horario, fehcaInicio=inicio))
+
+
+def test_horario_vigente_como_el_resolutor(db, crear_trabajador, consultas):
+    """Un solo día con pocas consultas da el mismo horario que el resolutor del período"""
+    trabajadores = [crear_trabajador(i) for i in (1, 2, 3)]
+    agregar_horarios(db, 2, 3)
+    # 1: cambios a media mañana y dos asignaciones el mismo día (rige la última capturada)
+    asignar(db, 1, 2, datetime(2024, 1, 10, 11, 30))
+    asignar(db, 1, 3, datetime(2024, 1, 20))
+    asignar(db, 1, 1, datetime(2024, 1, 20, 9, 0))
+    # 2: el historial empieza después del inicio del rango (antes rige la primera)
+    asignar(db, 2, 3, datetime(2024, 1, 15))
+    # 3: sin historial, rige id_horario
+    db.commit()
+
+    resolutor = ResolutorHorarios(db)
+    for trabajador in trabajadores:
+        for n in range(35):
+            dia = INICIO + timedelta(days=n)
+            consultas.clear()
+            assert horario_vigente(db, trabajador, dia) is resolutor.horario(trabajador.id, dia)
+            assert len(consultas) <= 3
+
+
+def test_historial_inicial(db, crear_trabajador):
+    crear_trabajador(1)
+    crear_trabajador(2, fechaIngresoSep=datetime(2024, 2, 1))
+    crear_trabajador(3)
+    agregar_horarios(db, 2)
+    asignar(db, 3, 2, datetime(2024, 1, 15))
+    db.commit()
+
+    # El 3 ya tiene historial y el 2 ingresa después del cambio
+    assert historial_inicial(db, antes_de=datetime(2024, 1, 20)) == [
+        {"id_trabajador": 1, "id_horario": 1, "fehcaInicio": datetime(2023, 1, 1)}
+    ]
+    assert [fila["id_trabajador"] for fila in historial_inicial(db)] == [1, 2]
@@ -0,0 +1,98 @@
+import random
+from datetime import datetime, date, timedelta
+
+import pytest
+
+from app.config import settings
+from app.models.models import Justificacion, RegistroAsistencia, DiaFestivo
+from app.services.datos_reporte import IntervalosJustificacion, rango_justificacion
+from app.services.justificaciones_service import revertir_justificacion_periodo
+
+INICIO = date(2024, 1, 1)
+
+
+@pytest.fixture(autouse=True)
+def por_periodo(monkeypatch):
+    monkeypatch.setattr(settings, "JUSTIFICACIONES_POR_PERIODO_ACTIVO", True)
+
+
+def justificacion(id_justificacion, inicio, dias):
+    fin = inicio + timedelta(days=dias - 1)
+    return Justificacion(
+        id=id_justificacion, id_trabajador=1, id_descripcion=1,
+        fecha=datetime.combine(inicio, datetime.min.time()),
+        fecha_fin=datetime.combine(fin, datetime.min.time()) if dias > 1 else None
+    )
+
+
+def intervalos_de(justificaciones):
+    intervalos = IntervalosJustificacion()
+    for j in sorted(justificaciones, key=lambda j: j.fecha):
+        intervalos.agregar(j, f"regla {j.id}")
+    return intervalos
+
+
+def test_rango_justificacion(monkeypatch):
+    j = justificacion(1, date(2024, 1, 10), 5)
+    assert rango_justificacion(j) == (date(2024, 1, 10), date(2024, 1, 14))
+    assert rango_justificacion(justificacion(2, date(2024, 1, 10), 1)) == (date(2024, 1, 10), date(2024, 1, 10))
+
+    # Sin el período activo solo cuenta el día de fecha
+    monkeypatch.setattr(settings, "JUSTIFICACIONES_POR_PERIODO_ACTIVO", False)
+    assert rango_justificacion(j) == (date(2024, 1, 10), date(2024, 1, 10))
+
+
+def test_buscar_con_intervalos_anidados():
+    # Uno largo que contiene a uno corto, y otro que empieza después
+    larga = justificacion(1, date(2024, 1, 1), 20)
+    corta = justificacion(2, date(2024, 1, 3), 2)
+    despues = justificacion(3, date(2024, 1, 25), 3)
+    intervalos = intervalos_de([corta, despues, larga])
+
+    assert intervalos.buscar(date(2024, 1, 4)) == (larga, "regla 1")
+    assert intervalos.buscar(date(2024, 1, 20)) == (larga, "regla 1")
+    assert intervalos.buscar(date(2024, 1, 22)) == (None, None)
+    assert intervalos.buscar(date(2024, 1, 27)) == (despues, "regla 3")
+    assert intervalos.buscar(date(2023, 12, 31)) == (None, None)
+    assert IntervalosJustificacion().buscar(INICIO) == (None, None)
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_buscar_como_recorrer_la_lista(semilla):
+    """La justificación de cada día es la primera (por inicio) que lo cubre"""
+    azar = random.Random(semilla)
+    justificaciones = [
+        justificacion(k, INICIO + timedelta(days=azar.randrange(60)), azar.choice([1, 1, 2, 5, 15, 30]))
+        for k in range(1, 25)
+    ]
+    intervalos = intervalos_de(justificaciones)
+    ordenadas = sorted(justificaciones, key=lambda j: j.fecha)
+
+    for n in range(-3, 95):
+        dia = INICIO + timedelta(days=n)
+        cubren = [j for j in ordenadas if rango_justificacion(j)[0] <= dia <= rango_justificacion(j)[1]]
+        encontrada, _ = intervalos.buscar(dia)
+        assert encontrada is (cubren[0] if cubren else None)
+        assert [j for j, _ in intervalos.por_dia(dia, dia).get(dia, [])] == cubren
+
+
+def test_revertir_periodo_respeta_otras_justificaciones(db, crear_trabajador):
+    """Al borrar un período solo vuelven a FALTA los días hábiles que no cubre otra justificación"""
+    crear_trabajador(1)
+    borrada = justificacion(1, date(2024, 1, 8), 12)  # 8 al 19
+    otra = justificacion(2, date(2024, 1, 17), 5)  # 17 al 21
+    db.add_all([borrada, otra, DiaFestivo(id=1, fecha=datetime(2024, 1, 15), descripcion="Festivo")])
+    dia = date(2024, 1, 8)
+    while dia <= date(2024, 1, 19):
+        db.add(RegistroAsistencia(id_trabajador=1, fecha=datetime.combine(dia, datetime.min.time()), estatus="JUSTIFICADO"))
+        dia += timedelta(days=1)
+    db.commit()
+
+    assert revertir_justificacion_periodo(db, borrada) == 6
+    db.commit()
+
+    faltas = [
+        registro.fecha.day for registro in db.query(RegistroAsistencia).filter(RegistroAsistencia.estatus == "FALTA")
+    ]
+    # Sin el fin de semana (13 y 14), el festivo (15) ni los días de la otra justificación (17 al 19)
+    assert sorted(faltas) == [8, 9, 10, 11, 12, 16]
@@ -0,0 +1,112 @@
+from datetime import datetime, date, time, timedelta
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.models.models import RegistroAsistencia, Justificacion, ReglaJustificacion, DiaFestivo, MapaAsistencia
+from app.services.derivados_service import actualizar_derivados_dia
+from app.services.mapa_asistencia_service import (
+    DIAS_ANIO,
+    _empacar,
+    _desempacar,
+    reconstruir_mapa,
+    consultar_ausencias,
+    consultar_ausencias_consecutivas
+)
+
+INICIO = date(2024, 1, 1)  # lunes
+FIN = date(2024, 1, 31)
+
+
+def checar(db, id_trabajador, dia, estatus="ASISTENCIA"):
+    db.add(RegistroAsistencia(id_trabajador=id_trabajador, fecha=datetime.combine(dia, time(8, 5)), estatus=estatus))
+    db.add(RegistroAsistencia(id_trabajador=id_trabajador, fecha=datetime.combine(dia, time(16, 0)), estatus="SALIDA"))
+
+
+def sembrar(db, crear_trabajador):
+    """
+    Trabajador 1: falta el 10, 11, 12 y 16 (el 15 es festivo), entra fuera de
+    tolerancia el 25 y tiene justificado el 22. Trabajador 2: ingresa el 17 y
+    falta el 24.
+    """
+    crear_trabajador(1)
+    crear_trabajador(2, fechaIngresoSep=datetime(2024, 1, 17))
+    db.add_all([
+        ReglaJustificacion(id=1, descripcion="Permiso"),
+        DiaFestivo(id=1, fecha=datetime(2024, 1, 15), descripcion="Festivo"),
+        Justificacion(id=1, id_trabajador=1, fecha=datetime(2024, 1, 22), id_descripcion=1)
+    ])
+    dia = INICIO
+    while dia <= FIN:
+        if dia.weekday() < 5 and dia.day != 15:
+            if dia.day not in (10, 11, 12, 16, 22):
+                checar(db, 1, dia, "FALTA" if dia.day == 25 else "ASISTENCIA")
+            if dia.day >= 17 and dia.day != 24:
+                checar(db, 2, dia)
+        dia += timedelta(days=1)
+    checar(db, 1, date(2024, 1, 20))  # sábado
+    db.commit()
+
+
+def ausencias_por_trabajador(db):
+    resultado = consultar_ausencias(db, INICIO, FIN, solo_con_ausencias=False)
+    return {t["id"]: ([f.day for f in t["fechas_ausencia"]], t["dias_laborables"]) for t in resultado["trabajadores"]}
+
+
+def test_empacar_ida_y_vuelta():
+    bits = np.zeros((3, DIAS_ANIO), dtype=bool)
+    bits[0, [0, 7, 8, 365]] = True
+    bits[2, :] = True
+    datos = [_empacar(fila) for fila in bits]
+
+    assert all(len(d) == 46 for d in datos)
+    assert (_desempacar(datos) == bits).all()
+    assert _desempacar([]).shape == (0, DIAS_ANIO)
+
+
+@pytest.mark.parametrize("con_mapa", [False, True])
+def test_ausencias(db, crear_trabajador, monkeypatch, con_mapa):
+    sembrar(db, crear_trabajador)
+    if con_mapa:
+        monkeypatch.setattr(settings, "MAPA_ASISTENCIA_ACTIVO", True)
+        assert reconstruir_mapa(db, 2024) == 2
+
+    # Los días antes del ingreso del trabajador 2 no son laborables
+    assert ausencias_por_trabajador(db) == {1: ([10, 11, 12, 16, 25], 22), 2: ([24], 11)}
+
+    consecutivas = consultar_ausencias_consecutivas(db, INICIO, FIN, minimo=3)
+    assert [t["id"] for t in consecutivas["trabajadores"]] == [1]
+    assert consecutivas["trabajadores"][0]["rachas"] == [
+        {"desde": date(2024, 1, 10), "hasta": date(2024, 1, 16), "ausencias": 4}
+    ]
+
+
+def test_mapa_se_actualiza_con_los_cambios(db, crear_trabajador, monkeypatch):
+    sembrar(db, crear_trabajador)
+    monkeypatch.setattr(settings, "MAPA_ASISTENCIA_ACTIVO", True)
+    reconstruir_mapa(db, 2024)
+
+    checar(db, 1, date(2024, 1, 11))
+    actualizar_derivados_dia(db, 1, date(2024, 1, 11))
+    db.query(RegistroAsistencia).filter(
+        RegistroAsistencia.id_trabajador == 2,
+        RegistroAsistencia.fecha >= datetime(2024, 1, 30),
+        RegistroAsistencia.fecha < datetime(2024, 1, 31)
+    ).delete()
+    actualizar_derivados_dia(db, 2, date(2024, 1, 30))
+    db.commit()
+
+    con_mapa = ausencias_por_trabajador(db)
+    monkeypatch.setattr(settings, "MAPA_ASISTENCIA_ACTIVO", False)
+    assert con_mapa == ausencias_por_trabajador(db) == {1: ([10, 12, 16, 25], 22), 2: ([24, 30], 11)}
+    assert db.query(MapaAsistencia).count() == 2
+
+
+def test_hoy_en_adelante_no_son_ausencias(db, crear_trabajador):
+    crear_trabajador(1)
+    hoy = date.today()
+    resultado = consultar_ausencias(db, hoy - timedelta(days=14), hoy + timedelta(days=14))
+
+    fechas = resultado["trabajadores"][0]["fechas_ausencia"]
+    assert fechas and max(fechas) < hoy
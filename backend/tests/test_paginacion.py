@@ -0,0 +1,82 @@
+from datetime import datetime, date, timedelta
+
+import pytest
+
+from app.models.models import RegistroAsistencia
+from app.utils.helpers import codificar_cursor, decodificar_cursor, paginar_por_cursor, estimar_total
+
+
+def sembrar_registros(db, cantidad):
+    """Registros con fechas repetidas (de tres en tres) para probar el desempate por ID"""
+    inicio = datetime(2024, 1, 1, 8, 0)
+    for k in range(cantidad):
+        db.add(RegistroAsistencia(id_trabajador=1 + k % 2, fecha=inicio + timedelta(minutes=k // 3), estatus="ASISTENCIA"))
+    db.commit()
+
+
+def recorrer(query, limite, descendente):
+    columnas = [RegistroAsistencia.fecha, RegistroAsistencia.id]
+    vistos, cursor, paginas = [], None, 0
+    while True:
+        filas, cursor = paginar_por_cursor(
+            query, columnas, cursor, limite, clave=lambda r: (r.fecha.isoformat(), r.id), descendente=descendente
+        )
+        vistos.extend((r.fecha, r.id) for r in filas)
+        paginas += 1
+        if cursor is None:
+            return vistos, paginas
+
+
+def test_cursor_ida_y_vuelta():
+    datos = {"k": [datetime(2024, 1, 2, 8, 30).isoformat(), 17], "fecha": date(2024, 1, 2)}
+    cursor = codificar_cursor(datos)
+
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert decodificar_cursor(cursor) == {"k": ["2024-01-02T08:30:00", 17], "fecha": "2024-01-02"}
+
+
+@pytest.mark.parametrize("cursor", ["no es base64!", codificar_cursor({"k": 1})[:-3] + "@@@", "WzEsMl0"])
+def test_cursor_invalido(cursor):
+    # "WzEsMl0" es [1,2]: JSON válido pero no un diccionario
+    with pytest.raises(ValueError):
+        decodificar_cursor(cursor)
+
+
+@pytest.mark.parametrize("descendente", [False, True])
+@pytest.mark.parametrize("limite", [1, 4, 7, 50])
+def test_recorre_todo_sin_repetir(db, descendente, limite):
+    sembrar_registros(db, 20)
+    query = db.query(RegistroAsistencia)
+
+    vistos, paginas = recorrer(query, limite, descendente)
+
+    esperados = sorted(((r.fecha, r.id) for r in query), reverse=descendente)
+    assert vistos == esperados
+    assert paginas == max(-(-20 // limite), 1)
+
+
+def test_cursor_con_filtro(db):
+    sembrar_registros(db, 20)
+    query = db.query(RegistroAsistencia).filter(RegistroAsistencia.id_trabajador == 2)
+
+    vistos, _ = recorrer(query, 3, True)
+
+    assert vistos == sorted(((r.fecha, r.id) for r in query), reverse=True)
+    assert len(vistos) == 10
+
+
+def test_cursor_de_otras_columnas(db):
+    sembrar_registros(db, 3)
+    with pytest.raises(ValueError):
+        paginar_por_cursor(
+            db.query(RegistroAsistencia), [RegistroAsistencia.fecha, RegistroAsistencia.id],
+            codificar_cursor({"k": [1]}), 2, clave=lambda r: (r.fecha.isoformat(), r.id)
+        )
+
+
+def test_estimar_total_con_filtro_tiene_tope(db):
+    sembrar_registros(db, 20)
+    query = db.query(RegistroAsistencia).filter(RegistroAsistencia.id_trabajador == 1)
+
+    assert estimar_total(db, query, "registroasistencia") == 10
+    assert estimar_total(db, query, "registroasistencia", tope=4) == 4
@@ -0,0 +1,138 @@
+from datetime import datetime, date, timedelta
+
+import numpy as np
+import pytest
+
+from app.models.models import RegistroAsistencia, ReglaRetardo, DiaFestivo
+from app.routes.asistencia import determinar_estatus_asistencia
+from app.services.recalculo_service import recalcular_estatus, registros_de_salida
+
+INICIO = date(2024, 1, 1)  # lunes
+FESTIVO = date(2024, 1, 15)
+
+# Segundos de diferencia con la entrada de las 08:00, alrededor de los límites de las reglas
+DIFERENCIAS = (-1800, -601, -600, -59, 0, 59, 60, 599, 659, 660, 1199, 1259, 1260, 1799, 1859, 1860, 3600, 7200)
+
+REGLAS = (
+    ("Tolerancia", -10, 10),
+    ("Retardo menor", 11, 20),
+    ("Retardo mayor", 21, 30),
+    ("Falta", 31, 600)
+)
+
+
+def registrar(db, id_trabajador, fecha_hora, estatus):
+    registro = RegistroAsistencia(id_trabajador=id_trabajador, fecha=fecha_hora, estatus=estatus)
+    db.add(registro)
+    return registro
+
+
+def estatus_guardados(db, id_trabajador):
+    db.expire_all()
+    return [
+        registro.estatus for registro in db.query(RegistroAsistencia).filter(
+            RegistroAsistencia.id_trabajador == id_trabajador
+        ).order_by(RegistroAsistencia.fecha, RegistroAsistencia.id)
+    ]
+
+
+@pytest.mark.parametrize("con_reglas", [False, True])
+def test_entradas_como_determinar_estatus(db, crear_trabajador, con_reglas):
+    """Cada entrada queda con el estatus que le daría determinar_estatus_asistencia"""
+    trabajador = crear_trabajador(1)
+    if con_reglas:
+        db.add_all([
+            ReglaRetardo(id=k, descripcion=descripcion, minutosMin=minimo, minutosMax=maximo)
+            for k, (descripcion, minimo, maximo) in enumerate(REGLAS, start=1)
+        ])
+    db.add(DiaFestivo(id=1, fecha=datetime.combine(FESTIVO, datetime.min.time()), descripcion="Festivo"))
+
+    # Todos los días de tres semanas (incluidos el fin de semana y el festivo)
+    fechas = []
+    for k, segundos in enumerate(DIFERENCIAS):
+        dia = INICIO + timedelta(days=k)
+        fechas.append(datetime.combine(dia, datetime.min.time()) + timedelta(hours=8, seconds=segundos))
+        registrar(db, 1, fechas[-1], "ASISTENCIA")
+    db.commit()
+
+    recalcular_estatus(db, INICIO, INICIO + timedelta(days=len(DIFERENCIAS) - 1))
+
+    esperados = [determinar_estatus_asistencia(trabajador, fecha, "ENTRADA", db) for fecha in fechas]
+    assert estatus_guardados(db, 1) == esperados
+    assert "DIA_FESTIVO" in esperados and "RETARDO_MENOR" in esperados and "FALTA" in esperados
+
+
+def test_festivo_quitado_alterna_entrada_y_salida(db, crear_trabajador):
+    """Las checadas de un día que deja de ser festivo se alternan entrada, salida, entrada..."""
+    trabajador = crear_trabajador(1)
+    horas = ((8, 0), (12, 0), (13, 0), (16, 5))
+    fechas = [datetime.combine(FESTIVO, datetime.min.time()).replace(hour=h, minute=m) for h, m in horas]
+    for fecha in fechas:
+        registrar(db, 1, fecha, "DIA_FESTIVO")
+    db.commit()
+
+    resumen = recalcular_estatus(db, FESTIVO, FESTIVO)
+
+    esperados = [
+        determinar_estatus_asistencia(trabajador, fecha, "ENTRADA" if k % 2 == 0 else "SALIDA", db)
+        for k, fecha in enumerate(fechas)
+    ]
+    assert esperados == ["ASISTENCIA", "SALIDA", "FALTA", "SALIDA"]
+    assert estatus_guardados(db, 1) == esperados
+    assert resumen["cambiados"] == 4
+
+
+def test_dia_que_pasa_a_festivo(db, crear_trabajador):
+    crear_trabajador(1)
+    registrar(db, 1, datetime(2024, 1, 15, 8, 20), "RETARDO_MENOR")
+    registrar(db, 1, datetime(2024, 1, 15, 16, 0), "SALIDA")
+    db.add(DiaFestivo(id=1, fecha=datetime(2024, 1, 15), descripcion="Festivo"))
+    db.commit()
+
+    recalcular_estatus(db, FESTIVO, FESTIVO)
+
+    assert estatus_guardados(db, 1) == ["DIA_FESTIVO", "DIA_FESTIVO"]
+
+
+def test_no_toca_justificados_ni_salidas(db, crear_trabajador):
+    crear_trabajador(1)
+    crear_trabajador(2)
+    # Un JUSTIFICADO sintético, uno que fue una entrada y salidas en días normales
+    registrar(db, 1, datetime(2024, 1, 2, 0, 0), "JUSTIFICADO")
+    registrar(db, 1, datetime(2024, 1, 3, 9, 30), "JUSTIFICADO")
+    registrar(db, 1, datetime(2024, 1, 3, 16, 0), "SALIDA")
+    registrar(db, 2, datetime(2024, 1, 2, 8, 0), "ASISTENCIA")
+    registrar(db, 2, datetime(2024, 1, 2, 8, 1), "SALIDA")
+    db.commit()
+
+    resumen = recalcular_estatus(db, INICIO, date(2024, 1, 5))
+
+    assert estatus_guardados(db, 1) == ["JUSTIFICADO", "JUSTIFICADO", "SALIDA"]
+    assert estatus_guardados(db, 2) == ["ASISTENCIA", "SALIDA"]
+    assert resumen["revisados"] == 3
+    assert resumen["cambiados"] == 0
+
+
+def test_simular_no_escribe(db, crear_trabajador):
+    crear_trabajador(1)
+    registrar(db, 1, datetime(2024, 1, 2, 8, 45), "ASISTENCIA")
+    db.commit()
+
+    resumen = recalcular_estatus(db, INICIO, date(2024, 1, 5), simular=True)
+
+    assert resumen["transiciones"] == {"ASISTENCIA -> FALTA": 1}
+    assert estatus_guardados(db, 1) == ["ASISTENCIA"]
+
+
+def test_registros_de_salida_por_dia_y_trabajador():
+    """La alternancia de un festivo empieza de nuevo en cada trabajador y cada día"""
+    estatus = np.array(
+        ["DIA_FESTIVO", "DIA_FESTIVO", "DIA_FESTIVO", "DIA_FESTIVO", "DIA_FESTIVO", "ASISTENCIA", "SALIDA"],
+        dtype=object
+    )
+    trabajadores = np.array([1, 1, 1, 1, 2, 2, 2])
+    dias = np.array([0, 0, 0, 1, 1, 2, 2])
+
+    assert registros_de_salida(estatus, trabajadores, dias).tolist() == [
+        False, True, False, False, False, False, True
+    ]